@@ -1,13 +1,41 @@
 import os
-import json
-import math
-import re
+import time
 from datetime import datetime
-from typing import Any, Dict, List, Tuple
+from functools import wraps
+from typing import Any, Callable, Dict, List
 
 import streamlit as st
+import numpy as np
 import pandas as pd
-import pydeck as pdk
+
+from haciendas import metrics
+from haciendas.cache import QueryCache
+from haciendas.catalog import clean_url
+from haciendas.engine import (
+    EMPTY_CATALOG,
+    PublicCatalog,
+    df_for_nearest,
+    df_for_radius,
+    file_sha256,
+    load_public_catalog,
+    photo_flags,
+)
+from haciendas.density import DensityPyramid, DensityView, result_region_stats
+from haciendas.export import EXPORTERS, ROUTE_GPX_FILE, build_export, build_route_gpx, fingerprint
+from haciendas.mapview import CLUSTER_MIN_POINTS, build_deck, zoom_for_radius
+from haciendas.mirror import MirrorIndex
+from haciendas.photos import PhotoIndex
+from haciendas.search import NAME_MODES, fold
+from haciendas.shards import (
+    ShardedCatalog,
+    df_for_nearest_sharded,
+    df_for_radius_sharded,
+    load_shards,
+    shards_path_for,
+)
+from haciendas.static import static_url
+from haciendas.thumbs import thumbnail_path
+from haciendas.tour import MAX_STOPS as MAX_TOUR_STOPS, Tour, plan_tour
 
 # Haciendas Nearby – Public read-only app
 # Version: v1.0.0-public
@@ -23,8 +51,52 @@ import pydeck as pdk
 DEFAULT_LAT = 19.050501
 DEFAULT_LON = -98.135887
 DEFAULT_RADIUS_KM = 25
+# "Nearest N" search mode (see haciendas.engine.df_for_nearest).
+SEARCH_MODES = ("radius", "nearest")
+DEFAULT_NEAREST_K = 20
+MAX_NEAREST_K = 500
 
 CATALOG_JSON = "catalog_public.json"
+PHOTO_DIR = "fotos_public"
+# Seconds after which fotos_public/ is re-listed even if its mtime is unchanged.
+PHOTO_INDEX_TTL_S = 300.0
+# Remote photo_url images mirrored by `python -m haciendas.mirror`; shown
+# from disk instead of linking the remote host when present.
+PHOTO_MIRROR_DIR = "fotos_mirror"
+# Quick-view photos are served from resized WebP thumbnails (see haciendas/thumbs.py).
+QUICK_VIEW_PHOTO_WIDTH = 360
+# Absolute http(s) URL of the static photo server (python -m haciendas.static,
+# or any server/CDN with the same paths). When set, quick-view photos are
+# linked there so the browser caches them; otherwise st.image sends the
+# bytes again on every rerun.
+PHOTO_BASE_URL = os.environ.get("HACIENDAS_PHOTO_BASE_URL", "")
+
+# Cross-session cache of query results (see get_query_cache).
+QUERY_CACHE_MAX_ENTRIES = 256
+QUERY_CACHE_MAX_MB = 64
+QUERY_CACHE_TTL_S = 600.0
+
+# Per-region shards (python -m haciendas.shards), when present and up to
+# date: total size of the shard files kept open at once.
+SHARD_CACHE_MAX_MB = 256
+
+# From this radius on (radius searches without a name query), the map
+# draws the catalog's precomputed per-tile counts (haciendas/density.py)
+# instead of markers, and the results come with per-region totals.
+DENSITY_MIN_RADIUS_KM = 50
+
+# Visiting order (see haciendas/tour.py): seconds spent improving a route
+# before the best one found so far is shown.
+TOUR_TIME_BUDGET_S = 1.0
+
+# Timing spans (see haciendas/metrics.py). Per-rerun timings are shown in
+# the ?debug=1 panel. HACIENDAS_METRICS=1 also keeps process-wide
+# histograms and logs one JSON line per span; HACIENDAS_METRICS_FILE
+# additionally writes them there in Prometheus text format.
+METRICS_FILE = os.environ.get("HACIENDAS_METRICS_FILE", "")
+METRICS_FILE_INTERVAL_S = 10.0
+if os.environ.get("HACIENDAS_METRICS") or METRICS_FILE:
+    metrics.enable()
 
 # --------------------------------------------------------------------
 # Internationalization (i18n)
@@ -69,6 +141,22 @@ TEXTS: Dict[str, Dict[str, str]] = {
         "es": "Centro de búsqueda y radio reiniciados a los valores por defecto (Amalucan, {radius} km).",
         "en": "Search center and radius reset to default values (Amalucan, {radius} km).",
     },
+    "sidebar_search_mode_label": {
+        "es": "Modo de búsqueda",
+        "en": "Search mode",
+    },
+    "search_mode_radius": {
+        "es": "Dentro de un radio",
+        "en": "Within a radius",
+    },
+    "search_mode_nearest": {
+        "es": "Las N más cercanas",
+        "en": "Nearest N",
+    },
+    "sidebar_nearest_k_label": {
+        "es": "Número de haciendas",
+        "en": "Number of haciendas",
+    },
     "sidebar_radius_label": {
         "es": "Radio (km)",
         "en": "Radius (km)",
@@ -81,6 +169,10 @@ TEXTS: Dict[str, Dict[str, str]] = {
         "es": "Todos los filtros se aplican únicamente a las haciendas dentro del radio seleccionado.",
         "en": "All filters apply only to haciendas inside the selected radius.",
     },
+    "sidebar_filters_nearest_note": {
+        "es": "Se muestran las haciendas más cercanas que cumplen todos los filtros, a cualquier distancia.",
+        "en": "Shows the closest haciendas that pass all filters, at any distance.",
+    },
     # New: quick help in the sidebar
     "sidebar_help_header": {
         "es": "Ayuda rápida",
@@ -90,7 +182,7 @@ TEXTS: Dict[str, Dict[str, str]] = {
         "es": (
             "- Selecciona el idioma en la parte superior.\n"
             "- Ajusta el centro de búsqueda con latitud/longitud o usa el botón para reiniciar a Amalucan.\n"
-            "- Define el radio en kilómetros con el deslizador.\n"
+            "- Define el radio en kilómetros con el deslizador, o elige «Las N más cercanas» para ver las N haciendas más próximas sin importar la distancia.\n"
             "- Aplica filtros por nombre, región o presencia de foto.\n"
             "- Explora resultados en la tabla y en el mapa interactivo.\n"
             "- Haz clic en una hacienda para ver detalles y foto (si disponible).\n"
@@ -99,16 +191,32 @@ TEXTS: Dict[str, Dict[str, str]] = {
         "en": (
             "- Choose your language at the top.\n"
             "- Set the search center with latitude/longitude or reset to Amalucan.\n"
-            "- Adjust the radius in kilometers using the slider.\n"
+            "- Adjust the radius in kilometers using the slider, or choose \"Nearest N\" to see the N closest haciendas at any distance.\n"
             "- Apply filters by name, region, or photo availability.\n"
             "- Explore results in the table and interactive map.\n"
             "- Click a hacienda to view details and photo (if available).\n"
             "- Export results as CSV, GeoJSON, or GPX."
         ),
     },
-    "sidebar_filter_name_contains": {
-        "es": "Filtrar por nombre (contiene)",
-        "en": "Filter by name (contains)",
+    "sidebar_filter_name": {
+        "es": "Filtrar por nombre (sin distinguir acentos ni mayúsculas)",
+        "en": "Filter by name (ignores accents and case)",
+    },
+    "sidebar_filter_name_mode": {
+        "es": "Tipo de coincidencia",
+        "en": "Match type",
+    },
+    "name_mode_contains": {
+        "es": "Contiene",
+        "en": "Contains",
+    },
+    "name_mode_prefix": {
+        "es": "Palabra que empieza con",
+        "en": "Word starts with",
+    },
+    "name_mode_fuzzy": {
+        "es": "Aproximada (tolera errores de escritura)",
+        "en": "Approximate (tolerates typos)",
     },
     "sidebar_filter_region": {
         "es": "Filtrar por región (opcional)",
@@ -134,6 +242,22 @@ TEXTS: Dict[str, Dict[str, str]] = {
         "es": "Resultados dentro del radio",
         "en": "Results within radius",
     },
+    "results_nearest_header": {
+        "es": "Las {k} haciendas más cercanas",
+        "en": "Nearest {k} haciendas",
+    },
+    "results_nearest_caption_template": {
+        "es": (
+            "Centro: ({lat:.6f}, {lon:.6f}) • "
+            "La más lejana a {farthest:.1f} km • "
+            "Coincidencias: {total} (con foto: {with_photo}, sin foto: {without_photo})"
+        ),
+        "en": (
+            "Center: ({lat:.6f}, {lon:.6f}) • "
+            "Farthest at {farthest:.1f} km • "
+            "Matches: {total} (with photo: {with_photo}, without photo: {without_photo})"
+        ),
+    },
     "results_caption_template": {
         "es": (
             "Centro: ({lat:.6f}, {lon:.6f}) • "
@@ -182,10 +306,62 @@ TEXTS: Dict[str, Dict[str, str]] = {
         "es": "Consejo: pasa el cursor sobre los marcadores para ver nombre, región y distancia.",
         "en": "Tip: hover markers to see name, region, and distance.",
     },
+    "map_cluster_toggle": {
+        "es": "Agrupar marcadores cercanos",
+        "en": "Group nearby markers",
+    },
+    "map_cluster_caption": {
+        "es": "Cada burbuja muestra cuántas haciendas agrupa; acerca el radio o desactiva el agrupamiento para verlas una por una.",
+        "en": "Each bubble shows how many haciendas it groups; narrow the radius or turn grouping off to see them one by one.",
+    },
+    "map_density_caption": {
+        "es": "Desde {km} km de radio, cada celda muestra cuántas haciendas contiene (más opaca: más haciendas; más verde: más con foto local). Desactiva el agrupamiento para verlas una por una.",
+        "en": "From a {km} km radius, each cell shows how many haciendas it holds (more opaque: more haciendas; greener: more with a local photo). Turn grouping off to see them one by one.",
+    },
+    "map_density_sharded_caption": {
+        "es": "El catálogo está dividido por regiones, así que a partir de {km} km de radio no hay celdas de densidad: cada burbuja muestra cuántas haciendas agrupa.",
+        "en": "The catalog is split by region, so from a {km} km radius there are no density cells: each bubble shows how many haciendas it groups.",
+    },
+    "region_stats_header": {
+        "es": "Por región",
+        "en": "By region",
+    },
+    "region_stats_count_col": {
+        "es": "Haciendas",
+        "en": "Haciendas",
+    },
+    "region_stats_photo_col": {
+        "es": "Con foto local",
+        "en": "With local photo",
+    },
     "map_stats": {
         "es": "Elementos visibles: {items} • Con foto local: {local} • Sin foto local: {without}",
         "en": "Visible items: {items} • With local photo: {local} • Without local photo: {without}",
     },
+    "tour_toggle": {
+        "es": "Planificar orden de visita",
+        "en": "Plan visiting order",
+    },
+    "tour_round_trip": {
+        "es": "Regresar al centro",
+        "en": "Return to the center",
+    },
+    "tour_caption": {
+        "es": "Ruta desde el centro: {stops} paradas, {km:.1f} km en línea recta.",
+        "en": "Route from the center: {stops} stops, {km:.1f} km as the crow flies.",
+    },
+    "tour_budget_caption": {
+        "es": "Mejor ruta encontrada en el tiempo disponible.",
+        "en": "Best route found within the time budget.",
+    },
+    "tour_too_many": {
+        "es": "La ruta se planifica para hasta {max} paradas; reduce el radio o añade filtros.",
+        "en": "Routes are planned for up to {max} stops; narrow the radius or add filters.",
+    },
+    "tour_start_name": {
+        "es": "Centro de búsqueda",
+        "en": "Search center",
+    },
     "selected_item_header": {
         "es": "Hacienda seleccionada (vista rápida)",
         "en": "Selected hacienda (quick view)",
@@ -242,6 +418,14 @@ TEXTS: Dict[str, Dict[str, str]] = {
         "es": "Descargar waypoints GPX",
         "en": "Download GPX waypoints",
     },
+    "export_kml_label": {
+        "es": "Descargar KML (Google Earth)",
+        "en": "Download KML (Google Earth)",
+    },
+    "export_route_gpx_label": {
+        "es": "Descargar ruta GPX (en orden de visita)",
+        "en": "Download GPX route (in visiting order)",
+    },
     "catalog_not_found_warning": {
         "es": "No se encontró catalog.json junto a la app. La versión pública necesita un catálogo exportado desde la app privada.",
         "en": "catalog.json was not found next to this app. The public version needs a catalog exported from the private app.",
@@ -281,90 +465,99 @@ def t(key: str, **fmt: Any) -> str:
 # Utils
 # --------------------------------------------------------------------
 
-def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Great-circle distance in km."""
-    R = 6371.0088
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlambda = math.radians(lon1 - lon2)
-    a = (
-        math.sin(dphi / 2) ** 2
-        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
-    )
-    return 2 * R * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+@st.cache_resource(show_spinner=False)
+def get_photo_index(directory: str) -> PhotoIndex:
+    """Process-wide listing of the local photo directory."""
+    return PhotoIndex(directory, ttl_s=PHOTO_INDEX_TTL_S)
 
 
-def clean_url(url: str | None) -> str | None:
-    if not url:
-        return None
-    u = str(url).strip()
-    if not u:
-        return None
-    if re.match(r"^https?://", u):
-        return u
-    if u.startswith("//"):
-        return "https:" + u
-    return None
+@st.cache_resource(show_spinner=False)
+def get_mirror_index(directory: str) -> MirrorIndex:
+    """Process-wide photo_url -> mirrored file map."""
+    return MirrorIndex(directory)
 
 
-def has_photo_live(item: Dict[str, Any]) -> bool:
-    lp = str(item.get("local_photo_path") or "").strip()
-    if not lp:
-        return False
-    return os.path.exists(lp)
+def mirrored_photo(url: str | None) -> str | None:
+    """Local copy of a remote photo, if it has been mirrored."""
+    mirror = get_mirror_index(PHOTO_MIRROR_DIR)
+    mirror.refresh()
+    return mirror.path_for(url)
 
 
-def load_catalog(path: str) -> Dict[str, Any]:
-    if not os.path.exists(path):
-        return {"items": []}
-    with open(path, "r", encoding="utf-8") as f:
-        try:
-            data = json.load(f)
-        except Exception:
-            return {"items": []}
-    if "items" not in data or not isinstance(data["items"], list):
-        return {"items": []}
-    return data
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _catalog_digest(path: str, mtime_ns: int, size: int) -> str:
+    """SHA-256 of the catalog file; only recomputed when mtime/size change."""
+    return file_sha256(path)
 
 
-def normalize_public_items(raw_items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _public_catalog_for_digest(path: str, digest: str) -> PublicCatalog | ShardedCatalog:
+    sharded = load_shards(
+        shards_path_for(path), source_sha256=digest, max_bytes=SHARD_CACHE_MAX_MB << 20
+    )
+    if sharded is not None:
+        return sharded
+    return load_public_catalog(path, get_photo_index(PHOTO_DIR), digest=digest)
+
+
+def get_public_catalog(path: str) -> PublicCatalog | ShardedCatalog:
     """
-    Normalize items for public display:
-    - Keep only KML-sourced, region-assigned items.
-    - Compute has_photo from local_photo_path.
-    - Clean photo_url.
+    Return the process-wide normalized catalog for `path`.
+    - One stat() per rerun; the file is re-hashed only if mtime/size change.
+    - Re-loaded only if the content hash changes: from up-to-date region
+      shards (opened lazily, see haciendas.shards) if there are any, else
+      from the compiled catalog if it is up to date, otherwise from the
+      JSON (see haciendas.engine.load_public_catalog).
     """
-    items: List[Dict[str, Any]] = []
-    for it in raw_items:
-        source = it.get("source") or "kml"
-        region = it.get("region")
-        if source != "kml":
-            continue
-        if region is None:
-            continue
-        region_str = str(region).strip()
-        if not region_str or region_str.lower() == "sin asignar":
-            continue
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return EMPTY_CATALOG
+    digest = _catalog_digest(path, stat.st_mtime_ns, stat.st_size)
+    return _public_catalog_for_digest(path, digest)
 
-        try:
-            lat = float(it["lat"])
-            lon = float(it["lon"])
-        except Exception:
-            continue
 
-        cleaned = dict(it)
-        cleaned["lat"] = lat
-        cleaned["lon"] = lon
-        cleaned["region"] = region_str
-        cleaned["name"] = str(it.get("name") or "Untitled").strip()
-        cleaned["photo_url"] = clean_url(it.get("photo_url"))
-        cleaned["has_photo"] = has_photo_live(it)
-        items.append(cleaned)
-    return items
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _photo_flags(_catalog: PublicCatalog, digest: str, photo_version: int) -> np.ndarray:
+    return photo_flags(_catalog, get_photo_index(PHOTO_DIR))
 
 
-def df_for_radius(
-    items: List[Dict[str, Any]],
+def get_photo_flags(catalog: PublicCatalog) -> np.ndarray:
+    """
+    Current local-photo flag per catalog item, shared across sessions.
+    Rebuilt only when the catalog or the photo directory listing changes.
+    """
+    version = get_photo_index(PHOTO_DIR).refresh()
+    return _photo_flags(catalog, catalog.digest, version)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _density_pyramid(_catalog: PublicCatalog, digest: str, photo_version: int) -> DensityPyramid:
+    return DensityPyramid.build(_catalog.columns, get_photo_flags(_catalog))
+
+
+def get_density_pyramid(catalog: PublicCatalog) -> DensityPyramid:
+    """
+    Per-tile, per-region counts of the catalog (see haciendas/density.py),
+    shared across sessions and rebuilt along with the photo flags.
+    """
+    version = get_photo_index(PHOTO_DIR).refresh()
+    return _density_pyramid(catalog, catalog.digest, version)
+
+
+@st.cache_resource(show_spinner=False)
+def get_query_cache() -> QueryCache:
+    """Process-wide LRU of query results, sized by DataFrame memory usage."""
+    return QueryCache(
+        max_entries=QUERY_CACHE_MAX_ENTRIES,
+        max_bytes=QUERY_CACHE_MAX_MB << 20,
+        ttl_s=QUERY_CACHE_TTL_S,
+        sizeof=lambda df: int(df.memory_usage(deep=True).sum()),
+    )
+
+
+def query_df(
+    catalog: PublicCatalog | ShardedCatalog,
     center_lat: float,
     center_lon: float,
     radius_km: float,
@@ -372,128 +565,104 @@ def df_for_radius(
     only_without_photo: bool,
     name_query: str,
     region_filter: str,
+    name_mode: str = "contains",
+    nearest_k: int = 0,
 ) -> pd.DataFrame:
     """
-    Build filtered DataFrame for public view:
-    - Applies radius filter.
-    - Optionally filters by name (contains).
-    - Optionally filters by region.
-    - Optionally filters by local-photo presence.
+    df_for_radius() (or df_for_nearest() when `nearest_k` > 0, ignoring
+    the radius), or their sharded variants, through the shared query cache.
+    - The center is quantized to the 6 decimals shown in the UI.
+    - The key also holds the catalog digest and photo index version, so
+      results never outlive the data they were computed from.
+    The returned DataFrame is shared between sessions: do not mutate it.
     """
-    rows: List[Dict[str, Any]] = []
-    name_query_lower = (name_query or "").strip().lower()
-
-    for it in items:
-        dkm = haversine_km(center_lat, center_lon, it["lat"], it["lon"])
-        if dkm > radius_km:
-            continue
-
-        photo_now = has_photo_live(it)
-
-        if only_with_photo and not photo_now:
-            continue
-        if only_without_photo and photo_now:
-            continue
-
-        if name_query_lower and name_query_lower not in it["name"].lower():
-            continue
-
-        if region_filter and region_filter != t("sidebar_region_all_option"):
-            if str(it.get("region") or "") != region_filter:
-                continue
-
-        rows.append(
-            {
-                "id": it.get("id") or f"{it['name']}\n{it['lon']},{it['lat']}",
-                "name": it["name"],
-                "region": it["region"],
-                "lat": it["lat"],
-                "lon": it["lon"],
-                "distance_km": round(dkm, 3),
-                "has_photo": photo_now,
-                "photo_url": it.get("photo_url"),
-                "local_photo_path": it.get("local_photo_path"),
-            }
-        )
-
-    df = pd.DataFrame(rows)
-    if not df.empty:
-        df = df.sort_values(by=["distance_km", "name"]).reset_index(drop=True)
-    return df
-
-
-def geodesic_circle_polygon(lat: float, lon: float, radius_km: float, n_points: int = 128):
-    """Return polygon (lon,lat) points approximating a geodesic circle."""
-    R = 6371.0088
-    d = radius_km / R
-    lat1 = math.radians(lat)
-    lon1 = math.radians(lon)
-    pts: List[Tuple[float, float]] = []
-    for k in range(n_points):
-        b = 2 * math.pi * (k / n_points)
-        lat2 = math.asin(
-            math.sin(lat1) * math.cos(d)
-            + math.cos(lat1) * math.sin(d) * math.cos(b)
-        )
-        lon2 = lon1 + math.atan2(
-            math.sin(b) * math.sin(d) * math.cos(lat1),
-            math.cos(d) - math.sin(lat1) * math.sin(lat2),
+    lat_q = round(float(center_lat), 6)
+    lon_q = round(float(center_lon), 6)
+    if region_filter == t("sidebar_region_all_option"):
+        region_filter = ""
+    key = (
+        catalog.digest,
+        get_photo_index(PHOTO_DIR).refresh(),
+        lat_q,
+        lon_q,
+        ("nearest", int(nearest_k)) if nearest_k > 0 else ("radius", float(radius_km)),
+        bool(only_with_photo),
+        bool(only_without_photo),
+        fold(name_query or "").strip(),
+        name_mode,
+        str(region_filter or ""),
+    )
+    filters = dict(
+        only_with_photo=only_with_photo,
+        only_without_photo=only_without_photo,
+        name_query=name_query,
+        region_filter=region_filter,
+        name_mode=name_mode,
+    )
+    if isinstance(catalog, ShardedCatalog):
+        photos = get_photo_index(PHOTO_DIR)
+        if nearest_k > 0:
+            return get_query_cache().get_or_compute(
+                key,
+                lambda: df_for_nearest_sharded(
+                    catalog, photos, lat_q, lon_q, int(nearest_k), **filters
+                ),
+            )
+        return get_query_cache().get_or_compute(
+            key,
+            lambda: df_for_radius_sharded(catalog, photos, lat_q, lon_q, radius_km, **filters),
         )
-        pts.append([math.degrees(lon2), math.degrees(lat2)])
-    pts.append(pts[0])
-    return pts
-
-
-def zoom_for_radius(radius_km: float) -> int:
-    if radius_km <= 5:
-        return 12
-    if radius_km <= 10:
-        return 11
-    if radius_km <= 25:
-        return 10
-    if radius_km <= 50:
-        return 9
-    if radius_km <= 100:
-        return 8
-    return 7
-
-
-def build_geojson(df_selected: pd.DataFrame) -> Dict[str, Any]:
-    features: List[Dict[str, Any]] = []
-    for _, row in df_selected.iterrows():
-        features.append(
-            {
-                "type": "Feature",
-                "geometry": {
-                    "type": "Point",
-                    "coordinates": [float(row["lon"]), float(row["lat"])],
-                },
-                "properties": {
-                    "name": row["name"],
-                    "region": row["region"],
-                    "has_photo": bool(row["has_photo"]),
-                },
-            }
+    if nearest_k > 0:
+        return get_query_cache().get_or_compute(
+            key,
+            lambda: df_for_nearest(
+                catalog,
+                photo_flags=get_photo_flags(catalog),
+                center_lat=lat_q,
+                center_lon=lon_q,
+                k=int(nearest_k),
+                **filters,
+            ),
         )
-    return {"type": "FeatureCollection", "features": features}
-
+    return get_query_cache().get_or_compute(
+        key,
+        lambda: df_for_radius(
+            catalog,
+            photo_flags=get_photo_flags(catalog),
+            center_lat=lat_q,
+            center_lon=lon_q,
+            radius_km=radius_km,
+            **filters,
+        ),
+    )
 
-def build_gpx(df_selected: pd.DataFrame) -> str:
-    from xml.sax.saxutils import escape
 
-    lines: List[str] = [
-        '<?xml version="1.0" encoding="UTF-8"?>',
-        '<gpx version="1.1" creator="HaciendasNearbyPublic" xmlns="http://www.topografix.com/GPX/1/1">',
-    ]
-    for _, row in df_selected.iterrows():
-        lat = float(row["lat"])
-        lon = float(row["lon"])
-        name = escape(str(row["name"]))
-        lines.append(f'  <wpt lat="{lat:.6f}" lon="{lon:.6f}">')
-        lines.append(f"    <name>{name}</name>")
-        lines.append("  </wpt>")
-    lines.append("</gpx>")
-    return "\n".join(lines)
+@st.cache_data(show_spinner=False, max_entries=32)
+def export_payload(
+    kind: str, catalog_digest: str, result_fingerprint: str, _df: pd.DataFrame
+) -> bytes:
+    """One export of a result set, built on first download and shared by fingerprint."""
+    return build_export(kind, _df)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def get_tour(
+    catalog_digest: str,
+    result_fingerprint: str,
+    start_lat: float,
+    start_lon: float,
+    round_trip: bool,
+    _df: pd.DataFrame,
+) -> Tour:
+    """Visiting order of a result set from the center, shared by fingerprint."""
+    return plan_tour(
+        _df["lat"].to_numpy(dtype=float),
+        _df["lon"].to_numpy(dtype=float),
+        start_lat,
+        start_lon,
+        round_trip=round_trip,
+        time_budget_s=TOUR_TIME_BUDGET_S,
+    )
 
 
 # --------------------------------------------------------------------
@@ -502,6 +671,15 @@ def build_gpx(df_selected: pd.DataFrame) -> str:
 
 st.set_page_config(page_title="Haciendas Nearby – Public", page_icon="🏛️", layout="wide")
 
+rerun_started = time.perf_counter()
+
+# Opt-in diagnostics (append ?debug=1 to the URL)
+show_debug = bool(st.query_params.get("debug"))
+if show_debug:
+    rerun_spans = metrics.start_collecting()
+else:
+    metrics.stop_collecting()
+
 # Language selector
 if "lang" not in st.session_state:
     st.session_state["lang"] = "es"
@@ -565,20 +743,49 @@ if st.sidebar.button(t("sidebar_reset_center_btn")):
     st.success(t("sidebar_reset_center_success", radius=DEFAULT_RADIUS_KM))
     st.rerun()
 
-radius_km = st.sidebar.slider(
-    t("sidebar_radius_label"),
-    min_value=1,
-    max_value=200,
-    value=int(st.session_state["radius_km"]),
-    step=1,
+search_mode = st.sidebar.radio(
+    t("sidebar_search_mode_label"),
+    options=list(SEARCH_MODES),
+    format_func=lambda m: t(f"search_mode_{m}"),
+    horizontal=True,
+    key="search_mode_public",
 )
-st.session_state["radius_km"] = float(radius_km)
+
+nearest_k = 0
+if search_mode == "nearest":
+    nearest_k = int(
+        st.sidebar.number_input(
+            t("sidebar_nearest_k_label"),
+            min_value=1,
+            max_value=MAX_NEAREST_K,
+            value=DEFAULT_NEAREST_K,
+            step=1,
+            key="nearest_k_public",
+        )
+    )
+else:
+    radius_km = st.sidebar.slider(
+        t("sidebar_radius_label"),
+        min_value=1,
+        max_value=200,
+        value=int(st.session_state["radius_km"]),
+        step=1,
+    )
+    st.session_state["radius_km"] = float(radius_km)
 
 # Sidebar: filters
 st.sidebar.header(t("sidebar_filters_header"))
-st.sidebar.caption(t("sidebar_filters_radius_note"))
+st.sidebar.caption(
+    t("sidebar_filters_nearest_note") if nearest_k else t("sidebar_filters_radius_note")
+)
 
-name_query = st.sidebar.text_input(t("sidebar_filter_name_contains"), value="")
+name_query = st.sidebar.text_input(t("sidebar_filter_name"), value="")
+name_mode = st.sidebar.selectbox(
+    t("sidebar_filter_name_mode"),
+    options=list(NAME_MODES),
+    format_func=lambda m: t(f"name_mode_{m}"),
+    key="name_mode_public",
+)
 
 only_with_photo = st.sidebar.checkbox(
     t("sidebar_filter_only_with_photo"), value=False, key="f_with_photo_public"
@@ -591,17 +798,15 @@ if only_with_photo and only_without_photo:
     only_without_photo = False
     st.sidebar.info(t("sidebar_conflicting_photo_filters"))
 
-# Load and normalize catalog
-catalog = load_catalog(CATALOG_JSON)
-raw_items = catalog.get("items", [])
-items_public = normalize_public_items(raw_items)
+# Load and normalize catalog (shared across sessions, see get_public_catalog)
+public_catalog = get_public_catalog(CATALOG_JSON)
 
-if not items_public:
+if not len(public_catalog):
     st.warning(t("catalog_not_found_warning"))
     st.stop()
 
 # Region options based on public items
-regions = sorted({it["region"] for it in items_public if it.get("region")})
+regions = list(public_catalog.regions)
 region_all_label = t("sidebar_region_all_option")
 region_options = [region_all_label] + regions
 region_filter = st.sidebar.selectbox(
@@ -614,15 +819,13 @@ region_filter = st.sidebar.selectbox(
 st.sidebar.header(t("sidebar_help_header"))
 st.sidebar.markdown(t("sidebar_help_text"))
 
-# Main layout
-left, right = st.columns((1, 1))
-
-# ------------------ Left: table & basic stats ------------------
-with left:
-    st.subheader(t("results_header"))
-
-    df = df_for_radius(
-        items_public,
+# Everything below depends on the sidebar inputs through this one query
+# (shared across sessions, see query_df), so changing them reruns the
+# whole page. Each section is then a fragment: its own widgets rerun only
+# that section, with the inputs it was last called with.
+with metrics.span("app.query"):
+    df = query_df(
+        public_catalog,
         center_lat=center_lat,
         center_lon=center_lon,
         radius_km=radius_km,
@@ -630,254 +833,380 @@ with left:
         only_without_photo=only_without_photo,
         name_query=name_query,
         region_filter=region_filter,
+        name_mode=name_mode,
+        nearest_k=nearest_k,
     )
 
-    if df.empty:
-        st.info(t("no_items_in_radius_info"))
-    else:
-        n_total = len(df)
-        n_with_photo = int(df["has_photo"].sum())
-        n_without_photo = n_total - n_with_photo
-
-        st.caption(
-            t(
-                "results_caption_template",
-                lat=center_lat,
-                lon=center_lon,
-                radius=radius_km,
-                total=n_total,
-                with_photo=n_with_photo,
-                without_photo=n_without_photo,
-            )
-        )
+# Wide radius searches: exact per-tile and per-region counts from the
+# density pyramid, in time proportional to the tiles in view. Shards have
+# no pyramid (building one would open every shard): their region table
+# comes from the result itself, and the map groups markers instead.
+wide_view = (
+    not df.empty
+    and not nearest_k
+    and radius_km >= DENSITY_MIN_RADIUS_KM
+    and not (name_query or "").strip()
+)
+density_view = None
+region_stats = None
+if wide_view and isinstance(public_catalog, PublicCatalog):
+    density_view = get_density_pyramid(public_catalog).view(
+        round(float(center_lat), 6),
+        round(float(center_lon), 6),
+        radius_km,
+        zoom_for_radius(radius_km),
+        region_code=(
+            None
+            if region_filter == region_all_label
+            else public_catalog.columns.region_index(region_filter)
+        ),
+        only_with_photo=only_with_photo,
+        only_without_photo=only_without_photo,
+    )
+    region_stats = density_view.region_stats()
+elif wide_view:
+    region_stats = result_region_stats(df)
 
-        # Human-friendly table (no rating)
-        table_df = pd.DataFrame(
+
+def show_timings(spans: List[List[Any]], caption: str) -> None:
+    """The ?debug=1 table of collected [name, ms, depth] spans."""
+    st.caption(caption)
+    st.dataframe(
+        pd.DataFrame(
             {
-                t("table_name_col"): df["name"],
-                t("table_region_col"): df["region"],
-                t("table_distance_col"): df["distance_km"],
-                t("table_lat_col"): df["lat"],
-                t("table_lon_col"): df["lon"],
-                t("table_has_photo_col"): df["has_photo"].map(
-                    lambda v: "Yes" if v else "No"
-                ),
+                "span": ["\u00a0\u00a0" * depth + name for name, _, depth in spans],
+                "ms": [ms for _, ms, _ in spans],
             }
-        )
-        st.dataframe(table_df, width="stretch")
+        ),
+        hide_index=True,
+        width="stretch",
+    )
 
-# ------------------ Right: map ------------------
-with right:
-    st.subheader(t("map_header"))
-    st.caption(t("map_tip_caption"))
 
-    if df.empty:
-        st.info(t("no_items_in_radius_info"))
-    else:
-        n_local = int(df["has_photo"].sum())
-        n_without = len(df) - n_local
-        st.write(
-            t(
-                "map_stats",
-                items=len(df),
-                local=n_local,
-                without=n_without,
-            )
-        )
+def timed_fragment(name: str) -> Callable[[Callable], Callable]:
+    """
+    st.fragment whose runs are an `app.section.<name>` span. A fragment
+    rerun skips the top-level collector, so with ?debug=1 the fragment
+    collects its own spans: a full run files them in the sidebar panel, a
+    rerun of just this fragment lists them under it.
+    """
 
-        # Prepare map data
-        df_map = df.copy()
-        df_map["color_r"] = df_map["has_photo"].map(lambda v: 34 if v else 160)
-        df_map["color_g"] = df_map["has_photo"].map(lambda v: 197 if v else 160)
-        df_map["color_b"] = df_map["has_photo"].map(lambda v: 94 if v else 160)
+    def wrap(fn: Callable) -> Callable:
+        @st.fragment
+        @wraps(fn)
+        def inner(*args: Any, **kwargs: Any) -> None:
+            if not show_debug:
+                with metrics.span(f"app.section.{name}"):
+                    fn(*args, **kwargs)
+                return
+            full_run = metrics.is_collecting()
+            with metrics.collecting() as spans, metrics.span(f"app.section.{name}"):
+                fn(*args, **kwargs)
+            if not full_run:
+                with st.expander(f"Debug: {name}", expanded=True):
+                    show_timings(spans, "Timings of this fragment rerun (ms)")
 
-        view_state = pdk.ViewState(
-            latitude=center_lat,
-            longitude=center_lon,
-            zoom=zoom_for_radius(radius_km),
-        )
+        return inner
 
-        # Radius circle
-        circle_pts = geodesic_circle_polygon(center_lat, center_lon, radius_km, n_points=128)
-        polygon_data = [{"polygon": circle_pts, "name": "Search Radius"}]
-        circle_layer = pdk.Layer(
-            "PolygonLayer",
-            data=polygon_data,
-            get_polygon="polygon",
-            get_fill_color=[59, 130, 246, 40],
-            get_line_color=[59, 130, 246, 160],
-            line_width_min_pixels=1,
-        )
+    return wrap
 
-        center_layer = pdk.Layer(
-            "ScatterplotLayer",
-            data=pd.DataFrame(
-                [
-                    {
-                        "lat": center_lat,
-                        "lon": center_lon,
-                        "color_r": 220,
-                        "color_g": 38,
-                        "color_b": 38,
-                    }
-                ]
-            ),
-            get_position="[lon, lat]",
-            get_fill_color="[color_r, color_g, color_b, 220]",
-            get_radius=350,
-            radius_min_pixels=8,
-            pickable=False,
-        )
 
-        markers_layer = pdk.Layer(
-            "ScatterplotLayer",
-            data=df_map,
-            get_position="[lon, lat]",
-            get_fill_color="[color_r, color_g, color_b, 200]",
-            get_radius=300,
-            radius_min_pixels=6,
-            radius_max_pixels=100,
-            get_line_color=[0, 0, 0, 180],
-            line_width_min_pixels=1.5,
-            pickable=True,
+# ------------------ Left: table & basic stats ------------------
+@timed_fragment("results")
+def results_section(
+    df: pd.DataFrame,
+    region_stats: pd.DataFrame | None,
+    center_lat: float,
+    center_lon: float,
+    radius_km: float,
+    nearest_k: int,
+) -> None:
+    if nearest_k:
+        st.subheader(t("results_nearest_header", k=nearest_k))
+    else:
+        st.subheader(t("results_header"))
+
+    if df.empty:
+        st.info(t("no_items_in_radius_info"))
+        return
+
+    n_total = len(df)
+    n_with_photo = int(df["has_photo"].sum())
+    n_without_photo = n_total - n_with_photo
+
+    if nearest_k:
+        caption = t(
+            "results_nearest_caption_template",
+            lat=center_lat,
+            lon=center_lon,
+            farthest=float(df["distance_km"].max()),
+            total=n_total,
+            with_photo=n_with_photo,
+            without_photo=n_without_photo,
+        )
+    else:
+        caption = t(
+            "results_caption_template",
+            lat=center_lat,
+            lon=center_lon,
+            radius=radius_km,
+            total=n_total,
+            with_photo=n_with_photo,
+            without_photo=n_without_photo,
+        )
+    st.caption(caption)
+
+    if region_stats is not None:
+        st.markdown(f"**{t('region_stats_header')}**")
+        stats = region_stats
+        st.dataframe(
+            pd.DataFrame(
+                {
+                    t("table_region_col"): stats["region"],
+                    t("region_stats_count_col"): stats["count"],
+                    t("region_stats_photo_col"): stats["with_photo"],
+                }
+            ),
+            hide_index=True,
+            width="stretch",
         )
 
-        tooltip = {
-            "html": (
-                "<b>{name}</b><br>"
-                "Region: {region}<br>"
-                "Distance: {distance_km} km"
+    # Human-friendly table (no rating)
+    table_df = pd.DataFrame(
+        {
+            t("table_name_col"): df["name"],
+            t("table_region_col"): df["region"],
+            t("table_distance_col"): df["distance_km"],
+            t("table_lat_col"): df["lat"],
+            t("table_lon_col"): df["lon"],
+            t("table_has_photo_col"): df["has_photo"].map(
+                lambda v: "Yes" if v else "No"
             ),
-            "style": {"backgroundColor": "white", "color": "black"},
         }
+    )
+    st.dataframe(table_df, width="stretch")
+
+
+# ------------------ Right: map ------------------
+@timed_fragment("map")
+def map_section(
+    df: pd.DataFrame,
+    density_view: DensityView | None,
+    center_lat: float,
+    center_lon: float,
+    radius_km: float,
+    nearest_k: int,
+    density_unavailable: bool = False,
+) -> None:
+    st.subheader(t("map_header"))
+    st.caption(t("map_tip_caption"))
 
-        deck = pdk.Deck(
-            layers=[circle_layer, markers_layer, center_layer],
-            initial_view_state=view_state,
-            tooltip=tooltip,
-            map_style="light",
+    if df.empty:
+        st.info(t("no_items_in_radius_info"))
+        return
+
+    n_local = int(df["has_photo"].sum())
+    n_without = len(df) - n_local
+    st.write(
+        t(
+            "map_stats",
+            items=len(df),
+            local=n_local,
+            without=n_without,
         )
+    )
+
+    cluster = st.toggle(t("map_cluster_toggle"), value=True, key="map_cluster_public")
+    if cluster and density_view is not None:
+        st.caption(t("map_density_caption", km=DENSITY_MIN_RADIUS_KM))
+    elif cluster and density_unavailable:
+        st.caption(t("map_density_sharded_caption", km=DENSITY_MIN_RADIUS_KM))
+    elif cluster and len(df) > CLUSTER_MIN_POINTS:
+        st.caption(t("map_cluster_caption"))
+
+    # The route and its GPX export live here, next to the toggle that
+    # plans them, so changing it reruns this section only.
+    tour = None
+    if st.toggle(t("tour_toggle"), value=False, key="tour_public"):
+        round_trip = st.checkbox(t("tour_round_trip"), value=False, key="tour_round_trip_public")
+        if len(df) > MAX_TOUR_STOPS:
+            st.info(t("tour_too_many", max=MAX_TOUR_STOPS))
+        else:
+            with metrics.span("app.tour"):
+                tour = get_tour(
+                    public_catalog.digest, fingerprint(df), center_lat, center_lon, round_trip, df
+                )
+            st.caption(t("tour_caption", stops=len(df), km=tour.total_km))
+            if not tour.converged:
+                st.caption(t("tour_budget_caption"))
+            start_name = t("tour_start_name")
+            st.download_button(
+                t("export_route_gpx_label"),
+                lambda: build_route_gpx(
+                    df.iloc[tour.order],
+                    tour.start_lat,
+                    tour.start_lon,
+                    round_trip=tour.round_trip,
+                    start_name=start_name,
+                ),
+                file_name=ROUTE_GPX_FILE,
+                mime="application/gpx+xml",
+                key="export_route_gpx_public",
+                on_click="ignore",
+            )
+
+    # In "nearest" mode the circle encloses the farthest result.
+    map_radius_km = float(df["distance_km"].max()) if nearest_k else radius_km
+    route = tour.path(df["lat"].to_numpy(), df["lon"].to_numpy()) if tour else None
+    deck = build_deck(
+        df,
+        center_lat,
+        center_lon,
+        map_radius_km,
+        cluster=cluster,
+        route=route,
+        density=density_view if cluster else None,
+    )
+    with metrics.span("map.render"):
         st.pydeck_chart(deck, height=600, width="stretch")
 
+
 # ------------------ Selected hacienda quick view ------------------
-st.subheader(t("selected_item_header"))
+@timed_fragment("quick_view")
+def quick_view_section(df: pd.DataFrame) -> None:
+    st.subheader(t("selected_item_header"))
 
-if df.empty:
-    st.caption(t("selected_item_need_selection"))
-else:
-    names_for_preview = list(df["name"])
-    if not names_for_preview:
+    if df.empty:
         st.caption(t("selected_item_need_selection"))
-    else:
-        sel_name = st.selectbox(
-            t("selected_choose_label"),
-            options=sorted(set(names_for_preview)),
-            key="sel_prev_name_public",
-        )
-        subset = df[df["name"] == sel_name]
-        options = [
-            f"{r['name']} @ ({float(r['lat']):.6f},{float(r['lon']):.6f})"
-            for _, r in subset.iterrows()
-        ]
-        sel_label = st.selectbox(
-            "Pinpoint", options=options, key="sel_prev_id_public"
+        return
+
+    # Items are selected by their stable ID (see catalog.iter_public_items),
+    # so the choice survives reruns and duplicate names, and the row is
+    # found through a hash index instead of a scan.
+    ids = df["id"].to_numpy()
+    names = df["name"].to_numpy()
+    sel_name = st.selectbox(
+        t("selected_choose_label"),
+        options=sorted(set(names.tolist())),
+        key="sel_prev_name_public",
+    )
+    same_name = names == sel_name
+    labels = {
+        item_id: f"{sel_name} @ ({lat:.6f},{lon:.6f})"
+        for item_id, lat, lon in zip(
+            ids[same_name].tolist(),
+            df["lat"].to_numpy()[same_name].tolist(),
+            df["lon"].to_numpy()[same_name].tolist(),
         )
+    }
+    sel_id = st.selectbox(
+        "Pinpoint", options=list(labels), format_func=labels.get, key="sel_prev_id_public"
+    )
+
+    with metrics.span("quick_view.lookup"):
+        # IDs are unique per catalog, so this is one row or none.
+        pos = pd.Index(ids).get_indexer([sel_id])[0] if sel_id in labels else -1
+        row = df.iloc[pos] if pos >= 0 else None
+    if row is None:
+        st.caption(t("selected_item_need_selection"))
+        return
+
+    st.markdown(f"**{row['name']}**")
+    st.write(f"{t('selected_region_label')}: {row['region']}")
+    st.write(
+        f"{t('selected_coords_label')}: {float(row['lat']):.6f}, {float(row['lon']):.6f}"
+    )
+    st.write(
+        f"{t('selected_distance_label')}: {float(row['distance_km']):.3f} km"
+    )
 
+    # Photo preview (read-only)
+    shown = False
+    local_path = row.get("local_photo_path")
+    photo_url = clean_url(row.get("photo_url"))
+    if not get_photo_index(PHOTO_DIR).contains(local_path):
+        local_path = mirrored_photo(photo_url)
+    if local_path:
+        with metrics.span("quick_view.thumbnail"):
+            thumb = thumbnail_path(str(local_path), QUICK_VIEW_PHOTO_WIDTH, webp=True)
+        if PHOTO_BASE_URL:
+            thumb = static_url(PHOTO_BASE_URL, thumb) or thumb
+        st.image(thumb, width=QUICK_VIEW_PHOTO_WIDTH, caption=row["name"])
+        shown = True
+    elif photo_url:
         try:
-            latlon = sel_label.split("@")[1].strip().strip("()")
-            lat_s, lon_s = latlon.split(",")
-            sel_lat = round(float(lat_s), 6)
-            sel_lon = round(float(lon_s), 6)
+            st.image(photo_url, width=QUICK_VIEW_PHOTO_WIDTH, caption=row["name"])
+            shown = True
         except Exception:
-            st.error("Could not parse selected coordinates.")
-            sel_lat = sel_lon = None
-
-        row = next(
-            (
-                r
-                for _, r in df.iterrows()
-                if r["name"] == sel_name
-                and round(float(r["lat"]), 6) == sel_lat
-                and round(float(r["lon"]), 6) == sel_lon
-            ),
-            None,
-        )
+            shown = False
 
-        if row is None:
-            st.caption(t("selected_item_need_selection"))
-        else:
-            st.markdown(f"**{row['name']}**")
-            st.write(f"{t('selected_region_label')}: {row['region']}")
-            st.write(
-                f"{t('selected_coords_label')}: {float(row['lat']):.6f}, {float(row['lon']):.6f}"
-            )
-            st.write(
-                f"{t('selected_distance_label')}: {float(row['distance_km']):.3f} km"
-            )
+    if not shown:
+        st.info(t("selected_no_photo"))
+
+    if st.button(
+        t("use_hacienda_as_center_btn"),
+        key=f"use_center_public_{row['id']}",
+    ):
+        st.session_state["center_lat"] = float(row["lat"])
+        st.session_state["center_lon"] = float(row["lon"])
+        st.success(t("use_hacienda_as_center_success"))
+        st.rerun(scope="app")
 
-            # Photo preview (read-only)
-            shown = False
-            local_path = row.get("local_photo_path")
-            photo_url = clean_url(row.get("photo_url"))
-            if local_path and os.path.exists(str(local_path)):
-                st.image(local_path, width=360, caption=row["name"])
-                shown = True
-            elif photo_url:
-                try:
-                    st.image(photo_url, width=360, caption=row["name"])
-                    shown = True
-                except Exception:
-                    shown = False
-
-            if not shown:
-                st.info(t("selected_no_photo"))
-
-            if st.button(
-                t("use_hacienda_as_center_btn"),
-                key=f"use_center_public_{row['id']}",
-            ):
-                st.session_state["center_lat"] = float(row["lat"])
-                st.session_state["center_lon"] = float(row["lon"])
-                st.success(t("use_hacienda_as_center_success"))
-                st.rerun()
 
 # ------------------ Export (read-only) ------------------
-st.subheader(t("export_header"))
+@timed_fragment("export")
+def export_section(df: pd.DataFrame) -> None:
+    st.subheader(t("export_header"))
 
-if df.empty:
-    st.caption(t("export_none"))
-else:
-    # Export data is exactly the filtered df; only safe columns are included
-    export_df = df[["name", "lat", "lon", "region", "has_photo"]].copy()
-
-    # CSV
-    csv_bytes = export_df.to_csv(index=False).encode("utf-8")
-    st.download_button(
-        t("export_csv_label"),
-        csv_bytes,
-        file_name="haciendas_public.csv",
-        mime="text/csv",
-    )
+    if df.empty:
+        st.caption(t("export_none"))
+        return
+
+    # Export data is exactly the filtered df (safe columns only, see
+    # haciendas/export.py). Payloads are built only when a button is
+    # clicked, and downloading does not rerun the app.
+    result_fp = fingerprint(df)
+    for kind, (_, file_name, mime) in EXPORTERS.items():
+        st.download_button(
+            t(f"export_{kind}_label"),
+            lambda kind=kind: export_payload(kind, public_catalog.digest, result_fp, df),
+            file_name=file_name,
+            mime=mime,
+            key=f"export_{kind}_public",
+            on_click="ignore",
+        )
 
-    # GeoJSON
-    geojson_data = build_geojson(df)
-    geojson_bytes = json.dumps(geojson_data, ensure_ascii=False, indent=2).encode("utf-8")
-    st.download_button(
-        t("export_geojson_label"),
-        geojson_bytes,
-        file_name="haciendas_public.geojson",
-        mime="application/geo+json",
-    )
 
-    # GPX
-    gpx_text = build_gpx(df)
-    gpx_bytes = gpx_text.encode("utf-8")
-    st.download_button(
-        t("export_gpx_label"),
-        gpx_bytes,
-        file_name="haciendas_public.gpx",
-        mime="application/gpx+xml",
+left, right = st.columns((1, 1))
+with left:
+    results_section(df, region_stats, center_lat, center_lon, radius_km, nearest_k)
+with right:
+    map_section(
+        df,
+        density_view,
+        center_lat,
+        center_lon,
+        radius_km,
+        nearest_k,
+        density_unavailable=wide_view and density_view is None,
     )
+quick_view_section(df)
+export_section(df)
 
 # ------------------ Footer ------------------
 st.caption(t("footer_text"))
+
+metrics.observe("app.rerun", time.perf_counter() - rerun_started)
+if METRICS_FILE:
+    metrics.write_prometheus(METRICS_FILE, min_interval_s=METRICS_FILE_INTERVAL_S)
+
+if show_debug:
+    with st.sidebar.expander("Debug", expanded=True):
+        show_timings(rerun_spans, "Timings of this rerun (ms)")
+        st.caption("Query cache")
+        st.json(get_query_cache().stats())
+        if isinstance(public_catalog, ShardedCatalog):
+            st.caption("Open shards")
+            st.json(public_catalog.stats())
+    # Fragment reruns must not add to this run's (already shown) list.
+    metrics.stop_collecting()
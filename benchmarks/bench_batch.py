@@ -0,0 +1,104 @@
+"""
+Batch radius queries (haciendas/batch.py) against one df_for_radius()
+call per center.
+
+A synthetic catalog (clustered around Puebla towns) is written to a temp
+directory and compiled, so pool workers memory-map it. Centers are drawn
+around the same towns, each with a radius between 5 and 25 km. For each
+center count it reports the per-center loop, df_for_centers() in-process
+for a few chunk sizes, and with a process pool (pool start-up included),
+and checks that every variant returns exactly the loop's rows.
+
+Usage:
+    python benchmarks/bench_batch.py [--items 50000] [--centers 500 5000] [--chunks 64 256 1024] [--workers 2]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import TOWNS, write_synthetic_catalog  # noqa: E402
+from haciendas.batch import RESULT_COLUMNS, Centers, df_for_centers, process_pool  # noqa: E402
+from haciendas.compiled import compile_catalog, compiled_path_for  # noqa: E402
+from haciendas.engine import df_for_radius, load_public_catalog, photo_flags  # noqa: E402
+from haciendas.photos import PhotoIndex  # noqa: E402
+
+
+def random_centers(n: int, seed: int = 1) -> Centers:
+    rng = np.random.default_rng(seed)
+    town = rng.integers(0, len(TOWNS), size=n)
+    coords = np.array([(lat, lon) for lat, lon, _ in TOWNS])[town] + rng.normal(scale=0.3, size=(n, 2))
+    ids = np.empty(n, dtype=object)
+    ids[:] = [f"c{i}" for i in range(n)]
+    return Centers(id=ids, lat=coords[:, 0], lon=coords[:, 1], radius_km=rng.uniform(5, 25, size=n))
+
+
+def loop(catalog, flags, centers: Centers) -> pd.DataFrame:
+    frames = []
+    for cid, lat, lon, r in zip(centers.id, centers.lat, centers.lon, centers.radius_km):
+        df = df_for_radius(catalog, flags, lat, lon, r, False, False, "", "")
+        frames.append(pd.DataFrame({"center_id": cid, "hacienda_id": df["id"], "distance_km": df["distance_km"]}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def same(df: pd.DataFrame, expected: pd.DataFrame) -> bool:
+    # Values only: the loop's id column may be object where the batch one is str.
+    return len(df) == len(expected) and all(
+        np.array_equal(df[c].to_numpy(), expected[c].to_numpy()) for c in RESULT_COLUMNS
+    )
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, round(time.perf_counter() - t0, 3)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--items", type=int, default=50_000)
+    ap.add_argument("--centers", type=int, nargs="*", default=[500, 5000])
+    ap.add_argument("--chunks", type=int, nargs="*", default=[64, 256, 1024])
+    ap.add_argument("--workers", type=int, default=2)
+    args = ap.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "catalog.json")
+        write_synthetic_catalog(path, args.items)
+        photos = PhotoIndex(os.path.join(tmp, "fotos_public"))
+        compile_catalog(path, compiled_path_for(path), photos)
+        catalog = load_public_catalog(path, photos)
+        flags = photo_flags(catalog, photos)
+
+        for n in args.centers:
+            centers = random_centers(n)
+            expected, loop_s = timed(lambda: loop(catalog, flags, centers))
+            row = {"centers": n, "matches": len(expected), "loop_s": loop_s}
+            for chunk in args.chunks:
+                df, s = timed(lambda: df_for_centers(catalog, centers, chunk_centers=chunk))
+                row[f"batch_chunk{chunk}_s"] = s
+                row[f"batch_chunk{chunk}_same"] = same(df, expected)
+
+            def pooled():
+                with process_pool(args.workers, path, photos.directory) as pool:
+                    return df_for_centers(catalog, centers, executor=pool)
+
+            df, s = timed(pooled)
+            row[f"pool{args.workers}_s"] = s
+            row[f"pool{args.workers}_same"] = same(df, expected)
+            rows.append(row)
+    print(json.dumps({"items": args.items, "cpus": os.cpu_count(), "rows": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Wide-radius map: per-tile density counts vs. markers grouped per query.
+
+For each synthetic catalog size it times DensityPyramid.build(), then for
+each radius compares what the map needs at that radius:
+
+  cluster  df_for_radius() + build_deck(cluster=True): every match is read,
+           filtered, turned into a row and grouped by cluster_frame().
+  density  DensityPyramid.view() + build_deck(density=...): counts come
+           from the pyramid, in time proportional to the tiles in view.
+
+It also reports the deck JSON each sends to the browser, and checks that
+the density total and per-region counts equal those of df_for_radius().
+
+Usage:
+    python benchmarks/bench_density.py [--sizes 10000 200000 1000000] [--repeat 5]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import synthetic_items  # noqa: E402
+from haciendas.density import DensityPyramid  # noqa: E402
+from haciendas.engine import PublicCatalog, df_for_radius  # noqa: E402
+from haciendas.mapview import build_deck, zoom_for_radius  # noqa: E402
+
+CENTER = (19.050501, -98.135887)
+RADII = [50, 100, 200]
+
+
+def best_ms(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return round(1000 * best, 2)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 200_000, 1_000_000])
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    rows = []
+    for n in args.sizes:
+        catalog = PublicCatalog.from_items(synthetic_items(n), digest=f"synthetic-{n}")
+        flags = catalog.columns.has_photo
+        t0 = time.perf_counter()
+        pyramid = DensityPyramid.build(catalog.columns, flags)
+        build_ms = round(1000 * (time.perf_counter() - t0), 1)
+
+        for r in RADII:
+
+            def clustered():
+                df = df_for_radius(catalog, flags, *CENTER, r, False, False, "", "")
+                return df, build_deck(df, *CENTER, r, cluster=True)
+
+            def density():
+                view = pyramid.view(*CENTER, r, zoom_for_radius(r))
+                # df is not read when density is given.
+                return view, build_deck(df, *CENTER, r, cluster=True, density=view)
+
+            df, cluster_deck = clustered()
+            view, density_deck = density()
+            expected = df.groupby("region").size()
+            stats = view.region_stats().set_index("region")["count"]
+            assert view.total == len(df) and stats.sort_index().equals(expected.sort_index()), (n, r)
+            rows.append(
+                {
+                    "items": n,
+                    "radius_km": r,
+                    "matches": len(df),
+                    "tiles": len(view.count),
+                    "build_ms": build_ms,
+                    "cluster_ms": best_ms(clustered, args.repeat),
+                    "density_ms": best_ms(density, args.repeat),
+                    "cluster_deck_kb": round(len(cluster_deck.to_json()) / 1024, 1),
+                    "density_deck_kb": round(len(density_deck.to_json()) / 1024, 1),
+                }
+            )
+    print(json.dumps({"cpus": os.cpu_count(), "rows": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
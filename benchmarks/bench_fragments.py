@@ -0,0 +1,95 @@
+"""
+Rerun cost per interaction of app_public.py, served by `streamlit run`.
+
+streamlit.testing (bench_rerun.py) always reruns the whole script, so this
+drives a real server over its websocket the way the browser does (see
+benchmarks/stclient.py). Download buttons marked `ignore_rerun` send no
+rerun, as in the browser.
+
+For each interaction it reports the median/p95 time from request to
+`script_finished`, the elements redrawn and the bytes received. To
+compare with an earlier version of the app, write it next to the current
+one (so relative paths resolve) and pass it with --app, e.g.:
+
+    git show <rev>:app_public.py > app_before.py
+    python benchmarks/bench_fragments.py --app app_before.py
+
+Usage:
+    python benchmarks/bench_fragments.py [--app app_public.py] [--radius 25] [--repeat 20]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stclient import Session, free_port, start_server  # noqa: E402
+
+
+def summarize(runs: list) -> dict:
+    ms = sorted(r["ms"] for r in runs)
+    return {
+        "p50_ms": round(statistics.median(ms), 1),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 1),
+        "elements": round(statistics.median(r["elements"] for r in runs)),
+        "kb": round(statistics.median(r["bytes"] for r in runs) / 1024, 1),
+    }
+
+
+async def measure(port: int, radius: float, repeat: int) -> dict:
+    url = f"ws://127.0.0.1:{port}/_stcore/stream"
+    async with websockets.connect(url, subprotocols=["streamlit"], max_size=None) as ws:
+        s = Session(ws)
+        await s.rerun()
+        slider = next(n for n, (k, _, _) in s.widgets.items() if k == "slider")
+        text = next(n for n, (k, _, _) in s.widgets.items() if k == "text_input")
+        await s.set(slider, double_array_value=[radius])
+        names = list(s.widgets["sel_prev_name_public"][1].options)
+
+        interactions = {
+            "quick view: pick another hacienda": lambda i: s.set(
+                "sel_prev_name_public", string_value=names[(i + 1) % min(len(names), 5)]
+            ),
+            "map: group markers on/off": lambda i: s.set("map_cluster_public", bool_value=i % 2 == 1),
+            "map: plan visiting order on/off": lambda i: s.set("tour_public", bool_value=i % 2 == 0),
+            "export: download CSV": lambda i: s.click("export_csv_public"),
+            "sidebar: name filter": lambda i: s.set(text, string_value="" if i % 2 else "san"),
+            "sidebar: radius": lambda i: s.set(slider, double_array_value=[radius + (i % 2)]),
+        }
+        report = {}
+        for label, step in interactions.items():
+            runs = [await step(i) for i in range(repeat)]
+            report[label] = summarize(runs[1:] if repeat > 1 else runs)
+            # Back to the starting state before the next interaction.
+            await s.set("map_cluster_public", bool_value=True)
+            await s.set("tour_public", bool_value=False)
+            await s.set(text, string_value="")
+            await s.set(slider, double_array_value=[radius])
+        return report
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--app", default="app_public.py", help="script to serve, relative to the repo root")
+    ap.add_argument("--radius", type=float, default=25)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    port = free_port()
+    proc = start_server(args.app, port)
+    try:
+        report = asyncio.run(measure(port, args.radius, args.repeat))
+    finally:
+        proc.terminate()
+        proc.wait()
+    print(json.dumps({"app": args.app, "radius_km": args.radius, "interactions": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
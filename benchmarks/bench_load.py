@@ -0,0 +1,186 @@
+"""
+Concurrent visitors on one `streamlit run` process.
+
+For each session count, that many simulated visitors (benchmarks/stclient.py,
+one websocket each) connect at once and loop through a visit for
+--duration seconds, pausing between steps (exponential think time, mean
+--think seconds; 0 for a closed loop):
+
+  drag     move the radius slider through 3 values
+  type     filter by a name prefix, later clear it
+  region   pick a region, later go back to all
+  pick     choose another hacienda in the quick view
+  recenter use the selected hacienda as center, later reset the center
+  download fetch the CSV export (deferred: built on click)
+
+Each visitor starts at a random step. The report has one row per session
+count:
+- p50/p95/p99 of every request (from sending it to `script_finished`, or
+  to the downloaded body);
+- completed requests per second;
+- p95 of the first page load;
+- peak RSS of the server while that level ran;
+- app exceptions, failed downloads and visitors that failed outright.
+
+Usage:
+    python benchmarks/bench_load.py [--sessions 1 2 4 8 16 32] [--duration 20] [--think 1.0]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.stclient import Session, free_port, start_server  # noqa: E402
+
+STEPS = ["drag", "type", "region", "pick", "recenter", "download"]
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def sample_rss(pid: int, peak: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        peak[0] = max(peak[0], rss_mb(pid))
+        try:
+            await asyncio.wait_for(stop.wait(), 0.2)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def visitor(port: int, seed: int, deadline: float, think: float, out: dict) -> None:
+    rng = random.Random(seed)
+
+    async def pause(scale: float = 1.0) -> None:
+        if think > 0:
+            await asyncio.sleep(rng.expovariate(1 / (think * scale)))
+
+    def record(kind: str, result: dict) -> None:
+        if result["ms"] > 0:
+            out["latencies"].append(result["ms"])
+            out["by_step"].setdefault(kind, []).append(result["ms"])
+
+    await asyncio.sleep(rng.uniform(0, max(think, 0.1)))
+    url = f"ws://127.0.0.1:{port}/_stcore/stream"
+    async with websockets.connect(url, subprotocols=["streamlit"], max_size=None) as ws:
+        s = Session(ws, base_url=f"http://127.0.0.1:{port}")
+        first = await s.rerun()
+        out["first_load"].append(first["ms"])
+        slider = s.find("slider")
+        text = s.find("text_input")
+        region = s.find("selectbox", "Filtrar")
+        regions = list(s.proto(region).options)
+        radius = 25
+
+        step = rng.randrange(len(STEPS))
+        while time.perf_counter() < deadline:
+            kind = STEPS[step % len(STEPS)]
+            step += 1
+            if kind == "drag":
+                for delta in (5, 10, 15):
+                    record(kind, await s.set(slider, double_array_value=[radius + delta]))
+                    await pause(0.2)
+                await pause()
+                record(kind, await s.set(slider, double_array_value=[radius]))
+            elif kind == "type":
+                names = list(s.proto("sel_prev_name_public").options) or ["san"]
+                prefix = rng.choice(names).split()[0][:4].lower()
+                record(kind, await s.set(text, string_value=prefix))
+                await pause()
+                record(kind, await s.set(text, string_value=""))
+            elif kind == "region":
+                record(kind, await s.set(region, string_value=rng.choice(regions[1:])))
+                await pause()
+                record(kind, await s.set(region, string_value=regions[0]))
+            elif kind == "pick":
+                names = list(s.proto("sel_prev_name_public").options)
+                if names:
+                    record(kind, await s.set("sel_prev_name_public", string_value=rng.choice(names)))
+            elif kind == "recenter":
+                record(kind, await s.click(s.find("button", "use_center_public_")))
+                await pause()
+                record(kind, await s.click(s.find("button", "Reiniciar")))
+            elif kind == "download":
+                try:
+                    record(kind, await s.download("export_csv_public"))
+                except (OSError, RuntimeError):
+                    # e.g. the generated file already gone when fetched (404)
+                    out["download_errors"] += 1
+            await pause()
+        out["exceptions"] += s.exceptions
+
+
+async def level(port: int, pid: int, sessions: int, duration: float, think: float) -> dict:
+    out = {"latencies": [], "by_step": {}, "first_load": [], "exceptions": 0, "download_errors": 0}
+    peak = [rss_mb(pid)]
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(pid, peak, stop))
+    t0 = time.perf_counter()
+    deadline = t0 + duration
+    results = await asyncio.gather(
+        *(visitor(port, 1000 * sessions + i, deadline, think, out) for i in range(sessions)),
+        return_exceptions=True,
+    )
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    errors = [r for r in results if isinstance(r, Exception)]
+    if errors:
+        print(f"{len(errors)} visitor(s) failed, first: {errors[0]!r}", file=sys.stderr)
+    await sampler
+
+    ms = np.array(out["latencies"]) if out["latencies"] else np.zeros(1)
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "sessions": sessions,
+        "requests": len(out["latencies"]),
+        "per_s": round(len(out["latencies"]) / elapsed, 2),
+        "p50_ms": round(float(p50), 1),
+        "p95_ms": round(float(p95), 1),
+        "p99_ms": round(float(p99), 1),
+        "p95_ms_by_step": {k: round(float(np.percentile(v, 95)), 1) for k, v in sorted(out["by_step"].items())},
+        "first_load_p95_ms": round(float(np.percentile(out["first_load"] or [0.0], 95)), 1),
+        "rss_peak_mb": round(peak[0], 1),
+        "exceptions": out["exceptions"],
+        "download_errors": out["download_errors"],
+        "errors": len(errors),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--app", default="app_public.py", help="script to serve, relative to the repo root")
+    ap.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    ap.add_argument("--duration", type=float, default=20.0, help="seconds per session count")
+    ap.add_argument("--think", type=float, default=1.0, help="mean pause between steps (s)")
+    args = ap.parse_args()
+
+    port = free_port()
+    proc = start_server(args.app, port)
+    rows = []
+    try:
+        rss_idle = rss_mb(proc.pid)
+        for n in args.sessions:
+            rows.append(asyncio.run(level(port, proc.pid, n, args.duration, args.think)))
+            print(json.dumps(rows[-1]), file=sys.stderr)
+    finally:
+        proc.terminate()
+        proc.wait()
+    print(json.dumps({"app": args.app, "cpus": os.cpu_count(), "think_s": args.think,
+                      "rss_idle_mb": round(rss_idle, 1), "rows": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
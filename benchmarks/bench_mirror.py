@@ -0,0 +1,139 @@
+"""
+Photo mirror (haciendas/mirror.py) against a local stand-in image server.
+
+The stand-in serves N JPEG-looking bodies with ETag / Last-Modified,
+answers conditional requests with 304, adds a fixed latency per request,
+fails the first request for every tenth image with 503 (to exercise
+retries), and gives every fifth image the same bytes as another (to
+exercise content addressing). For each concurrency level it mirrors all
+URLs into an empty directory and reports time, requests, retries and
+files stored; then, at the highest level, a revalidation run (all 304)
+and a run within max_age (no requests).
+
+Usage:
+    python benchmarks/bench_mirror.py [--images 400] [--latency-ms 50] [--concurrency 1 8 32]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from haciendas.mirror import mirror_photos  # noqa: E402
+
+IMAGE_BYTES = 40_000
+LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+class StandIn(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency_s: float):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency_s = latency_s
+        self.lock = threading.Lock()
+        self.failed_once: set = set()
+        self.requests = 0
+        self.not_modified = 0
+
+    def url(self, i: int) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/img/{i}.jpg"
+
+
+def _body(i: int) -> bytes:
+    # Every fifth image repeats the one before it.
+    seed = i - 1 if i % 5 == 4 else i
+    block = hashlib.sha256(str(seed).encode()).digest()
+    return b"\xff\xd8\xff\xe0" + block * (IMAGE_BYTES // len(block))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StandIn
+
+    def do_GET(self) -> None:
+        srv = self.server
+        time.sleep(srv.latency_s)
+        i = int(self.path.rsplit("/", 1)[-1].split(".")[0])
+        with srv.lock:
+            srv.requests += 1
+            fail = i % 10 == 0 and i not in srv.failed_once
+            srv.failed_once.add(i)
+        if fail:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = _body(i)
+        etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        if self.headers.get("If-None-Match") == etag:
+            with srv.lock:
+                srv.not_modified += 1
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def run(server: StandIn, urls: list, directory: str, concurrency: int, max_age_s: float) -> dict:
+    before = server.requests, server.not_modified
+    t0 = time.perf_counter()
+    stats = asyncio.run(mirror_photos(urls, directory, concurrency=concurrency, max_age_s=max_age_s))
+    elapsed = time.perf_counter() - t0
+    files = sum(len(names) for d, _, names in os.walk(directory) if d != directory)
+    return {
+        "concurrency": concurrency,
+        "s": round(elapsed, 2),
+        "urls_per_s": round(len(urls) / elapsed, 1),
+        "requests": server.requests - before[0],
+        "fetched": stats.fetched,
+        "not_modified": stats.not_modified,
+        "fresh": stats.fresh,
+        "failed": stats.failed,
+        "retries": stats.retries,
+        "files": files,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--images", type=int, default=400)
+    ap.add_argument("--latency-ms", type=float, default=50.0)
+    ap.add_argument("--concurrency", type=int, nargs="*", default=[1, 8, 32])
+    args = ap.parse_args()
+
+    rows = []
+    for concurrency in args.concurrency:
+        server = StandIn(args.latency_ms / 1000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        urls = [server.url(i) for i in range(args.images)]
+        with tempfile.TemporaryDirectory() as tmp:
+            rows.append({"run": "cold", **run(server, urls, tmp, concurrency, max_age_s=0)})
+            if concurrency == max(args.concurrency):
+                rows.append({"run": "revalidate", **run(server, urls, tmp, concurrency, max_age_s=0)})
+                rows.append({"run": "within max_age", **run(server, urls, tmp, concurrency, 3600)})
+        server.shutdown()
+        server.server_close()
+    print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
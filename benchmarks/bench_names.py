@@ -0,0 +1,77 @@
+"""
+Name filter: trigram NameIndex vs. the previous linear scan.
+
+The linear scan is what df_for_radius did before the index: np.char.find
+of the lower-cased query over a lower-cased fixed-width name array. The
+index is accent-insensitive as well, so match counts can differ slightly
+(more matches from the index).
+
+Usage:
+    python benchmarks/bench_names.py [--sizes 1000 100000 1000000] [--repeat 20]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import synthetic_items  # noqa: E402
+from haciendas.search import NameIndex  # noqa: E402
+
+QUERIES = [
+    ("tehuacan", "contains"),
+    ("sanmar", "contains"),
+    ("chi", "prefix"),
+    ("tehucan", "fuzzy"),
+    # Too short for the trigram bound (bigram prefilter).
+    ("tehx", "fuzzy"),
+    ("tehuacxn", "fuzzy"),
+]
+
+
+def best_ms(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return round(1000 * best, 4)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    rows = []
+    for n in args.sizes:
+        names = [it["name"] for it in synthetic_items(n)]
+        lower = np.array([s.lower() for s in names], dtype=np.str_)
+        t0 = time.perf_counter()
+        index = NameIndex.build(names)
+        build_ms = round(1000 * (time.perf_counter() - t0), 1)
+        all_idx = np.arange(n)
+        for q, mode in QUERIES:
+            rows.append(
+                {
+                    "items": n,
+                    "query": q,
+                    "mode": mode,
+                    "index_build_ms": build_ms,
+                    "scan_matches": int((np.char.find(lower, q) >= 0).sum()),
+                    "index_matches": int(len(index.filter(all_idx, q, mode))),
+                    "scan_ms": best_ms(lambda: np.char.find(lower, q) >= 0, args.repeat),
+                    "index_ms": best_ms(lambda: index.filter(all_idx, q, mode), args.repeat),
+                }
+            )
+    print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
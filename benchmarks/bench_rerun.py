@@ -0,0 +1,80 @@
+"""
+Rerun latency and per-session memory of app_public.py.
+
+Drives N headless sessions (streamlit.testing AppTest) through slider
+changes and reports median/p95 rerun latency plus RSS growth per session.
+
+Usage:
+    python benchmarks/bench_rerun.py [--sessions 8] [--reruns 20]
+"""
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import time
+
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app_public.py")
+RADII = [10, 20, 30, 40, 25]
+
+
+def rss_mb() -> float:
+    """Current RSS in MB (Linux /proc), falling back to peak RSS."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sessions", type=int, default=8)
+    ap.add_argument("--reruns", type=int, default=20)
+    args = ap.parse_args()
+
+    # Run from the repo root so relative catalog/photo paths resolve.
+    os.chdir(os.path.dirname(APP))
+
+    # Warm-up session so module imports are not charged to the first session.
+    AppTest.from_file(APP, default_timeout=120).run()
+
+    rss_start = rss_mb()
+    sessions = []
+    first_runs = []
+    for _ in range(args.sessions):
+        at = AppTest.from_file(APP, default_timeout=120)
+        t0 = time.perf_counter()
+        at.run()
+        first_runs.append(time.perf_counter() - t0)
+        sessions.append(at)
+    rss_sessions = rss_mb()
+
+    latencies = []
+    for i in range(args.reruns):
+        for at in sessions:
+            at.sidebar.slider[0].set_value(RADII[i % len(RADII)])
+            t0 = time.perf_counter()
+            at.run()
+            latencies.append(time.perf_counter() - t0)
+
+    latencies.sort()
+    report = {
+        "sessions": args.sessions,
+        "reruns_per_session": args.reruns,
+        "first_run_ms": round(1000 * statistics.median(first_runs), 2),
+        "rerun_p50_ms": round(1000 * latencies[len(latencies) // 2], 2),
+        "rerun_p95_ms": round(1000 * latencies[int(len(latencies) * 0.95)], 2),
+        "rss_start_mb": round(rss_start, 1),
+        "rss_end_mb": round(rss_mb(), 1),
+        "rss_per_session_mb": round((rss_sessions - rss_start) / max(args.sessions, 1), 2),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
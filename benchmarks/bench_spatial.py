@@ -0,0 +1,75 @@
+"""
+Radius query time: grid index vs. full vectorized scan.
+
+For each synthetic catalog size and radius, times GridIndex.within()
+against the full-scan haversine and checks both return the same indices
+and distances.
+
+Usage:
+    python benchmarks/bench_spatial.py [--sizes 1000 100000 1000000] [--repeat 20]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic import synthetic_items  # noqa: E402
+from haciendas.columns import CatalogColumns  # noqa: E402
+from haciendas.spatial import GridIndex  # noqa: E402
+
+CENTER = (19.050501, -98.135887)
+RADII = [1, 5, 25, 50, 100, 200]
+
+
+def best_ms(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return round(1000 * best, 4)
+
+
+def full_scan(columns: CatalogColumns, lat: float, lon: float, radius_km: float):
+    dkm = columns.distances_km(lat, lon)
+    idx = np.flatnonzero(dkm <= radius_km)
+    return idx, dkm[idx]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    rows = []
+    for n in args.sizes:
+        columns = CatalogColumns.from_items(synthetic_items(n))
+        t0 = time.perf_counter()
+        grid = GridIndex.build(columns)
+        build_ms = round(1000 * (time.perf_counter() - t0), 2)
+        for r in RADII:
+            idx_g, d_g = grid.within(*CENTER, r)
+            idx_s, d_s = full_scan(columns, *CENTER, r)
+            assert np.array_equal(idx_g, idx_s) and np.array_equal(d_g, d_s), (n, r)
+            rows.append(
+                {
+                    "items": n,
+                    "radius_km": r,
+                    "matches": int(len(idx_g)),
+                    "grid_build_ms": build_ms,
+                    "scan_ms": best_ms(lambda: full_scan(columns, *CENTER, r), args.repeat),
+                    "grid_ms": best_ms(lambda: grid.within(*CENTER, r), args.repeat),
+                }
+            )
+    print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Cold-start cost: JSON catalog (parsed whole, or streamed) vs. compiled
+(memory-mapped) catalog, whole or split into region shards.
+
+For each synthetic catalog size, writes catalog JSON, its compiled form
+and its shards to a temp directory, then loads each in a fresh subprocess and
+reports wall time, RSS growth and peak RSS growth until the catalog is
+ready to query (columns + grid index built, one 25 km radius query
+answered). Modes:
+
+    json_list    json.load + normalize_public_items + from_items
+    json_stream  iter_catalog_items + from_item_stream (what the app does)
+    compiled     load_compiled
+    sharded      load_shards (manifest only); the query opens the shards
+                 whose bounding box is within 25 km
+
+Usage:
+    python benchmarks/bench_startup.py [--sizes 1000 100000 1000000]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import synthetic_items  # noqa: E402
+from haciendas.compiled import compile_catalog  # noqa: E402
+from haciendas.shards import build_shards  # noqa: E402
+from haciendas.photos import PhotoIndex  # noqa: E402
+
+# Runs in a fresh interpreter: argv = mode, path.
+_CHILD = r"""
+import json, os, sys, time
+sys.path.insert(0, {root!r})
+import numpy as np
+from haciendas.catalog import (
+    iter_catalog_items, iter_public_items, load_catalog, normalize_public_items
+)
+from haciendas.columns import CatalogColumns
+from haciendas.compiled import load_compiled
+from haciendas.photos import PhotoIndex
+from haciendas.shards import bbox_distance_km, load_shards
+from haciendas.spatial import GridIndex
+
+def status_kb(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+def rss_kb():
+    return status_kb("VmRSS")
+
+mode, path = sys.argv[1], sys.argv[2]
+rss0 = rss_kb()
+peak0 = status_kb("VmHWM")
+t0 = time.perf_counter()
+if mode == "json_list":
+    photos = PhotoIndex("fotos_public")
+    photos.refresh()
+    items = normalize_public_items(load_catalog(path)["items"], photos)
+    columns = CatalogColumns.from_items(items)
+    del items
+    grid = GridIndex.build(columns)
+elif mode == "json_stream":
+    photos = PhotoIndex("fotos_public")
+    photos.refresh()
+    columns = CatalogColumns.from_item_stream(
+        iter_public_items(iter_catalog_items(path), photos)
+    )
+    grid = GridIndex.build(columns)
+elif mode == "sharded":
+    sharded = load_shards(path)
+else:
+    columns, grid, names = load_compiled(path)
+load_s = time.perf_counter() - t0
+if mode == "sharded":
+    for info in sharded.shards:
+        if bbox_distance_km(19.050501, -98.135887, info.bbox) <= 25:
+            shard = sharded.open(info).catalog
+            idx, _ = shard.grid.within(19.050501, -98.135887, 25)
+            names = shard.columns.name[idx[:100]]
+else:
+    idx, _ = grid.within(19.050501, -98.135887, 25)
+    names = columns.name[idx[:100]]
+print(json.dumps({{"load_ms": round(1000 * load_s, 1),
+                  "ready_ms": round(1000 * (time.perf_counter() - t0), 1),
+                  "rss_mb": round((rss_kb() - rss0) / 1024, 1),
+                  "peak_mb": round((status_kb("VmHWM") - peak0) / 1024, 1)}}))
+"""
+
+
+def _size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def run_child(mode: str, path: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD.format(root=ROOT), mode, path],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+    )
+    return json.loads(out.stdout)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000])
+    args = ap.parse_args()
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            json_path = os.path.join(tmp, f"catalog_{n}.json")
+            hcat_path = os.path.join(tmp, f"catalog_{n}.hcat")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump({"items": synthetic_items(n)}, f, ensure_ascii=False)
+            shards_dir = os.path.join(tmp, f"catalog_{n}.shards")
+            photos = PhotoIndex(os.path.join(ROOT, "fotos_public"))
+            compile_catalog(json_path, hcat_path, photos)
+            build_shards(json_path, shards_dir, photos)
+            for mode, path in (
+                ("json_list", json_path),
+                ("json_stream", json_path),
+                ("compiled", hcat_path),
+                ("sharded", shards_dir),
+            ):
+                row = {"items": n, "format": mode, "file_mb": round(_size(path) / 1e6, 1)}
+                row.update(run_child(mode, path))
+                rows.append(row)
+    print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
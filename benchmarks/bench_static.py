@@ -0,0 +1,186 @@
+"""
+Photo delivery: Streamlit's media endpoint vs haciendas/static.py.
+
+Quick-view thumbnails for the first N photos in fotos_public/ are built
+into a temporary cache directory and delivered two ways:
+
+  media   st.image(path): the bytes are loaded into Streamlit's media file
+          storage and served from /media/<id> (the real route, run with
+          uvicorn); responses carry no ETag, Last-Modified or Cache-Control.
+  static  static_url(...): served by haciendas.static from /thumbs/...
+
+A small client models a browser cache (fresh while within max-age, then
+revalidated with If-None-Match / If-Modified-Since). A session views the N
+items once, then goes back and forth between them (3 more passes in shuffled
+order); a second session a day later repeats the back-and-forth with the
+cache kept. For each it reports requests, 304s and body bytes per view, and
+the server-side time per view to turn the path into what st.image receives.
+
+Usage:
+    python benchmarks/bench_static.py [--photos 40] [--passes 3]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from haciendas.static import make_server, static_url  # noqa: E402
+from haciendas.thumbs import thumbnail_path  # noqa: E402
+
+WIDTH = 360
+DAY_S = 86_400
+
+
+class BrowserCache:
+    """Private HTTP cache keyed by URL, honoring max-age and validators."""
+
+    def __init__(self):
+        self.entries: dict = {}
+        self.requests = self.not_modified = self.body_bytes = 0
+
+    def get(self, url: str, now: float) -> None:
+        entry = self.entries.get(url)
+        if entry and now < entry["expires"]:
+            return
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+        parts = urlsplit(url)
+        conn = http.client.HTTPConnection(parts.hostname, parts.port)
+        conn.request("GET", parts.path, headers=headers)
+        resp = conn.getresponse()
+        body = resp.read()
+        conn.close()
+        self.requests += 1
+        self.body_bytes += len(body)
+        if resp.status == 304:
+            self.not_modified += 1
+        max_age = 0
+        for directive in (resp.getheader("Cache-Control") or "").split(","):
+            name, _, value = directive.strip().partition("=")
+            if name == "max-age":
+                max_age = int(value)
+        self.entries[url] = {
+            "etag": resp.getheader("ETag") or (entry or {}).get("etag"),
+            "last_modified": resp.getheader("Last-Modified") or (entry or {}).get("last_modified"),
+            "expires": now + max_age,
+        }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_media_server(thumbs: list) -> tuple:
+    """Streamlit's /media route over a storage holding `thumbs`; returns (server, urls, ms per load)."""
+    import uvicorn
+    from starlette.applications import Starlette
+    from streamlit.runtime.media_file_storage import MediaFileKind
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.web.server.starlette.starlette_routes import create_media_routes
+
+    storage = MemoryMediaFileStorage("/media")
+    t0 = time.perf_counter()
+    urls = [storage.get_url(storage.load_and_get_id(p, "image/webp", MediaFileKind.MEDIA)) for p in thumbs]
+    load_ms = 1000 * (time.perf_counter() - t0) / len(thumbs)
+    port = free_port()
+    server = uvicorn.Server(
+        uvicorn.Config(Starlette(routes=create_media_routes(storage, None)), port=port, log_level="error")
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, [f"http://127.0.0.1:{port}{u}" for u in urls], load_ms
+
+
+def browse(urls: list, passes: int, cache: BrowserCache, now: float, first_pass: bool) -> dict:
+    rng = random.Random(0)
+    views = 0
+    before = cache.requests, cache.not_modified, cache.body_bytes
+    if first_pass:
+        for url in urls:
+            cache.get(url, now)
+            views += 1
+    for _ in range(passes):
+        order = urls[:]
+        rng.shuffle(order)
+        for url in order:
+            now += 5
+            cache.get(url, now)
+            views += 1
+    requests, not_modified, body = (a - b for a, b in zip((cache.requests, cache.not_modified, cache.body_bytes), before))
+    return {
+        "views": views,
+        "requests": requests,
+        "not_modified": not_modified,
+        "body_kb": round(body / 1024, 1),
+        "bytes_per_view": round(body / views),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--photos", type=int, default=40)
+    ap.add_argument("--passes", type=int, default=3)
+    args = ap.parse_args()
+
+    photo_dir = os.path.join(ROOT, "fotos_public")
+    names = sorted(n for n in os.listdir(photo_dir) if n.lower().endswith((".jpg", ".jpeg", ".png", ".webp")))
+    names = names[: args.photos]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        thumbs = [thumbnail_path(os.path.join(photo_dir, n), WIDTH, webp=True, cache_dir=cache_dir) for n in names]
+        source_kb = sum(os.path.getsize(os.path.join(photo_dir, n)) for n in names) / 1024
+        thumb_kb = sum(os.path.getsize(p) for p in thumbs) / 1024
+
+        media_server, media_urls, media_ms = start_media_server(thumbs)
+        static_server = make_server(port=0, mounts={"thumbs": cache_dir})
+        threading.Thread(target=static_server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{static_server.server_address[1]}/"
+        t0 = time.perf_counter()
+        static_urls = [static_url(base, p, mounts={"thumbs": cache_dir}) for p in thumbs]
+        static_ms = 1000 * (time.perf_counter() - t0) / len(thumbs)
+
+        rows = []
+        now = time.time()
+        for name, urls, ms in (("media", media_urls, media_ms), ("static", static_urls, static_ms)):
+            cache = BrowserCache()
+            rows.append({"delivery": name, "session": "first", "server_ms_per_view": round(ms, 3),
+                         **browse(urls, args.passes, cache, now, first_pass=True)})
+            rows.append({"delivery": name, "session": "next day",
+                         **browse(urls, args.passes, cache, now + DAY_S + 60, first_pass=False)})
+
+        # Originals (fotos_public/, max-age 1 day): revalidated the next day.
+        photos_server = make_server(port=0, mounts={"photos": photo_dir})
+        threading.Thread(target=photos_server.serve_forever, daemon=True).start()
+        photos_base = f"http://127.0.0.1:{photos_server.server_address[1]}/"
+        photo_urls = [static_url(photos_base, os.path.join(photo_dir, n), mounts={"photos": photo_dir}) for n in names]
+        cache = BrowserCache()
+        rows.append({"delivery": "static originals", "session": "first",
+                     **browse(photo_urls, args.passes, cache, now, first_pass=True)})
+        rows.append({"delivery": "static originals", "session": "next day",
+                     **browse(photo_urls, args.passes, cache, now + DAY_S + 60, first_pass=False)})
+
+        media_server.should_exit = True
+        static_server.shutdown()
+        photos_server.shutdown()
+    print(json.dumps({"photos": len(names), "source_kb": round(source_kb, 1),
+                      "thumbnail_kb": round(thumb_kb, 1), "rows": rows}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
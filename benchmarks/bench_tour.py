@@ -0,0 +1,84 @@
+"""
+Tour planner (haciendas/tour.py): time and route length by stop count.
+
+Stops are the N items nearest to the default center in a synthetic
+catalog (clustered around Puebla towns), the way a filtered result looks.
+For each N it reports the distance matrix time, the nearest-neighbor
+route length, the length reached within each time budget, and the length
+and time when improvement runs to convergence, plus the gap between the
+budgeted and converged routes.
+
+Usage:
+    python benchmarks/bench_tour.py [--stops 100 1000 3000 5000] [--budgets 0.5 1.0]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import synthetic_items  # noqa: E402
+from haciendas.columns import CatalogColumns  # noqa: E402
+from haciendas.tour import _nearest_neighbor, distance_matrix_km, plan_tour, route_length_km  # noqa: E402
+
+CENTER = (19.050501, -98.135887)
+CATALOG_ITEMS = 50_000
+
+
+def nn_km(lat: np.ndarray, lon: np.ndarray) -> float:
+    D = np.zeros((len(lat) + 2,) * 2, dtype=np.float32)
+    D[:-1, :-1] = distance_matrix_km(np.r_[CENTER[0], lat], np.r_[CENTER[1], lon])
+    return route_length_km(D, _nearest_neighbor(D))
+
+
+def bench(columns: CatalogColumns, n: int, budgets: list, round_trip: bool) -> dict:
+    d2 = (columns.lat - CENTER[0]) ** 2 + ((columns.lon - CENTER[1]) * columns.cos_lat) ** 2
+    pick = np.argsort(d2)[:n]
+    lat, lon = columns.lat[pick].astype(float), columns.lon[pick].astype(float)
+
+    t0 = time.perf_counter()
+    distance_matrix_km(np.r_[CENTER[0], lat], np.r_[CENTER[1], lon])
+    row = {
+        "stops": n,
+        "round_trip": round_trip,
+        "matrix_ms": round(1000 * (time.perf_counter() - t0), 1),
+        "nearest_neighbor_km": round(nn_km(lat, lon), 1),
+    }
+    for budget in budgets:
+        t0 = time.perf_counter()
+        tour = plan_tour(lat, lon, *CENTER, round_trip=round_trip, time_budget_s=budget)
+        row[f"budget_{budget}s"] = {
+            "km": round(tour.total_km, 1),
+            "s": round(time.perf_counter() - t0, 2),
+            "converged": tour.converged,
+        }
+    t0 = time.perf_counter()
+    best = plan_tour(lat, lon, *CENTER, round_trip=round_trip, time_budget_s=float("inf"))
+    row["converged_km"] = round(best.total_km, 1)
+    row["converged_s"] = round(time.perf_counter() - t0, 2)
+    for budget in budgets:
+        km = row[f"budget_{budget}s"]["km"]
+        row[f"budget_{budget}s"]["gap_pct"] = round(100 * (km / best.total_km - 1), 1)
+    return row
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--stops", type=int, nargs="*", default=[100, 1000, 3000, 5000])
+    ap.add_argument("--budgets", type=float, nargs="*", default=[0.5, 1.0])
+    ap.add_argument("--round-trip", action="store_true")
+    args = ap.parse_args()
+
+    columns = CatalogColumns.from_items(synthetic_items(CATALOG_ITEMS))
+    rows = [bench(columns, n, args.budgets, args.round_trip) for n in args.stops]
+    print(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""
+Benchmark suite: every hot-path stage over synthetic catalogs.
+
+For each size, a catalog_public.json-shaped file (clustered around Puebla,
+~60% with photos, see synthetic.py) is written to a temp directory and
+each stage is timed on it:
+
+    load            load_catalog() (json.load of the file)
+    normalize       normalize_public_items()
+    columns         CatalogColumns.from_items()
+    index           GridIndex.build()
+    name_index      NameIndex.build()
+    compile         write of the compiled (.hcat) catalog
+    load_compiled   load_compiled() (memory map)
+    query           df_for_radius() at several radii
+    nearest         df_for_nearest() for several k
+    name_filter     df_for_radius() with a name query (largest radius)
+    region_filter   df_for_radius() with a region (largest radius)
+    sort            distance/name lexsort of the largest result
+    export_*        csv / geojson / gpx / kml of the largest result
+    deck            pydeck JSON of the largest result (ms and bytes)
+    deck_clustered  the same with server-side marker clustering
+
+Output is one JSON object per line (stdout, and --out if given), each
+tagged with the run metadata, so results can be diffed release over
+release. The 10M size needs tens of GB of RAM for the JSON stages.
+
+Usage:
+    python benchmarks/run_suite.py [--sizes 1000 10000 100000 1000000 10000000]
+        [--radii 1 5 25 100 200] [--k 1 20 200] [--repeat 3] [--out results.jsonl]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.synthetic import write_synthetic_catalog  # noqa: E402
+from haciendas.catalog import load_catalog, normalize_public_items  # noqa: E402
+from haciendas.columns import CatalogColumns  # noqa: E402
+from haciendas.compiled import load_compiled, write_compiled  # noqa: E402
+from haciendas.engine import PublicCatalog, df_for_nearest, df_for_radius, photo_flags  # noqa: E402
+from haciendas.export import EXPORTERS, build_export  # noqa: E402
+from haciendas.mapview import build_deck  # noqa: E402
+from haciendas.photos import PhotoIndex  # noqa: E402
+from haciendas.search import NameIndex  # noqa: E402
+from haciendas.spatial import GridIndex  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+CENTER = (19.050501, -98.135887)
+
+
+def run_metadata() -> Dict[str, Any]:
+    try:
+        rev = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        rev = ""
+    return {
+        "git_rev": rev,
+        "started_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+    }
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> tuple:
+    """(best wall time in ms, last result) over `repeat` calls."""
+    best, result = float("inf"), None
+    for _ in range(max(repeat, 1)):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return round(1000 * best, 3), result
+
+
+def bench_size(
+    n: int, radii: List[int], ks: List[int], repeat: int, tmp: str, emit: Callable[..., None]
+) -> None:
+    json_path = os.path.join(tmp, f"catalog_{n}.json")
+    write_synthetic_catalog(json_path, n)
+    emit("file", n, bytes=os.path.getsize(json_path))
+
+    # One-shot stages: large and not worth repeating.
+    ms, raw = timed(lambda: load_catalog(json_path), 1)
+    emit("load", n, ms=ms)
+    photos = PhotoIndex(os.path.join(tmp, "fotos_public"))
+    photos.refresh()
+    ms, items = timed(lambda: normalize_public_items(raw["items"], photos), 1)
+    emit("normalize", n, ms=ms)
+    raw = None  # free the parsed JSON before building columns
+    ms, columns = timed(lambda: CatalogColumns.from_items(items), 1)
+    emit("columns", n, ms=ms)
+    items = None
+    ms, grid = timed(lambda: GridIndex.build(columns), 1)
+    emit("index", n, ms=ms)
+    ms, names = timed(lambda: NameIndex.build(columns.name), 1)
+    emit("name_index", n, ms=ms)
+
+    hcat_path = os.path.join(tmp, f"catalog_{n}.hcat")
+    ms, _ = timed(lambda: write_compiled(hcat_path, columns, grid, names, ""), 1)
+    emit("compile", n, ms=ms, bytes=os.path.getsize(hcat_path))
+    ms, _ = timed(lambda: load_compiled(hcat_path), repeat)
+    emit("load_compiled", n, ms=ms)
+    os.remove(hcat_path)
+    os.remove(json_path)
+
+    catalog = PublicCatalog(columns=columns, grid=grid, names=names, digest="")
+    flags = photo_flags(catalog, photos)
+
+    def query(radius_km: float, name_query: str = "", region: str = ""):
+        return df_for_radius(
+            catalog,
+            photo_flags=flags,
+            center_lat=CENTER[0],
+            center_lon=CENTER[1],
+            radius_km=radius_km,
+            only_with_photo=False,
+            only_without_photo=False,
+            name_query=name_query,
+            region_filter=region,
+        )
+
+    df = None
+    for r in radii:
+        ms, df = timed(lambda: query(r), repeat)
+        emit("query", n, ms=ms, radius_km=r, rows=len(df))
+    for k in ks:
+        ms, res = timed(
+            lambda: df_for_nearest(catalog, flags, CENTER[0], CENTER[1], k, False, False, "", ""),
+            repeat,
+        )
+        emit("nearest", n, ms=ms, k=k, rows=len(res))
+    r_max = max(radii)
+    ms, res = timed(lambda: query(r_max, name_query="san"), repeat)
+    emit("name_filter", n, ms=ms, radius_km=r_max, rows=len(res))
+    region = columns.regions[0] if columns.regions else ""
+    ms, res = timed(lambda: query(r_max, region=region), repeat)
+    emit("region_filter", n, ms=ms, radius_km=r_max, rows=len(res))
+
+    dist = df["distance_km"].to_numpy()
+    result_names = df["name"].to_numpy()
+    ms, _ = timed(lambda: np.lexsort((result_names, dist)), repeat)
+    emit("sort", n, ms=ms, rows=len(df))
+
+    export_repeat = 1 if len(df) > 100_000 else repeat
+    for kind in EXPORTERS:
+        ms, payload = timed(lambda: build_export(kind, df), export_repeat)
+        emit(f"export_{kind}", n, ms=ms, rows=len(df), bytes=len(payload))
+    ms, deck_json = timed(lambda: build_deck(df, CENTER[0], CENTER[1], r_max).to_json(), export_repeat)
+    emit("deck", n, ms=ms, rows=len(df), bytes=len(deck_json.encode("utf-8")))
+    ms, deck_json = timed(
+        lambda: build_deck(df, CENTER[0], CENTER[1], r_max, cluster=True).to_json(), repeat
+    )
+    emit("deck_clustered", n, ms=ms, rows=len(df), bytes=len(deck_json.encode("utf-8")))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    ap.add_argument("--radii", type=int, nargs="+", default=[1, 5, 25, 100, 200])
+    ap.add_argument("--k", type=int, nargs="+", default=[1, 20, 200])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", default=None, help="also append JSON lines to this file")
+    args = ap.parse_args()
+
+    meta = run_metadata()
+    out = open(args.out, "a", encoding="utf-8") if args.out else None
+
+    def emit(stage: str, items: int, **values: Any) -> None:
+        line = json.dumps({**meta, "stage": stage, "items": items, **values})
+        print(line, flush=True)
+        if out:
+            out.write(line + "\n")
+            out.flush()
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.makedirs(os.path.join(tmp, "fotos_public"))
+            for n in args.sizes:
+                bench_size(n, args.radii, args.k, args.repeat, tmp, emit)
+    finally:
+        if out:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+A minimal Streamlit browser client, for benchmarks against `streamlit run`.
+
+streamlit.testing (AppTest) always reruns the whole script in-process, so
+fragment reruns, the websocket and concurrent sessions are out of its
+reach. Session speaks the server's websocket protocol instead: every widget
+change is a rerun request carrying the widget states (and, for a widget
+inside a fragment, that fragment's id), answered by deltas up to
+`script_finished`. Download buttons marked `ignore_rerun` send no rerun,
+and deferred downloads are fetched the way the browser does.
+"""
+
+import asyncio
+import itertools
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_request_ids = itertools.count(1)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app: str, port: int) -> subprocess.Popen:
+    """`streamlit run app` (relative to the repo root) on `port`, once healthy."""
+    proc = subprocess.Popen(
+        [
+            sys.executable, "-m", "streamlit", "run", app,
+            "--server.headless", "true",
+            "--server.port", str(port),
+            "--server.enableXsrfProtection", "false",
+            "--server.enableCORS", "false",
+            "--browser.gatherUsageStats", "false",
+        ],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": ROOT},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1)
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("streamlit did not start")
+
+
+class Session:
+    """One browser tab: widget states as the frontend would send them."""
+
+    def __init__(self, ws, base_url: str = ""):
+        self.ws = ws
+        self.base_url = base_url
+        self.widgets: dict = {}  # name -> (element type, proto, fragment id)
+        self.states: dict = {}  # widget id -> WidgetState (non-trigger values)
+        self.session_id = ""
+        self.exceptions = 0
+
+    async def rerun(self, fragment_id: str = "", trigger: WidgetState | None = None) -> dict:
+        """Send a rerun request; returns ms until it finished, elements and bytes received."""
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.page_script_hash = ""
+        msg.rerun_script.fragment_id = fragment_id
+        live = {proto.id for _, proto, _ in self.widgets.values()}
+        msg.rerun_script.widget_states.widgets.extend(
+            state for wid, state in self.states.items() if wid in live
+        )
+        if trigger is not None:
+            msg.rerun_script.widget_states.widgets.append(trigger)
+
+        t0 = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        elements = received = 0
+        while True:
+            fmsg, size = await self._recv()
+            received += size
+            kind = fmsg.WhichOneof("type")
+            if kind == "delta" and fmsg.delta.WhichOneof("type") == "new_element":
+                elements += 1
+                self._track(fmsg.delta)
+            # A button that calls st.rerun() ends its run early; wait for the next.
+            if kind == "script_finished" and fmsg.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                break
+        return {"ms": 1000 * (time.perf_counter() - t0), "elements": elements, "bytes": received}
+
+    async def _recv(self) -> tuple:
+        raw = await self.ws.recv()
+        fmsg = ForwardMsg()
+        fmsg.ParseFromString(raw)
+        if fmsg.WhichOneof("type") == "new_session":
+            self.session_id = fmsg.new_session.initialize.session_id
+        return fmsg, len(raw)
+
+    def _track(self, delta) -> None:
+        element = delta.new_element
+        kind = element.WhichOneof("type")
+        if kind == "exception":
+            self.exceptions += 1
+            return
+        proto = getattr(element, kind)
+        wid = getattr(proto, "id", "")
+        if not wid:
+            return
+        # Keyed widgets by key, the others by label.
+        key = wid.rsplit("-", 1)[-1]
+        name = key if key != "None" else proto.label
+        self.widgets[name] = (kind, proto, delta.fragment_id)
+
+    def find(self, kind: str, prefix: str = "") -> str:
+        """Name of the last-drawn widget of element type `kind` whose name starts with `prefix`."""
+        return [n for n, (k, _, _) in self.widgets.items() if k == kind and n.startswith(prefix)][-1]
+
+    def proto(self, name: str):
+        return self.widgets[name][1]
+
+    async def set(self, name: str, **value) -> dict:
+        """Change widget `name` (e.g. string_value="x") and rerun like the browser."""
+        kind, proto, fragment_id = self.widgets[name]
+        state = WidgetState(id=proto.id)
+        for field, v in value.items():
+            if field == "double_array_value":
+                state.double_array_value.data.extend(v)
+            else:
+                setattr(state, field, v)
+        if "trigger_value" in value:
+            if getattr(proto, "ignore_rerun", False):
+                return {"ms": 0.0, "elements": 0, "bytes": 0}
+            return await self.rerun(fragment_id, trigger=state)
+        self.states[proto.id] = state
+        return await self.rerun(fragment_id)
+
+    async def click(self, name: str) -> dict:
+        return await self.set(name, trigger_value=True)
+
+    async def download(self, name: str) -> dict:
+        """Click a deferred download button: ask for the file, then fetch it."""
+        proto = self.proto(name)
+        msg = BackMsg()
+        msg.backend_operation_request.request_id = str(next(_request_ids))
+        msg.backend_operation_request.session_id = self.session_id
+        msg.backend_operation_request.deferred_file.file_id = proto.deferred_file_id
+        t0 = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        while True:
+            fmsg, _ = await self._recv()
+            if fmsg.WhichOneof("type") == "backend_operation_response":
+                break
+        response = fmsg.backend_operation_response
+        if response.error_msg:
+            raise RuntimeError(response.error_msg)
+        body = await asyncio.to_thread(
+            lambda: urllib.request.urlopen(self.base_url + response.deferred_file.url).read()
+        )
+        return {"ms": 1000 * (time.perf_counter() - t0), "elements": 0, "bytes": len(body)}
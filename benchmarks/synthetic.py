@@ -0,0 +1,73 @@
+"""
+Synthetic catalogs shaped like catalog_public.json, for benchmarks.
+
+Items are clustered around Puebla towns, names look like "Hacienda X. Town",
+and roughly 60% carry a local photo path.
+"""
+
+import json
+from typing import Any, Dict, List
+
+import numpy as np
+
+# (lat, lon, region) of a few real towns used as cluster centers.
+TOWNS = [
+    (19.0414, -98.2063, "Puebla"),
+    (18.9088, -98.4372, "Atlixco"),
+    (18.9647, -97.9022, "Tepeaca"),
+    (19.0633, -98.3064, "Cholula"),
+    (18.4617, -97.3928, "Tehuacán"),
+    (19.8167, -97.3667, "Zacapoaxtla"),
+    (18.2000, -98.0500, "Acatlán"),
+    (19.2833, -97.6333, "Libres"),
+    (18.8500, -97.6167, "Tecamachalco"),
+    (19.6931, -97.4570, "Ixtacamaxtitlán"),
+]
+
+_SYLLABLES = ["san", "ta", "mar", "co", "lu", "xo", "chi", "pan", "tla", "hue", "jo", "sé", "ma", "ría", "an"]
+
+
+def synthetic_items(n: int, seed: int = 0, start: int = 0) -> List[Dict[str, Any]]:
+    """
+    `n` raw catalog items (the shape of catalog_public.json["items"]).
+    `start` offsets the running number used in file names and URLs.
+    """
+    rng = np.random.default_rng([seed, start])
+    town = rng.integers(0, len(TOWNS), size=n)
+    centers = np.array([(lat, lon) for lat, lon, _ in TOWNS])[town]
+    coords = centers + rng.normal(scale=0.25, size=(n, 2))
+    with_photo = rng.random(n) < 0.6
+    n_syll = rng.integers(2, 6, size=n)
+    syll = rng.integers(0, len(_SYLLABLES), size=(n, 5))
+
+    items: List[Dict[str, Any]] = []
+    for i in range(n):
+        region = TOWNS[town[i]][2]
+        word = "".join(_SYLLABLES[s] for s in syll[i, : n_syll[i]]).capitalize()
+        name = f"{word}. {region}"
+        k = start + i
+        local = f"fotos_public/{word}_{region}_{k:08x}.jpg" if with_photo[i] else None
+        items.append(
+            {
+                "name": name,
+                "region": region,
+                "lat": round(float(coords[i, 0]), 6),
+                "lon": round(float(coords[i, 1]), 6),
+                "rating": 0,
+                "has_photo": bool(with_photo[i]),
+                "photo_url": f"https://lh3.googleusercontent.com/p/{k:x}" if with_photo[i] else None,
+                "local_photo_path": local,
+            }
+        )
+    return items
+
+
+def write_synthetic_catalog(path: str, n: int, seed: int = 0, chunk: int = 100_000) -> None:
+    """Write a catalog_public.json-shaped file of `n` items, `chunk` items at a time."""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"items": [')
+        for start in range(0, n, chunk):
+            items = synthetic_items(min(chunk, n - start), seed=seed, start=start)
+            body = ",\n".join(json.dumps(it, ensure_ascii=False) for it in items)
+            f.write((",\n" if start else "\n") + body)
+        f.write("\n]}\n")
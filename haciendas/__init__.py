@@ -0,0 +1 @@
+"""Streamlit-free building blocks for the Haciendas Nearby public app."""
@@ -0,0 +1,454 @@
+"""
+Batch radius queries: every item within each center's own radius, for
+thousands of centers in one pass, as a long-format table
+
+    center_id, hacienda_id, distance_km
+
+instead of one df_for_radius() call (and DataFrame) per center.
+
+Centers are visited in Z-order over the catalog grid, so consecutive
+centers are close together, and taken in chunks. A chunk gathers grid
+candidates once for the union of its centers' bounding boxes and measures
+centers x candidates as one haversine matrix, at most `max_pairs` entries
+at a time (a chunk spread too wide for its centers' radii is halved first).
+Distances and boundary decisions match df_for_radius() exactly; rows are
+ordered by center (input order), then as df_for_radius() orders them.
+Chunks can run in a process pool (`process_pool`).
+
+    python -m haciendas.batch centers.csv [--radius 25] [--workers 4] \
+        [--name casa] [--region Atlixco] [--with-photo | --without-photo] \
+        [--catalog catalog_public.json] [--output matches.csv] [--timings]
+
+Centers come from CSV (columns id, lat, lon and optionally radius_km) or
+GeoJSON (Point features; id from the feature or properties.id, radius
+from properties.radius_km). Centers without a radius use --radius.
+Center ids must be unique (CSV rows without one are numbered from 1).
+"""
+
+import argparse
+import csv
+import json
+import math
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .engine import PublicCatalog, _filter_rows, load_public_catalog, photo_flags
+from .geo import haversine_km_rad
+from .photos import PhotoIndex
+from .search import NAME_MODES
+from .spatial import GridIndex, bounding_box, morton_code
+
+DEFAULT_RADIUS_KM = 25
+# Centers per chunk; each chunk is one task in a process pool.
+CHUNK_CENTERS = 256
+# Entries of one centers x candidates distance matrix (float64, ~8 bytes
+# per entry plus temporaries).
+MAX_PAIRS = 1 << 21
+# A chunk is halved while the union of its centers' bounding boxes is over
+# this many times their mean box: past that, measuring every center against
+# the union's candidates costs more than the shared grid lookup saves.
+SPLIT_AREA_RATIO = 4.0
+
+RESULT_COLUMNS = ["center_id", "hacienda_id", "distance_km"]
+
+
+@dataclass(frozen=True)
+class Centers:
+    """Query centers as index-aligned arrays."""
+
+    id: np.ndarray
+    lat: np.ndarray
+    lon: np.ndarray
+    radius_km: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.lat.shape[0])
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]], default_radius_km: float) -> "Centers":
+        ids = np.empty(len(records), dtype=object)
+        ids[:] = [str(r["id"]) for r in records]
+        radius = [r.get("radius_km") for r in records]
+        return cls(
+            id=ids,
+            lat=np.array([float(r["lat"]) for r in records], dtype=np.float64),
+            lon=np.array([float(r["lon"]) for r in records], dtype=np.float64),
+            radius_km=np.array(
+                [default_radius_km if v in (None, "") else float(v) for v in radius], dtype=np.float64
+            ),
+        )
+
+
+def read_centers(path: str, default_radius_km: float = DEFAULT_RADIUS_KM) -> Centers:
+    """Centers from a CSV or GeoJSON file (see the module docstring). Raises ValueError."""
+    if path.lower().endswith((".geojson", ".json")):
+        with open(path, encoding="utf-8") as f:
+            records = _geojson_records(json.load(f))
+    else:
+        with open(path, encoding="utf-8", newline="") as f:
+            records = _csv_records(csv.DictReader(f))
+    centers = Centers.from_records(records, default_radius_km)
+    bad = ~(
+        (np.abs(centers.lat) <= 90)
+        & (np.abs(centers.lon) <= 180)
+        & (centers.radius_km >= 0)
+        & np.isfinite(centers.radius_km)
+    )
+    if bad.any():
+        i = int(np.flatnonzero(bad)[0])
+        raise ValueError(f"center {centers.id[i]}: bad lat/lon/radius_km")
+    ids, counts = np.unique(centers.id, return_counts=True)
+    if (counts > 1).any():
+        # Results are keyed by center id; repeats would merge their rows.
+        raise ValueError(f"center {ids[np.argmax(counts > 1)]}: duplicate id")
+    return centers
+
+
+def _csv_records(reader: csv.DictReader) -> List[Dict[str, Any]]:
+    fields = set(reader.fieldnames or ())
+    if not {"lat", "lon"} <= fields:
+        raise ValueError("CSV needs lat and lon columns")
+    records = []
+    for n, row in enumerate(reader, start=1):
+        try:
+            records.append(
+                {
+                    "id": row.get("id") or str(n),
+                    "lat": float(row["lat"]),
+                    "lon": float(row["lon"]),
+                    "radius_km": row.get("radius_km"),
+                }
+            )
+        except (TypeError, ValueError):
+            raise ValueError(f"row {n}: lat/lon are not numbers") from None
+    return records
+
+
+def _geojson_records(doc: Any) -> List[Dict[str, Any]]:
+    features = doc.get("features") if isinstance(doc, dict) else None
+    if not isinstance(features, list):
+        raise ValueError("GeoJSON needs a FeatureCollection")
+    records = []
+    for n, feature in enumerate(features, start=1):
+        if not isinstance(feature, dict):
+            raise ValueError(f"feature {n}: not an object")
+        geometry = feature.get("geometry") or {}
+        props = feature.get("properties") or {}
+        if not isinstance(props, dict):
+            raise ValueError(f"feature {n}: properties is not an object")
+        if not isinstance(geometry, dict) or geometry.get("type") != "Point":
+            raise ValueError(f"feature {n}: not a Point")
+        coords = geometry.get("coordinates")
+        if not isinstance(coords, list) or len(coords) < 2:
+            raise ValueError(f"feature {n}: Point needs [lon, lat] coordinates")
+        lon, lat = coords[:2]
+        records.append(
+            {
+                "id": feature.get("id", props.get("id", str(n))),
+                "lat": lat,
+                "lon": lon,
+                "radius_km": props.get("radius_km"),
+            }
+        )
+    return records
+
+
+# --------------------------------------------------------------------
+# Matching
+# --------------------------------------------------------------------
+
+
+def allowed_items(
+    catalog: PublicCatalog,
+    photo_flags: np.ndarray,
+    only_with_photo: bool = False,
+    only_without_photo: bool = False,
+    name_query: str = "",
+    region_filter: str = "",
+    name_mode: str = "contains",
+) -> np.ndarray | None:
+    """Boolean mask of the items passing the filters, or None when there are none."""
+    if not (only_with_photo or only_without_photo or (name_query or "").strip() or region_filter):
+        return None
+    kept = _filter_rows(
+        catalog,
+        photo_flags,
+        np.arange(len(catalog)),
+        only_with_photo,
+        only_without_photo,
+        name_query,
+        region_filter,
+        name_mode,
+    )
+    mask = np.zeros(len(catalog), dtype=bool)
+    mask[kept] = True
+    return mask
+
+
+def z_order(grid: GridIndex, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Permutation visiting the points along a Z-order curve over the grid's cells."""
+    row = np.clip((lat - grid.lat0) // grid.cell_deg, 0, 0xFFFF).astype(np.int64)
+    col = np.clip((lon - grid.lon0) // grid.cell_deg, 0, 0xFFFF).astype(np.int64)
+    return np.argsort(morton_code(row, col), kind="stable")
+
+
+def _boxes(lat: np.ndarray, lon: np.ndarray, radius_km: np.ndarray) -> np.ndarray:
+    """Per center (lat_min, lat_max, lon_min, lon_max); NaN where bounding_box() gives None."""
+    boxes = np.full((len(lat), 4), np.nan)
+    for i, (a, b, r) in enumerate(zip(lat.tolist(), lon.tolist(), radius_km.tolist())):
+        box = bounding_box(a, b, r)
+        if box is not None:
+            boxes[i] = box
+    return boxes
+
+
+def chunk_pairs(
+    catalog: PublicCatalog,
+    allowed: np.ndarray | None,
+    lat: np.ndarray,
+    lon: np.ndarray,
+    radius_km: np.ndarray,
+    boxes: np.ndarray,
+    max_pairs: int = MAX_PAIRS,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (center position in the chunk, item index, km) of every item within
+    its center's radius, for one chunk of nearby centers.
+    """
+    columns = catalog.columns
+    n_centers = len(lat)
+    if n_centers > 1:
+        # Centers whose box wraps a pole or the antimeridian scan everything;
+        # keep them from dragging the rest of the chunk along.
+        if np.isnan(boxes).any():
+            return _split(catalog, allowed, lat, lon, radius_km, boxes, max_pairs)
+        union = (boxes[:, 1].max() - boxes[:, 0].min()) * (boxes[:, 3].max() - boxes[:, 2].min())
+        own = (boxes[:, 1] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 2])
+        if union > SPLIT_AREA_RATIO * own.mean():
+            return _split(catalog, allowed, lat, lon, radius_km, boxes, max_pairs)
+    if np.isnan(boxes).any():
+        cand = np.arange(len(catalog))
+    else:
+        cand = catalog.grid.in_box(
+            boxes[:, 0].min(), boxes[:, 1].max(), boxes[:, 2].min(), boxes[:, 3].max()
+        )
+    if allowed is not None:
+        cand = cand[allowed[cand]]
+    if n_centers > 1 and n_centers * len(cand) > max_pairs:
+        return _split(catalog, allowed, lat, lon, radius_km, boxes, max_pairs)
+
+    lat1 = np.radians(lat)[:, None]
+    lon1 = np.radians(lon)[:, None]
+    cos1 = np.cos(lat1)
+    step = max(max_pairs // max(n_centers, 1), 1)
+    pos, items, dkm = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)], [np.empty(0)]
+    for s in range(0, len(cand), step):
+        block = cand[s : s + step]
+        d = haversine_km_rad(
+            lat1, lon1, cos1, columns.lat_rad[block], columns.lon_rad[block], columns.cos_lat[block]
+        )
+        ci, cj = np.nonzero(d <= radius_km[:, None])
+        pos.append(ci)
+        items.append(block[cj])
+        dkm.append(d[ci, cj])
+    return np.concatenate(pos), np.concatenate(items), np.concatenate(dkm)
+
+
+def _split(
+    catalog: PublicCatalog,
+    allowed: np.ndarray | None,
+    lat: np.ndarray,
+    lon: np.ndarray,
+    radius_km: np.ndarray,
+    boxes: np.ndarray,
+    max_pairs: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """chunk_pairs() on each half of the chunk (Z-order keeps halves compact)."""
+    h = len(lat) // 2
+    a = chunk_pairs(catalog, allowed, lat[:h], lon[:h], radius_km[:h], boxes[:h], max_pairs)
+    b = chunk_pairs(catalog, allowed, lat[h:], lon[h:], radius_km[h:], boxes[h:], max_pairs)
+    return np.r_[a[0], b[0] + h], np.r_[a[1], b[1]], np.r_[a[2], b[2]]
+
+
+def df_for_centers(
+    catalog: PublicCatalog,
+    centers: Centers,
+    allowed: np.ndarray | None = None,
+    chunk_centers: int = CHUNK_CENTERS,
+    max_pairs: int = MAX_PAIRS,
+    executor: Executor | None = None,
+) -> pd.DataFrame:
+    """
+    Long-format matches (RESULT_COLUMNS) of every center against the
+    catalog, restricted to the `allowed` items (see allowed_items()).
+    center_id and hacienda_id are categoricals, so millions of rows do
+    not hold a string each.
+    With an `executor` from process_pool(), chunks run in its workers.
+    """
+    n = len(centers)
+    with metrics.span("batch.pairs"):
+        order = z_order(catalog.grid, centers.lat, centers.lon)
+        boxes = _boxes(centers.lat, centers.lon, centers.radius_km)
+        chunks = [order[s : s + chunk_centers] for s in range(0, n, max(int(chunk_centers), 1))]
+        args = [
+            (centers.lat[c], centers.lon[c], centers.radius_km[c], boxes[c], max_pairs) for c in chunks
+        ]
+        if executor is None:
+            results = [chunk_pairs(catalog, allowed, *a) for a in args]
+        else:
+            results = list(executor.map(_worker_chunk_pairs, args))
+        pos = [np.empty(0, dtype=np.int64)] + [c[p] for c, (p, _, _) in zip(chunks, results)]
+        items = [np.empty(0, dtype=np.int64)] + [i for _, i, _ in results]
+        dkm = [np.empty(0)] + [d for _, _, d in results]
+        pos, items, dkm = np.concatenate(pos), np.concatenate(items), np.concatenate(dkm)
+    with metrics.span("batch.frame"):
+        columns = catalog.columns
+        # Matched items get a slot each; names and ids are only read for
+        # those, never per row.
+        present = np.zeros(len(catalog), dtype=bool)
+        present[items] = True
+        matched = np.flatnonzero(present)
+        slot = np.zeros(len(catalog), dtype=np.int64)
+        slot[matched] = np.arange(len(matched))
+        # (name, id) order as integer ranks, like df_for_radius() breaks
+        # distance ties (sorted as fixed-width unicode, which orders like
+        # str several times faster).
+        by_name = np.lexsort(
+            (np.asarray(columns.id[matched]).astype(str), np.asarray(columns.name[matched]).astype(str))
+        )
+        name_rank = np.empty(len(matched), dtype=np.int64)
+        name_rank[by_name] = np.arange(len(matched))
+        # np.round(dkm, 3) is rint(dkm * 1000) / 1000: same order and values.
+        metres = np.rint(dkm * 1000).astype(np.int64)
+        sel = _row_order(pos, metres, name_rank[slot[items]])
+        center_ids, center_code = np.unique(centers.id, return_inverse=True)
+        return pd.DataFrame(
+            {
+                "center_id": pd.Categorical.from_codes(center_code[pos[sel]], categories=center_ids),
+                "hacienda_id": pd.Categorical.from_codes(
+                    slot[items[sel]], categories=np.asarray(columns.id[matched], dtype=object)
+                ),
+                "distance_km": metres[sel] / 1000,
+            },
+            columns=RESULT_COLUMNS,
+        )
+
+
+def _row_order(*keys: np.ndarray) -> np.ndarray:
+    """Stable order by non-negative integer keys, most significant first."""
+    bits = [int(k.max()).bit_length() if len(k) else 0 for k in keys]
+    if sum(bits) > 63:
+        return np.lexsort(keys[::-1])
+    packed = np.zeros(len(keys[0]), dtype=np.int64)
+    for k, b in zip(keys, bits):
+        packed = (packed << b) | k
+    return np.argsort(packed, kind="stable")
+
+
+# --------------------------------------------------------------------
+# Process pool
+# --------------------------------------------------------------------
+
+_worker_state: Tuple[PublicCatalog, np.ndarray | None] | None = None
+
+
+def _init_worker(catalog_path: str, photos_dir: str, allowed: np.ndarray | None) -> None:
+    global _worker_state
+    _worker_state = (load_public_catalog(catalog_path, PhotoIndex(photos_dir)), allowed)
+
+
+def _worker_chunk_pairs(args: tuple) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    catalog, allowed = _worker_state
+    return chunk_pairs(catalog, allowed, *args)
+
+
+def process_pool(
+    workers: int, catalog_path: str, photos_dir: str, allowed: np.ndarray | None = None
+) -> ProcessPoolExecutor:
+    """
+    Workers for df_for_centers(executor=...), each loading the catalog at
+    `catalog_path` once (memory-mapped when compiled, see compiled.py).
+    It must be the catalog the caller passes to df_for_centers().
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(catalog_path, photos_dir, allowed)
+    )
+
+
+# --------------------------------------------------------------------
+# CLI
+# --------------------------------------------------------------------
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(
+        prog="haciendas-batch", description="Radius queries for many centers at once."
+    )
+    ap.add_argument("centers", help="CSV (id,lat,lon[,radius_km]) or GeoJSON points")
+    ap.add_argument("--radius", type=float, default=DEFAULT_RADIUS_KM, help="km, for centers without radius_km")
+    ap.add_argument("--name", default="", help="name query (case- and accent-insensitive)")
+    ap.add_argument("--name-mode", choices=NAME_MODES, default="contains")
+    ap.add_argument("--region", default="", help="exact region name")
+    photo = ap.add_mutually_exclusive_group()
+    photo.add_argument("--with-photo", action="store_true")
+    photo.add_argument("--without-photo", action="store_true")
+    ap.add_argument("--catalog", default="catalog_public.json")
+    ap.add_argument("--photos", default="fotos_public", help="local photo directory")
+    ap.add_argument("--workers", type=int, default=1, help="processes (default: 1, no pool)")
+    ap.add_argument("--chunk", type=int, default=CHUNK_CENTERS, help="centers per chunk")
+    ap.add_argument("--output", "-o", default="-", help="CSV file (default: stdout)")
+    ap.add_argument("--timings", action="store_true", help="print timing spans to stderr")
+    args = ap.parse_args(argv)
+    spans = metrics.start_collecting() if args.timings else None
+
+    try:
+        with metrics.span("batch.read_centers"):
+            centers = read_centers(args.centers, args.radius)
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"haciendas-batch: {args.centers}: {e}", file=sys.stderr)
+        return 1
+    photos = PhotoIndex(args.photos)
+    catalog = load_public_catalog(args.catalog, photos)
+    if not len(catalog):
+        print(f"haciendas-batch: no items in {args.catalog}", file=sys.stderr)
+        return 1
+    photos.refresh()
+    allowed = allowed_items(
+        catalog,
+        photo_flags(catalog, photos),
+        only_with_photo=args.with_photo,
+        only_without_photo=args.without_photo,
+        name_query=args.name,
+        region_filter=args.region,
+        name_mode=args.name_mode,
+    )
+    workers = min(args.workers, math.ceil(len(centers) / max(args.chunk, 1)))
+    pool = process_pool(workers, args.catalog, args.photos, allowed) if workers > 1 else nullcontext()
+    with pool as executor:
+        df = df_for_centers(catalog, centers, allowed, chunk_centers=args.chunk, executor=executor)
+    with metrics.span("batch.write"):
+        if args.output == "-":
+            df.to_csv(sys.stdout, index=False)
+            sys.stdout.flush()
+        else:
+            df.to_csv(args.output, index=False)
+    print(
+        f"haciendas-batch: {len(df)} matches for {len(centers)} centers "
+        f"({df['center_id'].nunique()} with any)",
+        file=sys.stderr,
+    )
+    if spans is not None:
+        for name, ms, depth in spans:
+            print(f"{'  ' * depth}{name:<{32 - 2 * depth}} {ms:10.3f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Set, TextIO
+
+from .photos import PhotoIndex
+
+# --------------------------------------------------------------------
+# Catalog loading and normalization
+# --------------------------------------------------------------------
+
+
+def clean_url(url: str | None) -> str | None:
+    if not url:
+        return None
+    u = str(url).strip()
+    if not u:
+        return None
+    if re.match(r"^https?://", u):
+        return u
+    if u.startswith("//"):
+        return "https:" + u
+    return None
+
+
+def item_id(name: str, lat: float, lon: float) -> str:
+    """Deterministic ID of an item: 12 hex digits hashed from name and coordinates."""
+    key = f"{name}\n{lat:.6f},{lon:.6f}".encode("utf-8")
+    return hashlib.blake2b(key, digest_size=6).hexdigest()
+
+
+def has_photo_live(item: Dict[str, Any], photos: PhotoIndex) -> bool:
+    return photos.contains(item.get("local_photo_path"))
+
+
+def load_catalog(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {"items": []}
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except Exception:
+            return {"items": []}
+    if "items" not in data or not isinstance(data["items"], list):
+        return {"items": []}
+    return data
+
+
+def normalize_public_items(
+    raw_items: List[Dict[str, Any]], photos: PhotoIndex
+) -> List[Dict[str, Any]]:
+    """
+    Normalize items for public display:
+    - Keep only KML-sourced, region-assigned items.
+    - Compute has_photo from local_photo_path (via the photo index).
+    - Clean photo_url.
+    - Give every item a stable `id`: its own if it has one, else item_id();
+      repeats get the first unused "-2", "-3", ... suffix in catalog order,
+      so ids are unique even when a catalog id already looks like a suffix.
+    """
+    return list(iter_public_items(raw_items, photos))
+
+
+def iter_public_items(
+    raw_items: Iterable[Dict[str, Any]], photos: PhotoIndex
+) -> Iterator[Dict[str, Any]]:
+    """normalize_public_items(), one item at a time."""
+    seen: Set[str] = set()
+    repeats: Dict[str, int] = {}  # base -> last suffix handed out
+    for it in raw_items:
+        source = it.get("source") or "kml"
+        region = it.get("region")
+        if source != "kml":
+            continue
+        if region is None:
+            continue
+        region_str = str(region).strip()
+        if not region_str or region_str.lower() == "sin asignar":
+            continue
+
+        try:
+            lat = float(it["lat"])
+            lon = float(it["lon"])
+        except Exception:
+            continue
+
+        cleaned = dict(it)
+        cleaned["lat"] = lat
+        cleaned["lon"] = lon
+        cleaned["region"] = region_str
+        cleaned["name"] = str(it.get("name") or "Untitled").strip()
+        base = str(it["id"]) if it.get("id") else item_id(cleaned["name"], lat, lon)
+        uid = base
+        if uid in seen:
+            n = repeats.get(base, 1)
+            while uid in seen:
+                n += 1
+                uid = f"{base}-{n}"
+            repeats[base] = n
+        seen.add(uid)
+        cleaned["id"] = uid
+        cleaned["photo_url"] = clean_url(it.get("photo_url"))
+        cleaned["has_photo"] = has_photo_live(it, photos)
+        yield cleaned
+
+
+# --------------------------------------------------------------------
+# Streaming parse
+# --------------------------------------------------------------------
+
+# Characters read per refill; a value larger than this doubles the window.
+STREAM_CHUNK_CHARS = 1 << 20
+# Largest single JSON value (an item, or a top-level value other than
+# "items") the window may grow to hold; beyond it the input is rejected
+# rather than read to the end looking for where the value closes.
+STREAM_MAX_VALUE_CHARS = 16 << 20
+
+_WS = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+class _JSONStream:
+    """A sliding window over a text file, decoding one JSON value at a time."""
+
+    def __init__(self, f: TextIO, chunk_chars: int, max_value_chars: int = STREAM_MAX_VALUE_CHARS):
+        self._f = f
+        self._chunk = chunk_chars
+        self._max_value = max_value_chars
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _more(self) -> bool:
+        if self.eof:
+            return False
+        data = self._f.read(max(self._chunk, len(self.buf) - self.pos))
+        if not data:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos :] + data
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, not consumed ("" at end of input)."""
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._more():
+                return ""
+
+    def take(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise ValueError(f"expected {ch!r} in catalog JSON")
+        self.pos += 1
+
+    def _grow(self) -> bool:
+        """Read more for a value that does not fit yet; False at end of input."""
+        if len(self.buf) - self.pos >= self._max_value:
+            raise ValueError(
+                f"catalog JSON value longer than {self._max_value} characters (or malformed)"
+            )
+        return self._more()
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._grow():
+                    raise
+                continue
+            # A number ending exactly at the window edge may continue.
+            if end == len(self.buf) and self._grow():
+                continue
+            self.pos = end
+            return obj
+
+
+def _iter_array(s: _JSONStream) -> Iterator[Dict[str, Any]]:
+    """The objects of a non-empty array whose "[" was just consumed, up to its "]"."""
+    raw_decode, skip_ws = _DECODER.raw_decode, _WS.match
+    buf, pos = s.buf, s.pos
+    while True:
+        # Fast path inside the window; s.value() handles values crossing its end.
+        start = skip_ws(buf, pos).end()
+        try:
+            item, pos = raw_decode(buf, start)
+            if pos == len(buf):
+                raise ValueError
+        except ValueError:
+            s.pos = start
+            item = s.value()
+            buf, pos = s.buf, s.pos
+        if isinstance(item, dict):
+            yield item
+        pos = skip_ws(buf, pos).end()
+        if pos == len(buf):
+            s.pos = pos
+            s.peek()
+            buf, pos = s.buf, s.pos
+        if buf[pos : pos + 1] != ",":
+            s.pos = pos
+            return
+        pos += 1
+
+
+def iter_catalog_items(
+    path: str,
+    chunk_chars: int = STREAM_CHUNK_CHARS,
+    max_value_chars: int = STREAM_MAX_VALUE_CHARS,
+) -> Iterator[Dict[str, Any]]:
+    """
+    The objects of the top-level "items" array of `path`, parsed one at a
+    time from a window of about `chunk_chars` characters, so memory does
+    not grow with the file. Like load_catalog(), a missing file or a
+    missing/non-list "items" yields nothing; malformed JSON, a top level
+    that is not an object, or a single value longer than `max_value_chars`
+    raises ValueError (possibly after some items were yielded).
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        s = _JSONStream(f, chunk_chars, max_value_chars)
+        s.take("{")
+        if s.peek() == "}":
+            return
+        while True:
+            key = s.value()
+            if not isinstance(key, str):
+                raise ValueError("catalog JSON keys must be strings")
+            s.take(":")
+            if key == "items" and s.peek() == "[":
+                s.take("[")
+                if s.peek() == "]":
+                    s.pos += 1
+                else:
+                    yield from _iter_array(s)
+                    s.take("]")
+            else:
+                s.value()
+            if s.peek() != ",":
+                break
+            s.pos += 1
+        s.take("}")
+        if s.peek():
+            raise ValueError("trailing data after catalog JSON")
@@ -0,0 +1,240 @@
+from array import array
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+from .catalog import item_id
+from .geo import haversine_km_rad
+
+# Items buffered per step by CatalogColumns.from_item_stream().
+STREAM_BATCH = 8192
+
+# --------------------------------------------------------------------
+# Columnar catalog
+# --------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class CatalogColumns:
+    """
+    Normalized public items held as contiguous, index-aligned arrays:
+    - lat/lon in degrees (for output) and radians, plus cos(lat).
+    - region_code indexes into `regions` (sorted).
+    - String fields that are only displayed stay as object arrays, or
+      StringColumns (compiled catalogs, from_item_stream()).
+    """
+
+    lat: np.ndarray
+    lon: np.ndarray
+    lat_rad: np.ndarray
+    lon_rad: np.ndarray
+    cos_lat: np.ndarray
+    region_code: np.ndarray
+    regions: Tuple[str, ...]
+    has_photo: np.ndarray
+    name: np.ndarray
+    id: np.ndarray
+    photo_url: np.ndarray
+    local_photo_path: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.lat.shape[0])
+
+    @classmethod
+    def from_items(cls, items: Sequence[Mapping[str, Any]]) -> "CatalogColumns":
+        """Build columns from normalize_public_items() output."""
+        n = len(items)
+        lat = np.fromiter((it["lat"] for it in items), dtype=np.float64, count=n)
+        lon = np.fromiter((it["lon"] for it in items), dtype=np.float64, count=n)
+        regions = tuple(sorted({it["region"] for it in items}))
+        code_of = {r: i for i, r in enumerate(regions)}
+        names = [it["name"] for it in items]
+        lat_rad = np.radians(lat)
+        return cls(
+            lat=lat,
+            lon=lon,
+            lat_rad=lat_rad,
+            lon_rad=np.radians(lon),
+            cos_lat=np.cos(lat_rad),
+            region_code=np.fromiter(
+                (code_of[it["region"]] for it in items), dtype=np.int32, count=n
+            ),
+            regions=regions,
+            has_photo=np.fromiter(
+                (bool(it.get("has_photo")) for it in items), dtype=bool, count=n
+            ),
+            name=_object_array(names),
+            id=_object_array(
+                [it.get("id") or item_id(it["name"], it["lat"], it["lon"]) for it in items]
+            ),
+            photo_url=_object_array([it.get("photo_url") for it in items]),
+            local_photo_path=_object_array(
+                [it.get("local_photo_path") for it in items]
+            ),
+        )
+
+    @classmethod
+    def from_item_stream(
+        cls, items: Iterable[Mapping[str, Any]], batch_size: int = STREAM_BATCH
+    ) -> "CatalogColumns":
+        """
+        Same columns as from_items(), consuming `items` (e.g. the
+        iter_public_items() generator) `batch_size` at a time: numbers go
+        to typed arrays and strings to UTF-8 StringColumns, so memory holds
+        the packed columns plus one batch, never all the item dicts.
+        """
+        lat, lon, codes, has_photo = array("d"), array("d"), array("i"), array("b")
+        code_of: Dict[str, int] = {}
+        strings = {f: _StringColumnBuilder() for f in ("name", "id", "photo_url", "local_photo_path")}
+        it = iter(items)
+        while True:
+            batch = list(islice(it, batch_size))
+            if not batch:
+                break
+            lat.extend([b["lat"] for b in batch])
+            lon.extend([b["lon"] for b in batch])
+            for b in batch:
+                if b["region"] not in code_of:
+                    code_of[b["region"]] = len(code_of)
+            codes.extend([code_of[b["region"]] for b in batch])
+            has_photo.extend([bool(b.get("has_photo")) for b in batch])
+            strings["name"].extend([b["name"] for b in batch])
+            strings["id"].extend(
+                [b.get("id") or item_id(b["name"], b["lat"], b["lon"]) for b in batch]
+            )
+            strings["photo_url"].extend([b.get("photo_url") for b in batch])
+            strings["local_photo_path"].extend([b.get("local_photo_path") for b in batch])
+
+        # Codes were assigned in order of appearance; renumber to sorted regions.
+        regions = tuple(sorted(code_of))
+        renumber = np.empty(len(regions), dtype=np.int32)
+        for i, r in enumerate(regions):
+            renumber[code_of[r]] = i
+        lat_arr = np.frombuffer(lat, dtype=np.float64)
+        lon_arr = np.frombuffer(lon, dtype=np.float64)
+        lat_rad = np.radians(lat_arr)
+        return cls(
+            lat=lat_arr,
+            lon=lon_arr,
+            lat_rad=lat_rad,
+            lon_rad=np.radians(lon_arr),
+            cos_lat=np.cos(lat_rad),
+            region_code=renumber[np.frombuffer(codes, dtype=np.int32)],
+            regions=regions,
+            has_photo=np.frombuffer(has_photo, dtype=np.int8).view(bool),
+            name=strings["name"].build(),
+            id=strings["id"].build(),
+            photo_url=strings["photo_url"].build(),
+            local_photo_path=strings["local_photo_path"].build(),
+        )
+
+    def take(self, idx: np.ndarray) -> "CatalogColumns":
+        """The rows in `idx` as a catalog of their own (regions renumbered)."""
+        present = np.unique(self.region_code[idx])
+        renumber = np.full(len(self.regions), -1, dtype=np.int32)
+        renumber[present] = np.arange(len(present), dtype=np.int32)
+        return CatalogColumns(
+            lat=self.lat[idx],
+            lon=self.lon[idx],
+            lat_rad=self.lat_rad[idx],
+            lon_rad=self.lon_rad[idx],
+            cos_lat=self.cos_lat[idx],
+            region_code=renumber[self.region_code[idx]],
+            regions=tuple(self.regions[c] for c in present.tolist()),
+            has_photo=self.has_photo[idx],
+            name=self.name[idx],
+            id=self.id[idx],
+            photo_url=self.photo_url[idx],
+            local_photo_path=self.local_photo_path[idx],
+        )
+
+    def region_index(self, region: str) -> int:
+        """Code of `region`, or -1 if it is not present in the catalog."""
+        try:
+            return self.regions.index(region)
+        except ValueError:
+            return -1
+
+    def distances_km(
+        self, center_lat: float, center_lon: float, idx: np.ndarray | None = None
+    ) -> np.ndarray:
+        """Haversine distance from the center to every item (or to `idx`)."""
+        lat1 = np.radians(center_lat)
+        lat_rad, lon_rad, cos_lat = self.lat_rad, self.lon_rad, self.cos_lat
+        if idx is not None:
+            lat_rad, lon_rad, cos_lat = lat_rad[idx], lon_rad[idx], cos_lat[idx]
+        return haversine_km_rad(
+            lat1, np.radians(center_lon), np.cos(lat1), lat_rad, lon_rad, cos_lat
+        )
+
+    def records(self, idx: np.ndarray) -> Dict[str, np.ndarray]:
+        """Fancy-indexed output columns for the rows in `idx`."""
+        region_names = _object_array(list(self.regions))
+        return {
+            "id": self.id[idx],
+            "name": self.name[idx],
+            "region": region_names[self.region_code[idx]],
+            "lat": self.lat[idx],
+            "lon": self.lon[idx],
+        }
+
+
+class StringColumn:
+    """
+    Read-only string table (offsets + UTF-8 blob + null mask) that behaves
+    like the object arrays of CatalogColumns for indexing and iteration.
+    """
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray, null: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+        self.null = null
+        self._view = memoryview(blob)
+
+    def __len__(self) -> int:
+        return int(self.null.shape[0])
+
+    def _get(self, i: int) -> str | None:
+        if self.null[i]:
+            return None
+        return str(self._view[self.offsets[i] : self.offsets[i + 1]], "utf-8")
+
+    def __getitem__(self, key: Any) -> Any:
+        if isinstance(key, (int, np.integer)):
+            return self._get(int(key))
+        rows = np.arange(len(self))[key]
+        return _object_array([self._get(i) for i in rows.tolist()])
+
+    def __iter__(self) -> Iterator[str | None]:
+        return (self._get(i) for i in range(len(self)))
+
+
+class _StringColumnBuilder:
+    """Appends strings to one UTF-8 blob; build() wraps it as a StringColumn."""
+
+    def __init__(self) -> None:
+        self._blob = bytearray()
+        self._ends: List[np.ndarray] = []
+        self._null: List[np.ndarray] = []
+
+    def extend(self, values: List[Any]) -> None:
+        encoded = [b"" if v is None else str(v).encode("utf-8") for v in values]
+        lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+        self._ends.append(len(self._blob) + np.cumsum(lengths))
+        self._null.append(np.fromiter((v is None for v in values), dtype=bool, count=len(values)))
+        self._blob += b"".join(encoded)
+
+    def build(self) -> StringColumn:
+        ends = [np.zeros(1, dtype=np.int64)] + self._ends
+        null = np.concatenate(self._null) if self._null else np.zeros(0, dtype=bool)
+        return StringColumn(
+            np.concatenate(ends), np.frombuffer(self._blob, dtype=np.uint8), null
+        )
+
+
+def _object_array(values: List[Any]) -> np.ndarray:
+    arr = np.empty(len(values), dtype=object)
+    arr[:] = values
+    return arr
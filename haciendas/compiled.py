@@ -0,0 +1,240 @@
+"""
+Compiled (binary) catalog: normalized columns in one memory-mappable file.
+
+Layout, all little-endian:
+- 8-byte magic, uint64 header length, UTF-8 JSON header.
+- Arrays at 64-byte aligned offsets listed in the header: fixed-width
+  numeric columns, the grid index, the name search index (folded names as
+  fixed-width UTF-32 plus trigram and bigram postings), and, per string
+  field, int64 offsets + a UTF-8 blob + a null mask (a string table).
+
+Loading maps the file read-only and wraps every array with np.frombuffer,
+so nothing is parsed or copied up front; strings are decoded only for
+the rows that are actually displayed. The header records the SHA-256 of
+the source JSON, so a stale file is ignored and callers fall back to JSON.
+
+    python -m haciendas.compiled [catalog_public.json] [-o catalog_public.hcat]
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .catalog import iter_catalog_items, iter_public_items
+from .columns import CatalogColumns, StringColumn
+from .photos import PhotoIndex
+from .search import NameIndex
+from .spatial import GridIndex
+
+MAGIC = b"HCAT\x00\x00\x00\x01"
+FORMAT_VERSION = 5
+ALIGN = 64
+
+NUMERIC_FIELDS = ("lat", "lon", "lat_rad", "lon_rad", "cos_lat", "region_code", "has_photo")
+NAME_INDEX_FIELDS = (
+    "folded", "keys", "offsets", "postings", "bigram_keys", "bigram_offsets", "bigram_postings"
+)
+STRING_FIELDS = ("name", "id", "photo_url", "local_photo_path")
+
+
+def compiled_path_for(json_path: str) -> str:
+    """Where the compiled form of `json_path` lives (same name, .hcat)."""
+    return os.path.splitext(json_path)[0] + ".hcat"
+
+
+# --------------------------------------------------------------------
+# Writing
+# --------------------------------------------------------------------
+
+
+def _string_table(values: Sequence[str | None]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    if isinstance(values, StringColumn):
+        return values.offsets, values.blob, values.null
+    encoded = [b"" if v is None else str(v).encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    null = np.fromiter((v is None for v in values), dtype=bool, count=len(values))
+    return offsets, blob, null
+
+
+def write_arrays(
+    path: str, magic: bytes, header: Dict[str, Any], arrays: Dict[str, np.ndarray]
+) -> None:
+    """
+    Write `magic`, `header` (plus an "arrays" entry locating each array) and
+    the arrays at ALIGN-byte offsets to `path`, atomically replaced.
+    """
+    specs: Dict[str, Dict[str, Any]] = {}
+    offset = 0
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        arrays[name] = arr
+        specs[name] = {"dtype": arr.dtype.str, "count": int(arr.size), "offset": offset}
+        offset += -(-arr.nbytes // ALIGN) * ALIGN
+
+    header_bytes = json.dumps({**header, "arrays": specs}, ensure_ascii=False).encode("utf-8")
+    data_start = -(-(len(magic) + 8 + len(header_bytes)) // ALIGN) * ALIGN
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(magic + struct.pack("<Q", len(header_bytes)) + header_bytes)
+        for name, arr in arrays.items():
+            f.seek(data_start + specs[name]["offset"])
+            f.write(arr.tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp, path)
+
+
+def write_compiled(
+    path: str,
+    columns: CatalogColumns,
+    grid: GridIndex,
+    names: NameIndex,
+    source_sha256: str,
+) -> None:
+    """Serialize `columns` and both indexes to `path` (atomically replaced)."""
+    arrays: Dict[str, np.ndarray] = {f: getattr(columns, f) for f in NUMERIC_FIELDS}
+    for f in STRING_FIELDS:
+        offsets, blob, null = _string_table(getattr(columns, f))
+        arrays[f"{f}.offsets"], arrays[f"{f}.blob"], arrays[f"{f}.null"] = offsets, blob, null
+    arrays["grid.order"] = grid.order.astype(np.int64)
+    arrays["grid.keys"] = grid.keys.astype(np.int64)
+    for f in NAME_INDEX_FIELDS:
+        arrays[f"names.{f}"] = getattr(names, f)
+
+    header = {
+        "format": FORMAT_VERSION,
+        "source_sha256": source_sha256,
+        "n": len(columns),
+        "regions": list(columns.regions),
+        "grid": {
+            "cell_deg": grid.cell_deg,
+            "lat0": grid.lat0,
+            "lon0": grid.lon0,
+            "n_rows": grid.n_rows,
+            "n_cols": grid.n_cols,
+        },
+    }
+    write_arrays(path, MAGIC, header, arrays)
+
+
+def compile_catalog(json_path: str, out_path: str, photos: PhotoIndex) -> int:
+    """Normalize `json_path` and write its compiled form; return the item count."""
+    h = hashlib.sha256()
+    with open(json_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    source_sha256 = h.hexdigest()
+    photos.refresh()
+    columns = CatalogColumns.from_item_stream(
+        iter_public_items(iter_catalog_items(json_path), photos)
+    )
+    write_compiled(
+        out_path, columns, GridIndex.build(columns), NameIndex.build(columns.name), source_sha256
+    )
+    return len(columns)
+
+
+# --------------------------------------------------------------------
+# Loading
+# --------------------------------------------------------------------
+
+
+def map_arrays(
+    path: str, magic: bytes
+) -> Tuple[Dict[str, Any], Callable[[str], np.ndarray]] | None:
+    """
+    Memory-map a file written by write_arrays(). Returns its header and a
+    function giving each named array as a read-only view of the mapping,
+    or None when the file is absent or does not start with `magic`.
+    """
+    try:
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        if mm[: len(magic)] != magic:
+            return None
+        (header_len,) = struct.unpack_from("<Q", mm, len(magic))
+        header = json.loads(bytes(mm[len(magic) + 8 : len(magic) + 8 + header_len]))
+    except (ValueError, struct.error):
+        return None
+    if not isinstance(header, dict):
+        return None
+    data_start = -(-(len(magic) + 8 + header_len) // ALIGN) * ALIGN
+
+    def array(name: str) -> np.ndarray:
+        """The named array; KeyError if not listed, ValueError if past the end of the file."""
+        spec = header["arrays"][name]
+        dtype = np.dtype(spec["dtype"])
+        count, offset = int(spec["count"]), data_start + int(spec["offset"])
+        # A truncated file can still have an intact header.
+        if count < 0 or offset < data_start or offset + count * dtype.itemsize > len(mm):
+            raise ValueError(f"array {name!r} extends past the end of {path}")
+        return np.frombuffer(mm, dtype=dtype, count=count, offset=offset)
+
+    return header, array
+
+
+def load_compiled(
+    path: str, source_sha256: str | None = None
+) -> Tuple[CatalogColumns, GridIndex, NameIndex] | None:
+    """
+    Memory-map a compiled catalog. Returns None when the file is absent,
+    not a compiled catalog of this format version, (if `source_sha256` is
+    given) built from a different JSON, or truncated / missing entries, so
+    callers fall back to the JSON.
+    """
+    mapped = map_arrays(path, MAGIC)
+    if mapped is None:
+        return None
+    header, array = mapped
+    if header.get("format") != FORMAT_VERSION:
+        return None
+    if source_sha256 is not None and header.get("source_sha256") != source_sha256:
+        return None
+
+    try:
+        fields: Dict[str, Any] = {f: array(f) for f in NUMERIC_FIELDS}
+        for f in STRING_FIELDS:
+            fields[f] = StringColumn(array(f"{f}.offsets"), array(f"{f}.blob"), array(f"{f}.null"))
+        columns = CatalogColumns(regions=tuple(header["regions"]), **fields)
+        g = header["grid"]
+        grid = GridIndex(
+            columns=columns,
+            cell_deg=g["cell_deg"],
+            lat0=g["lat0"],
+            lon0=g["lon0"],
+            n_rows=g["n_rows"],
+            n_cols=g["n_cols"],
+            order=array("grid.order"),
+            keys=array("grid.keys"),
+        )
+        names = NameIndex(**{f: array(f"names.{f}") for f in NAME_INDEX_FIELDS})
+    except (KeyError, TypeError, ValueError):
+        return None
+    return columns, grid, names
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Compile catalog_public.json to a memory-mappable file.")
+    ap.add_argument("catalog", nargs="?", default="catalog_public.json")
+    ap.add_argument("-o", "--output", default=None, help="default: <catalog>.hcat next to the JSON")
+    ap.add_argument("--photos", default="fotos_public", help="local photo directory")
+    args = ap.parse_args(argv)
+
+    out = args.output or compiled_path_for(args.catalog)
+    n = compile_catalog(args.catalog, out, PhotoIndex(args.photos))
+    print(f"{out}: {n} items, {os.path.getsize(out) / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
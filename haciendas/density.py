@@ -0,0 +1,350 @@
+"""
+Precomputed density of the catalog, for wide views.
+
+Items are counted per web-mercator tile at every tile zoom in TILE_ZOOMS,
+per region, together with how many have a local photo. A tile at tile zoom
+z is CELL_PX screen pixels wide on a map at zoom z - TILE_ZOOM_OFFSET and
+splits into four tiles at z + 1, so the levels form a quadtree keyed by
+Morton code (spatial.morton_code): the rows of a level are sorted by
+(code, region), and a tile's items are one contiguous run of items sorted
+by their finest-level code.
+
+DensityPyramid.view() answers "what is inside this circle" in O(tiles in
+view): tiles entirely inside are read from their level's rows, tiles
+entirely outside are dropped, and tiles straddling the edge are split into
+their children, level by level; only the items of finest tiles that still
+straddle it are measured. Counts per tile and per region are exact: they
+match df_for_radius() for the same center, radius, region and photo filter.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .columns import CatalogColumns
+from .geo import EARTH_RADIUS_KM, haversine_km_rad
+from .spatial import bounding_box, morton_code
+
+CELL_PX = 32
+TILE_ZOOM_OFFSET = 3  # log2(256 / CELL_PX)
+# Map zooms 4-12 (zoom_for_radius() uses 7-12).
+TILE_ZOOMS = tuple(range(4 + TILE_ZOOM_OFFSET, 12 + TILE_ZOOM_OFFSET + 1))
+
+_REGION_BITS = 16
+_REGION_MASK = (1 << _REGION_BITS) - 1
+# Slack for rounding when deciding a tile is entirely inside/outside, in km.
+_EDGE_EPS_KM = 1e-6
+_MAX_MERCATOR_LAT = 85.05112878
+
+
+@dataclass(frozen=True)
+class DensityLevel:
+    """
+    One tile zoom: `keys` (tile code << 16 | region code, ascending) with
+    the item count and local-photo count of each (tile, region) pair.
+    """
+
+    zoom: int
+    keys: np.ndarray
+    count: np.ndarray
+    photos: np.ndarray
+
+    def runs(self, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Start/end positions of each tile's rows."""
+        return (
+            np.searchsorted(self.keys, codes << _REGION_BITS, side="left"),
+            np.searchsorted(self.keys, (codes + 1) << _REGION_BITS, side="left"),
+        )
+
+
+@dataclass(frozen=True)
+class DensityView:
+    """
+    The tiles of one zoom holding items inside a circle, with exact counts,
+    and the same counts per region (indexed by region code).
+    """
+
+    zoom: int
+    regions: Tuple[str, ...]
+    x: np.ndarray
+    y: np.ndarray
+    count: np.ndarray
+    photos: np.ndarray
+    min_km: np.ndarray
+    region_code: np.ndarray
+    region_count: np.ndarray
+    region_photos: np.ndarray
+
+    def __len__(self) -> int:
+        return int(self.x.shape[0])
+
+    @property
+    def total(self) -> int:
+        return int(self.region_count.sum())
+
+    def polygons(self) -> List[List[List[float]]]:
+        """[lon, lat] corners of each tile."""
+        west, east, north, south = tile_bounds(self.x, self.y, self.zoom)
+        return np.round(
+            np.stack(
+                [
+                    np.stack([west, north], axis=1),
+                    np.stack([east, north], axis=1),
+                    np.stack([east, south], axis=1),
+                    np.stack([west, south], axis=1),
+                ],
+                axis=1,
+            ),
+            6,
+        ).tolist()
+
+    def region_stats(self) -> pd.DataFrame:
+        """Regions with items in the circle: count and local-photo count, largest first."""
+        present = np.flatnonzero(self.region_count)
+        order = present[np.lexsort((present, -self.region_count[present]))]
+        return pd.DataFrame(
+            {
+                "region": [self.regions[i] for i in order.tolist()],
+                "count": self.region_count[order],
+                "with_photo": self.region_photos[order],
+            }
+        )
+
+
+def result_region_stats(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    DensityView.region_stats() from a df_for_radius() frame, for catalogs
+    without a pyramid (shards): same columns and order (count descending,
+    then region name).
+    """
+    stats = (
+        df.groupby("region", sort=True)["has_photo"]
+        .agg(count="size", with_photo="sum")
+        .reset_index()
+    )
+    stats = stats.sort_values(["count", "region"], ascending=[False, True], kind="mergesort")
+    return stats.astype({"count": np.int64, "with_photo": np.int64}).reset_index(drop=True)
+
+
+def tile_xy(lat: np.ndarray, lon: np.ndarray, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Web-mercator tile column and row of each point at `zoom`."""
+    n = 1 << zoom
+    lat_rad = np.radians(np.clip(lat, -_MAX_MERCATOR_LAT, _MAX_MERCATOR_LAT))
+    x = np.floor((np.asarray(lon, dtype=float) + 180.0) / 360.0 * n)
+    y = np.floor((1.0 - np.arcsinh(np.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return np.clip(x, 0, n - 1).astype(np.int64), np.clip(y, 0, n - 1).astype(np.int64)
+
+
+def tile_bounds(x: np.ndarray, y: np.ndarray, zoom: int) -> Tuple[np.ndarray, ...]:
+    """(west, east, north, south) of each tile, in degrees."""
+    n = float(1 << zoom)
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * y / n))))
+    south = np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return west, east, north, south
+
+
+def tile_distances_km(
+    x: np.ndarray, y: np.ndarray, zoom: int, center_lat: float, center_lon: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (nearest, farthest) great-circle distance from the center to each tile.
+    The farthest point of a lat/lon rectangle is a corner (distance grows
+    with |dlon| along a parallel and has no interior maximum); the nearest
+    is on the center's meridian when the tile spans it, otherwise on the
+    closer meridian edge, at the latitude closest to the center.
+    """
+    west, east, north, south = (np.radians(b) for b in tile_bounds(x, y, zoom))
+    lat1, lon1 = math.radians(center_lat), math.radians(center_lon)
+    cos1 = math.cos(lat1)
+
+    def dist(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        return haversine_km_rad(lat1, lon1, cos1, lat, lon, np.cos(lat))
+
+    farthest = np.maximum.reduce(
+        [dist(north, west), dist(north, east), dist(south, west), dist(south, east)]
+    )
+    d_west = (west - lon1 + math.pi) % (2 * math.pi) - math.pi
+    d_east = (east - lon1 + math.pi) % (2 * math.pi) - math.pi
+    spans = (d_west <= 0) & (d_east >= 0)
+    d_edge = np.where(np.abs(d_west) < np.abs(d_east), d_west, d_east)
+    cos_edge = np.cos(d_edge)
+    lat_edge = np.clip(np.arctan2(math.tan(lat1), np.maximum(cos_edge, 1e-12)), south, north)
+    nearest = np.where(
+        spans,
+        EARTH_RADIUS_KM * np.abs(lat1 - np.clip(lat1, south, north)),
+        # Past 90 degrees of longitude the closed form does not hold; 0
+        # only means "not known to be outside".
+        np.where(cos_edge > 0, dist(lat_edge, lon1 + d_edge), 0.0),
+    )
+    return nearest, farthest
+
+
+def _ranges(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(positions in all runs [start, end), index of the run of each)."""
+    lens = ends - starts
+    owner = np.repeat(np.arange(len(lens)), lens)
+    first = np.cumsum(lens) - lens
+    return starts[owner] + np.arange(int(lens.sum())) - first[owner], owner
+
+
+@dataclass(frozen=True)
+class DensityPyramid:
+    """Per-tile, per-region item and photo counts at every zoom in TILE_ZOOMS."""
+
+    columns: CatalogColumns
+    photo_flags: np.ndarray
+    levels: Dict[int, DensityLevel]
+    item_order: np.ndarray
+    item_code: np.ndarray
+
+    @property
+    def finest(self) -> int:
+        return max(self.levels)
+
+    @classmethod
+    def build(
+        cls, columns: CatalogColumns, photo_flags: np.ndarray, tile_zooms: Tuple[int, ...] = TILE_ZOOMS
+    ) -> "DensityPyramid":
+        """One sort of the items by finest tile, then each level from the one below."""
+        zooms = sorted(tile_zooms)
+        if zooms != list(range(zooms[0], zooms[-1] + 1)) or zooms[-1] > 16:
+            raise ValueError("tile zooms must be consecutive and at most 16")
+        with metrics.span("density.build"):
+            x, y = tile_xy(columns.lat, columns.lon, zooms[-1])
+            code = morton_code(y, x)
+            item_order = np.argsort(code, kind="stable")
+            keys = (code << _REGION_BITS) | columns.region_code.astype(np.int64)
+            keys, inverse = np.unique(keys, return_inverse=True)
+            count = np.bincount(inverse, minlength=len(keys)).astype(np.int64)
+            photos = np.bincount(inverse, weights=photo_flags, minlength=len(keys)).astype(np.int64)
+            levels = {zooms[-1]: DensityLevel(zooms[-1], keys, count, photos)}
+            for z in reversed(zooms[:-1]):
+                parent = ((keys >> (_REGION_BITS + 2)) << _REGION_BITS) | (keys & _REGION_MASK)
+                keys, inverse = np.unique(parent, return_inverse=True)
+                count = np.bincount(inverse, weights=count, minlength=len(keys)).astype(np.int64)
+                photos = np.bincount(inverse, weights=photos, minlength=len(keys)).astype(np.int64)
+                levels[z] = DensityLevel(z, keys, count, photos)
+        return cls(
+            columns=columns,
+            photo_flags=photo_flags,
+            levels=levels,
+            item_order=item_order,
+            item_code=code[item_order],
+        )
+
+    def view(
+        self,
+        center_lat: float,
+        center_lon: float,
+        radius_km: float,
+        map_zoom: int,
+        region_code: int | None = None,
+        only_with_photo: bool = False,
+        only_without_photo: bool = False,
+    ) -> DensityView | None:
+        """
+        Tiles at `map_zoom` holding items within `radius_km` of the center
+        (optionally of one region, with or without local photo), or None
+        when the circle wraps a pole or the antimeridian.
+        """
+        bbox = bounding_box(center_lat, center_lon, radius_km)
+        if bbox is None:
+            return None
+        zoom = min(max(map_zoom + TILE_ZOOM_OFFSET, min(self.levels)), self.finest)
+        with metrics.span("density.view"):
+            lat_min, lat_max, lon_min, lon_max = bbox
+            x0, y0 = tile_xy(np.array([lat_max]), np.array([lon_min]), zoom)
+            x1, y1 = tile_xy(np.array([lat_min]), np.array([lon_max]), zoom)
+            xs, ys = np.meshgrid(np.arange(x0[0], x1[0] + 1), np.arange(y0[0], y1[0] + 1))
+            x, y = xs.ravel(), ys.ravel()
+            tile = np.arange(len(x))
+            n_tiles = len(tile)
+
+            # (tile of `zoom`, region, count, photos) of every piece found inside.
+            parts: List[Tuple[np.ndarray, ...]] = []
+            z = zoom
+            while len(x):
+                level = self.levels[z]
+                code = morton_code(y, x)
+                starts, ends = level.runs(code)
+                near, far = tile_distances_km(x, y, z, center_lat, center_lon)
+                if z == zoom:
+                    min_km = near
+                live = (ends > starts) & (near <= radius_km + _EDGE_EPS_KM)
+                inside = live & (far <= radius_km - _EDGE_EPS_KM)
+                rows, owner = _ranges(starts[inside], ends[inside])
+                parts.append(
+                    (
+                        tile[inside][owner],
+                        level.keys[rows] & _REGION_MASK,
+                        level.count[rows],
+                        level.photos[rows],
+                    )
+                )
+                edge = live & ~inside
+                x, y, tile, code = x[edge], y[edge], tile[edge], code[edge]
+                if z == self.finest:
+                    parts.append(self._measure(code, tile, center_lat, center_lon, radius_km))
+                    break
+                # Four children per straddling tile.
+                x = (2 * x[:, None] + np.array([0, 1, 0, 1])).ravel()
+                y = (2 * y[:, None] + np.array([0, 0, 1, 1])).ravel()
+                tile = np.repeat(tile, 4)
+                z += 1
+
+            owner, region, count, photos = (np.concatenate(p) for p in zip(*parts))
+            if region_code is not None:
+                keep = region == region_code
+                owner, region, count, photos = owner[keep], region[keep], count[keep], photos[keep]
+            if only_with_photo:
+                count = photos
+            elif only_without_photo:
+                count, photos = count - photos, np.zeros_like(photos)
+            tile_count = np.bincount(owner, weights=count, minlength=n_tiles).astype(np.int64)
+            tile_photos = np.bincount(owner, weights=photos, minlength=n_tiles).astype(np.int64)
+            # Region with most items in each tile (lowest code on ties).
+            pair, pair_inv = np.unique(owner * (1 << _REGION_BITS) + region, return_inverse=True)
+            pair_count = np.bincount(pair_inv, weights=count, minlength=len(pair))
+            by_tile = np.lexsort((pair & _REGION_MASK, -pair_count, pair >> _REGION_BITS))
+            first = by_tile[np.diff(pair[by_tile] >> _REGION_BITS, prepend=-1) != 0]
+            dominant = np.zeros(n_tiles, dtype=np.int64)
+            dominant[pair[first] >> _REGION_BITS] = pair[first] & _REGION_MASK
+
+            n_regions = len(self.columns.regions)
+            shown = np.flatnonzero(tile_count)
+            return DensityView(
+                zoom=zoom,
+                regions=self.columns.regions,
+                x=xs.ravel()[shown],
+                y=ys.ravel()[shown],
+                count=tile_count[shown],
+                photos=tile_photos[shown],
+                min_km=min_km[shown],
+                region_code=dominant[shown],
+                region_count=np.bincount(region, weights=count, minlength=n_regions).astype(np.int64),
+                region_photos=np.bincount(region, weights=photos, minlength=n_regions).astype(np.int64),
+            )
+
+    def _measure(
+        self, code: np.ndarray, tile: np.ndarray, center_lat: float, center_lon: float, radius_km: float
+    ) -> Tuple[np.ndarray, ...]:
+        """Pieces for the items of finest tiles `code`, measured exactly."""
+        starts = np.searchsorted(self.item_code, code, side="left")
+        ends = np.searchsorted(self.item_code, code, side="right")
+        pos, owner = _ranges(starts, ends)
+        items = self.item_order[pos]
+        dkm = self.columns.distances_km(center_lat, center_lon, items)
+        keep = dkm <= radius_km
+        items = items[keep]
+        return (
+            tile[owner[keep]],
+            self.columns.region_code[items].astype(np.int64),
+            np.ones(len(items), dtype=np.int64),
+            self.photo_flags[items].astype(np.int64),
+        )
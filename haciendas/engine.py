@@ -0,0 +1,244 @@
+"""
+Headless query engine: catalog loading, indexing and radius queries.
+
+Everything here is importable without Streamlit (workers, benchmarks,
+the haciendas-query CLI); app_public.py adds process-wide caching and UI.
+"""
+
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .catalog import iter_catalog_items, iter_public_items
+from .columns import CatalogColumns
+from .compiled import compiled_path_for, load_compiled
+from .photos import PhotoIndex
+from .search import NameIndex
+from .spatial import GridIndex
+
+# --------------------------------------------------------------------
+# Catalog
+# --------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class PublicCatalog:
+    """Normalized, read-only catalog: columns, indexes and source digest."""
+
+    columns: CatalogColumns
+    grid: GridIndex
+    names: NameIndex
+    digest: str
+
+    @classmethod
+    def from_items(cls, items: List[Dict[str, Any]], digest: str) -> "PublicCatalog":
+        with metrics.span("catalog.columns"):
+            columns = CatalogColumns.from_items(items)
+        return cls.from_columns(columns, digest)
+
+    @classmethod
+    def from_columns(cls, columns: CatalogColumns, digest: str) -> "PublicCatalog":
+        with metrics.span("catalog.grid_index"):
+            grid = GridIndex.build(columns)
+        with metrics.span("catalog.name_index"):
+            names = NameIndex.build(columns.name)
+        return cls(columns=columns, grid=grid, names=names, digest=digest)
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    @property
+    def regions(self) -> Tuple[str, ...]:
+        return self.columns.regions
+
+
+EMPTY_CATALOG = PublicCatalog.from_items([], digest="")
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_public_catalog(
+    path: str, photos: PhotoIndex, digest: str | None = None
+) -> PublicCatalog:
+    """
+    Load the catalog at `path` (JSON), preferring its compiled form
+    (<name>.hcat, see compiled.py) when that was built from the same JSON.
+    `digest` is the JSON's SHA-256 if the caller already knows it.
+    The JSON is streamed: items are parsed, filtered and normalized one at
+    a time straight into packed columns (CatalogColumns.from_item_stream).
+    """
+    if not os.path.exists(path):
+        return EMPTY_CATALOG
+    if digest is None:
+        digest = file_sha256(path)
+    with metrics.span("catalog.load_compiled"):
+        compiled = load_compiled(compiled_path_for(path), source_sha256=digest)
+    if compiled is not None:
+        columns, grid, names = compiled
+        return PublicCatalog(columns=columns, grid=grid, names=names, digest=digest)
+
+    photos.refresh()
+    with metrics.span("catalog.stream_json"):
+        try:
+            columns = CatalogColumns.from_item_stream(
+                iter_public_items(iter_catalog_items(path), photos)
+            )
+        except ValueError:
+            # Malformed JSON: same outcome as load_catalog().
+            return PublicCatalog.from_items([], digest=digest)
+    return PublicCatalog.from_columns(columns, digest=digest)
+
+
+def photo_flags(catalog: PublicCatalog, photos: PhotoIndex) -> np.ndarray:
+    """Read-only local-photo flag per catalog item, from the photo index."""
+    with metrics.span("photos.flags"):
+        flags = photos.flags(catalog.columns.local_photo_path)
+    flags.setflags(write=False)
+    return flags
+
+
+# --------------------------------------------------------------------
+# Queries
+# --------------------------------------------------------------------
+
+
+def _filter_rows(
+    catalog: PublicCatalog,
+    photo_flags: np.ndarray,
+    idx: np.ndarray,
+    only_with_photo: bool,
+    only_without_photo: bool,
+    name_query: str,
+    region_filter: str,
+    name_mode: str,
+) -> np.ndarray:
+    """The entries of `idx` (ascending item indices) passing every filter."""
+    columns = catalog.columns
+    if region_filter:
+        code = columns.region_index(str(region_filter))
+        idx = idx[columns.region_code[idx] == code]
+    if (name_query or "").strip():
+        idx = catalog.names.filter(idx, name_query, name_mode)
+    if only_with_photo:
+        idx = idx[photo_flags[idx]]
+    if only_without_photo:
+        idx = idx[~photo_flags[idx]]
+    return idx
+
+
+def _result_frame(
+    catalog: PublicCatalog, photo_flags: np.ndarray, idx: np.ndarray, dkm: np.ndarray
+) -> pd.DataFrame:
+    """Output rows for `idx`, ordered by rounded distance, then name, then id."""
+    columns = catalog.columns
+    distance_km = np.round(dkm, 3)
+    with metrics.span("query.sort"):
+        names = columns.name[idx]
+        order = np.lexsort((names, distance_km))
+        # Ties on both are rare; the id decides them, the same way for the
+        # sharded merge and haciendas-batch (catalog order is not shared).
+        d, n = distance_km[order], names[order]
+        if ((d[1:] == d[:-1]) & (n[1:] == n[:-1])).any():
+            order = np.lexsort((columns.id[idx], names, distance_km))
+    with metrics.span("query.frame"):
+        idx, distance_km = idx[order], distance_km[order]
+        data = columns.records(idx)
+        data["distance_km"] = distance_km
+        data["has_photo"] = photo_flags[idx]
+        data["photo_url"] = columns.photo_url[idx]
+        data["local_photo_path"] = columns.local_photo_path[idx]
+        return pd.DataFrame(data)
+
+
+def df_for_radius(
+    catalog: PublicCatalog,
+    photo_flags: np.ndarray,
+    center_lat: float,
+    center_lon: float,
+    radius_km: float,
+    only_with_photo: bool,
+    only_without_photo: bool,
+    name_query: str,
+    region_filter: str,
+    name_mode: str = "contains",
+) -> pd.DataFrame:
+    """
+    Build filtered DataFrame for public view:
+    - Applies radius filter (grid cells in the circle's bounding box, then
+      exact vectorized haversine on those candidates only).
+    - Optionally filters by name, accent- and case-insensitively, through
+      the trigram index (`name_mode`: "contains", "prefix" or "fuzzy").
+    - Optionally filters by region ("" or None means all regions).
+    - Optionally filters by local-photo presence (`photo_flags`, see
+      photo_flags()).
+    Each filter narrows an index array; the result is built by fancy indexing.
+    """
+    with metrics.span("query.radius"):
+        with metrics.span("query.within"):
+            idx, dkm = catalog.grid.within(center_lat, center_lon, radius_km)
+        with metrics.span("query.filter"):
+            kept = _filter_rows(
+                catalog,
+                photo_flags,
+                idx,
+                only_with_photo,
+                only_without_photo,
+                name_query,
+                region_filter,
+                name_mode,
+            )
+        return _result_frame(catalog, photo_flags, kept, dkm[np.searchsorted(idx, kept)])
+
+
+def df_for_nearest(
+    catalog: PublicCatalog,
+    photo_flags: np.ndarray,
+    center_lat: float,
+    center_lon: float,
+    k: int,
+    only_with_photo: bool,
+    only_without_photo: bool,
+    name_query: str,
+    region_filter: str,
+    name_mode: str = "contains",
+) -> pd.DataFrame:
+    """
+    The `k` items nearest to the center that pass the same filters as
+    df_for_radius(), in the same shape and order. Filters are applied
+    while the search widens (GridIndex.nearest), so "the 20 closest with
+    a photo" never measures the rest of the catalog. The k are the first k
+    rows in that order: items rounding to the same distance as the k-th
+    compete by name, then id, exactly as when shards are merged.
+    """
+    with metrics.span("query.nearest"):
+        with metrics.span("query.knn_search"):
+            idx, dkm = catalog.grid.nearest(
+                center_lat,
+                center_lon,
+                int(k),
+                accept=lambda rows: _filter_rows(
+                    catalog,
+                    photo_flags,
+                    rows,
+                    only_with_photo,
+                    only_without_photo,
+                    name_query,
+                    region_filter,
+                    name_mode,
+                ),
+                # Anything that can round to the k-th rounded distance.
+                ties_km=0.001,
+            )
+        df = _result_frame(catalog, photo_flags, idx, dkm)
+        return df if len(df) <= k else df.iloc[: int(k)]
@@ -0,0 +1,205 @@
+"""
+Exporters for a filtered result set (the DataFrame from df_for_radius).
+
+Every builder walks plain column lists (never DataFrame rows) and yields
+the document in chunks, so large exports can be streamed; build_* helpers
+join the chunks into bytes for download buttons.
+"""
+
+import hashlib
+import json
+from typing import Callable, Dict, Iterator, List, Tuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+
+EXPORT_COLUMNS = ["name", "lat", "lon", "region", "has_photo"]
+
+# Rows per yielded chunk.
+CHUNK_ROWS = 2048
+
+
+def export_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Only the columns that are safe to publish."""
+    return df[EXPORT_COLUMNS]
+
+
+def fingerprint(df: pd.DataFrame) -> str:
+    """
+    Hash of the result's item IDs, coordinates and photo flags, in order.
+    IDs are unique per catalog, so within one catalog (pair it with the
+    catalog digest) this identifies the result set, including names and
+    regions, even when items share coordinates.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update("\x00".join(map(str, df["id"].tolist())).encode("utf-8"))
+    for col in ("lat", "lon", "has_photo"):
+        h.update(np.ascontiguousarray(df[col].to_numpy()).tobytes())
+    return h.hexdigest()
+
+
+def _columns(df: pd.DataFrame) -> Tuple[List[str], List[float], List[float], List[str], List[bool]]:
+    return (
+        [str(v) for v in df["name"].tolist()],
+        df["lat"].astype(float).tolist(),
+        df["lon"].astype(float).tolist(),
+        [str(v) for v in df["region"].tolist()],
+        df["has_photo"].astype(bool).tolist(),
+    )
+
+
+def _chunked(lines: Iterator[str]) -> Iterator[str]:
+    buf: List[str] = []
+    for line in lines:
+        buf.append(line)
+        if len(buf) >= CHUNK_ROWS:
+            yield "".join(buf)
+            buf = []
+    if buf:
+        yield "".join(buf)
+
+
+def iter_csv(df: pd.DataFrame) -> Iterator[str]:
+    frame = export_frame(df)
+    yield frame.iloc[:0].to_csv(index=False)
+    for start in range(0, len(frame), CHUNK_ROWS):
+        yield frame.iloc[start : start + CHUNK_ROWS].to_csv(index=False, header=False)
+
+
+def iter_geojson(df: pd.DataFrame) -> Iterator[str]:
+    names, lats, lons, regions, photos = _columns(df)
+    dumps = json.dumps
+
+    def features() -> Iterator[str]:
+        sep = "\n"
+        for name, lat, lon, region, photo in zip(names, lats, lons, regions, photos):
+            yield (
+                f'{sep}{{"type": "Feature", "geometry": {{"type": "Point", '
+                f'"coordinates": [{lon!r}, {lat!r}]}}, '
+                f'"properties": {{"name": {dumps(name, ensure_ascii=False)}, '
+                f'"region": {dumps(region, ensure_ascii=False)}, '
+                f'"has_photo": {"true" if photo else "false"}}}}}'
+            )
+            sep = ",\n"
+
+    yield '{"type": "FeatureCollection", "features": ['
+    yield from _chunked(features())
+    yield "\n]}\n"
+
+
+def iter_gpx(df: pd.DataFrame) -> Iterator[str]:
+    names, lats, lons, _, _ = _columns(df)
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gpx version="1.1" creator="HaciendasNearbyPublic" xmlns="http://www.topografix.com/GPX/1/1">\n'
+    )
+    yield from _chunked(
+        f'  <wpt lat="{lat:.6f}" lon="{lon:.6f}">\n    <name>{escape(name)}</name>\n  </wpt>\n'
+        for name, lat, lon in zip(names, lats, lons)
+    )
+    yield "</gpx>"
+
+
+def iter_kml(df: pd.DataFrame) -> Iterator[str]:
+    names, lats, lons, regions, photos = _columns(df)
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<kml xmlns="http://www.opengis.net/kml/2.2">\n'
+        "<Document>\n"
+        "  <name>Haciendas Nearby – Public</name>\n"
+    )
+    yield from _chunked(
+        f"  <Placemark>\n"
+        f"    <name>{escape(name)}</name>\n"
+        f"    <ExtendedData>\n"
+        f'      <Data name="region"><value>{escape(region)}</value></Data>\n'
+        f'      <Data name="has_photo"><value>{"true" if photo else "false"}</value></Data>\n'
+        f"    </ExtendedData>\n"
+        f"    <Point><coordinates>{lon:.6f},{lat:.6f},0</coordinates></Point>\n"
+        f"  </Placemark>\n"
+        for name, lat, lon, region, photo in zip(names, lats, lons, regions, photos)
+    )
+    yield "</Document>\n</kml>\n"
+
+
+def iter_route_gpx(
+    df: pd.DataFrame,
+    start_lat: float,
+    start_lon: float,
+    round_trip: bool = False,
+    start_name: str = "Start",
+) -> Iterator[str]:
+    """
+    GPX for a planned route: `df` in visiting order (see tour.plan_tour).
+    Writes the stops as waypoints, then the same sequence from the start
+    (and back to it for round trips) as a <rte> for navigation apps and a
+    <trk> for track viewers.
+    """
+    names, lats, lons, _, _ = _columns(df)
+    start = [(start_name, float(start_lat), float(start_lon))]
+    points = start + list(zip(names, lats, lons)) + (start if round_trip else [])
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gpx version="1.1" creator="HaciendasNearbyPublic" xmlns="http://www.topografix.com/GPX/1/1">\n'
+    )
+    yield from _chunked(
+        f'  <wpt lat="{lat:.6f}" lon="{lon:.6f}">\n    <name>{escape(name)}</name>\n  </wpt>\n'
+        for name, lat, lon in zip(names, lats, lons)
+    )
+    yield "  <rte>\n    <name>Haciendas Nearby</name>\n"
+    yield from _chunked(
+        f'    <rtept lat="{lat:.6f}" lon="{lon:.6f}"><name>{escape(name)}</name></rtept>\n'
+        for name, lat, lon in points
+    )
+    yield "  </rte>\n  <trk>\n    <name>Haciendas Nearby</name>\n    <trkseg>\n"
+    yield from _chunked(
+        f'      <trkpt lat="{lat:.6f}" lon="{lon:.6f}"/>\n' for _, lat, lon in points
+    )
+    yield "    </trkseg>\n  </trk>\n</gpx>\n"
+
+
+# kind -> (chunk iterator, file name, MIME type)
+EXPORTERS: Dict[str, Tuple[Callable[[pd.DataFrame], Iterator[str]], str, str]] = {
+    "csv": (iter_csv, "haciendas_public.csv", "text/csv"),
+    "geojson": (iter_geojson, "haciendas_public.geojson", "application/geo+json"),
+    "gpx": (iter_gpx, "haciendas_public.gpx", "application/gpx+xml"),
+    "kml": (iter_kml, "haciendas_public.kml", "application/vnd.google-earth.kml+xml"),
+}
+
+
+def build_export(kind: str, df: pd.DataFrame) -> bytes:
+    """The complete `kind` export of `df`, UTF-8 encoded."""
+    iter_chunks = EXPORTERS[kind][0]
+    with metrics.span(f"export.{kind}"):
+        return "".join(iter_chunks(df)).encode("utf-8")
+
+
+def build_geojson(df: pd.DataFrame) -> bytes:
+    return build_export("geojson", df)
+
+
+def build_gpx(df: pd.DataFrame) -> bytes:
+    return build_export("gpx", df)
+
+
+def build_kml(df: pd.DataFrame) -> bytes:
+    return build_export("kml", df)
+
+
+ROUTE_GPX_FILE = "haciendas_public_route.gpx"
+
+
+def build_route_gpx(
+    df: pd.DataFrame,
+    start_lat: float,
+    start_lon: float,
+    round_trip: bool = False,
+    start_name: str = "Start",
+) -> bytes:
+    """The complete iter_route_gpx() document, UTF-8 encoded."""
+    with metrics.span("export.gpx_route"):
+        chunks = iter_route_gpx(df, start_lat, start_lon, round_trip, start_name)
+        return "".join(chunks).encode("utf-8")
@@ -0,0 +1,66 @@
+import math
+from typing import List
+
+import numpy as np
+
+from . import metrics
+
+# --------------------------------------------------------------------
+# Great-circle helpers (spherical Earth)
+# --------------------------------------------------------------------
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in km."""
+    R = EARTH_RADIUS_KM
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon1 - lon2)
+    a = (
+        math.sin(dphi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    )
+    return 2 * R * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def haversine_km_rad(
+    lat1: float,
+    lon1: float,
+    cos_lat1: float,
+    lat2: np.ndarray,
+    lon2: np.ndarray,
+    cos_lat2: np.ndarray,
+) -> np.ndarray:
+    """
+    Vectorized haversine from one point to many, all inputs in radians.
+    cos(lat) is passed in precomputed so catalogs only pay for it once.
+    """
+    sin_dphi = np.sin((lat2 - lat1) * 0.5)
+    sin_dlambda = np.sin((lon1 - lon2) * 0.5)
+    a = sin_dphi * sin_dphi + cos_lat1 * cos_lat2 * sin_dlambda * sin_dlambda
+    np.clip(a, 0.0, 1.0, out=a)
+    return 2 * EARTH_RADIUS_KM * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+@metrics.timed("geo.circle_polygon")
+def geodesic_circle_polygon(lat: float, lon: float, radius_km: float, n_points: int = 128):
+    """Return polygon (lon,lat) points approximating a geodesic circle."""
+    d = radius_km / EARTH_RADIUS_KM
+    lat1 = math.radians(lat)
+    lon1 = math.radians(lon)
+    pts: List[List[float]] = []
+    for k in range(n_points):
+        b = 2 * math.pi * (k / n_points)
+        lat2 = math.asin(
+            math.sin(lat1) * math.cos(d)
+            + math.cos(lat1) * math.sin(d) * math.cos(b)
+        )
+        lon2 = lon1 + math.atan2(
+            math.sin(b) * math.sin(d) * math.cos(lat1),
+            math.cos(d) - math.sin(lat1) * math.sin(lat2),
+        )
+        pts.append([math.degrees(lon2), math.degrees(lat2)])
+    pts.append(pts[0])
+    return pts
@@ -0,0 +1,322 @@
+"""
+pydeck map for a result set: search circle, center marker and item markers.
+
+Only the columns the layers render are serialized to the browser (see
+MARKER_COLUMNS), as compact JSON. With `cluster=True`, large results are grouped per
+screen cell at the initial zoom (web-mercator pixel grid, so cells nest
+from one zoom level to the next) and drawn as count bubbles; isolated
+items stay individual markers. With a `density` view (see density.py),
+wide results are drawn as precomputed per-tile counts instead of markers.
+Layers have fixed ids, so the browser updates them in place across reruns
+instead of recreating them.
+"""
+
+import json
+import math
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pydeck as pdk
+from pydeck.bindings.json_tools import default_serialize
+
+from . import metrics
+from .density import DensityView
+from .geo import geodesic_circle_polygon
+
+# Fields sent per marker: position, photo flag (color) and tooltip text.
+MARKER_COLUMNS = ["lon", "lat", "name", "region", "distance_km", "has_photo"]
+
+# Clustering kicks in above this many markers...
+CLUSTER_MIN_POINTS = 300
+# ...grouping markers that share a cell of this many screen pixels.
+CLUSTER_CELL_PX = 40
+
+_PHOTO_RGB = np.array([34, 197, 94])
+_NO_PHOTO_RGB = np.array([160, 160, 160])
+
+
+class CompactDeck(pdk.Deck):
+    """pdk.Deck whose JSON (what st.pydeck_chart sends) has no indentation."""
+
+    def to_json(self) -> str:
+        return json.dumps(self, sort_keys=True, default=default_serialize, separators=(",", ":"))
+
+
+def zoom_for_radius(radius_km: float) -> int:
+    if radius_km <= 5:
+        return 12
+    if radius_km <= 10:
+        return 11
+    if radius_km <= 25:
+        return 10
+    if radius_km <= 50:
+        return 9
+    if radius_km <= 100:
+        return 8
+    return 7
+
+
+def marker_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """The MARKER_COLUMNS of `df`; coordinates at 6 decimals, photo flag as 0/1."""
+    return pd.DataFrame(
+        {
+            "lon": np.round(df["lon"].to_numpy(dtype=float), 6),
+            "lat": np.round(df["lat"].to_numpy(dtype=float), 6),
+            "name": df["name"].to_numpy(),
+            "region": df["region"].to_numpy(),
+            "distance_km": df["distance_km"].to_numpy(),
+            "has_photo": df["has_photo"].to_numpy(dtype=bool).astype(np.int8),
+        },
+        columns=MARKER_COLUMNS,
+    )
+
+
+def cluster_cells(
+    lat: np.ndarray, lon: np.ndarray, zoom: int, cell_px: int = CLUSTER_CELL_PX
+) -> np.ndarray:
+    """Web-mercator screen cell (cell_px square at `zoom`) of each point, as one int64 key."""
+    scale = 256.0 * 2.0**zoom / cell_px
+    x = (np.asarray(lon, dtype=float) + 180.0) / 360.0 * scale
+    sin_lat = np.clip(np.sin(np.radians(lat)), -0.9999, 0.9999)
+    y = (0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+    n_cells = int(math.ceil(scale)) + 1
+    return np.floor(y).astype(np.int64) * n_cells + np.floor(x).astype(np.int64)
+
+
+def cluster_frame(
+    markers: pd.DataFrame, zoom: int, cell_px: int = CLUSTER_CELL_PX
+) -> tuple:
+    """
+    Split `markers` (see marker_frame) into (singles, clusters).
+    - singles: markers alone in their cell, unchanged.
+    - clusters: one row per cell holding 2+ markers, at the members' mean
+      position, with `count`, a bubble `radius` (px), a photo-share RGBA
+      `color`, and the nearest member's distance/region for the tooltip.
+    """
+    keys = cluster_cells(markers["lat"].to_numpy(), markers["lon"].to_numpy(), zoom, cell_px)
+    _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+    per_item = counts[inverse]
+    singles = markers[per_item == 1].reset_index(drop=True)
+
+    grouped = per_item > 1
+    if not grouped.any():
+        return singles, pd.DataFrame(columns=MARKER_COLUMNS + ["count", "radius", "color", "label"])
+    members = markers[grouped]
+    cell = inverse[grouped]
+    cell_ids, cell = np.unique(cell, return_inverse=True)
+    count = counts[cell_ids]
+    lat = np.bincount(cell, weights=members["lat"].to_numpy()) / count
+    lon = np.bincount(cell, weights=members["lon"].to_numpy()) / count
+    photo_share = np.bincount(cell, weights=members["has_photo"].to_numpy()) / count
+
+    # Nearest member of each cell: order by (cell, distance), take run starts.
+    dist = members["distance_km"].to_numpy()
+    order = np.lexsort((dist, cell))
+    first = order[np.r_[0, np.flatnonzero(np.diff(cell[order])) + 1]]
+
+    rgba = np.full((len(count), 4), 210)
+    rgba[:, :3] = np.rint(_NO_PHOTO_RGB + np.outer(photo_share, _PHOTO_RGB - _NO_PHOTO_RGB))
+    clusters = pd.DataFrame(
+        {
+            "lon": np.round(lon, 6),
+            "lat": np.round(lat, 6),
+            "name": [f"{c} haciendas" for c in count.tolist()],
+            "region": members["region"].to_numpy()[first],
+            "distance_km": dist[first],
+            "has_photo": (photo_share >= 0.5).astype(np.int8),
+            "count": count,
+            "radius": np.round(8 + 4 * np.sqrt(count), 1),
+            "color": rgba.tolist(),
+            "label": [str(c) for c in count.tolist()],
+        }
+    )
+    return singles, clusters
+
+
+def density_frame(view: DensityView) -> pd.DataFrame:
+    """
+    One row per tile of `view`: its corners, a photo-share RGBA `color`
+    whose opacity grows with the count, and tooltip fields (count, main
+    region, distance to the tile's nearest point).
+    """
+    count = view.count
+    photo_share = view.photos / np.maximum(count, 1)
+    rgba = np.empty((len(count), 4), dtype=np.int64)
+    rgba[:, :3] = np.rint(_NO_PHOTO_RGB + np.outer(photo_share, _PHOTO_RGB - _NO_PHOTO_RGB))
+    rgba[:, 3] = np.rint(60 + 170 * np.sqrt(count / max(int(count.max(initial=0)), 1)))
+    return pd.DataFrame(
+        {
+            "polygon": view.polygons(),
+            "color": rgba.tolist(),
+            "name": [f"{c} haciendas" for c in count.tolist()],
+            "region": [view.regions[i] for i in view.region_code.tolist()],
+            "distance_km": np.round(view.min_km, 1),
+        }
+    )
+
+
+@lru_cache(maxsize=64)
+def _circle_polygon(center_lat: float, center_lon: float, radius_km: float) -> tuple:
+    """Search-radius polygon, cached as immutable (lon, lat) pairs."""
+    return tuple(
+        tuple(p) for p in geodesic_circle_polygon(center_lat, center_lon, radius_km, n_points=128)
+    )
+
+
+def circle_layer(center_lat: float, center_lon: float, radius_km: float) -> pdk.Layer:
+    """
+    The search-radius circle. Its polygon is cached, so reruns that change
+    only the filters or the map options do not recompute it; the layer
+    itself is new on every call.
+    """
+    with metrics.span("map.circle"):
+        circle_pts = [list(p) for p in _circle_polygon(center_lat, center_lon, radius_km)]
+    return pdk.Layer(
+        "PolygonLayer",
+        id="search-radius",
+        data=[{"polygon": circle_pts, "name": "Search Radius"}],
+        get_polygon="polygon",
+        get_fill_color=[59, 130, 246, 40],
+        get_line_color=[59, 130, 246, 160],
+        line_width_min_pixels=1,
+    )
+
+
+@metrics.timed("map.build_deck")
+def build_deck(
+    df: pd.DataFrame,
+    center_lat: float,
+    center_lon: float,
+    radius_km: float,
+    cluster: bool = False,
+    route: np.ndarray | None = None,
+    density: DensityView | None = None,
+) -> CompactDeck:
+    """
+    Deck for the result `df` (as returned by df_for_radius) around the center.
+    With `cluster`, results above CLUSTER_MIN_POINTS are grouped by
+    cluster_frame() at the view's zoom. With `density` (the same result as
+    DensityPyramid.view()), tiles are drawn instead of markers and `df` is
+    not read. `route` ([lon, lat] vertices, see Tour.path) is drawn as a
+    line under the markers.
+    """
+    zoom = zoom_for_radius(radius_km)
+    clusters = tiles = None
+    if density is not None:
+        with metrics.span("map.density"):
+            tiles = density_frame(density)
+        markers = marker_frame(df.iloc[:0])
+    else:
+        with metrics.span("map.markers"):
+            markers = marker_frame(df)
+        if cluster and len(markers) > CLUSTER_MIN_POINTS:
+            with metrics.span("map.cluster"):
+                markers, clusters = cluster_frame(markers, zoom)
+
+    view_state = pdk.ViewState(
+        latitude=center_lat,
+        longitude=center_lon,
+        zoom=zoom,
+    )
+
+    center_layer = pdk.Layer(
+        "ScatterplotLayer",
+        id="center",
+        data=[{"lat": center_lat, "lon": center_lon}],
+        get_position="[lon, lat]",
+        get_fill_color=[220, 38, 38, 220],
+        get_radius=350,
+        radius_min_pixels=8,
+        pickable=False,
+    )
+
+    # Greenish with local photo, greyish without.
+    markers_layer = pdk.Layer(
+        "ScatterplotLayer",
+        id="markers",
+        data=markers,
+        get_position="[lon, lat]",
+        get_fill_color="has_photo ? [34, 197, 94, 200] : [160, 160, 160, 200]",
+        get_radius=300,
+        radius_min_pixels=6,
+        radius_max_pixels=100,
+        get_line_color=[0, 0, 0, 180],
+        line_width_min_pixels=1.5,
+        pickable=True,
+    )
+
+    layers = [circle_layer(center_lat, center_lon, radius_km)]
+    if tiles is not None and len(tiles):
+        layers.append(
+            pdk.Layer(
+                "PolygonLayer",
+                id="density",
+                data=tiles,
+                get_polygon="polygon",
+                get_fill_color="color",
+                get_line_color=[255, 255, 255, 120],
+                line_width_min_pixels=0.5,
+                pickable=True,
+            )
+        )
+    if route is not None and len(route) > 1:
+        layers.append(
+            pdk.Layer(
+                "PathLayer",
+                id="route",
+                data=[{"path": np.round(route, 6).tolist()}],
+                get_path="path",
+                get_color=[37, 99, 235, 200],
+                get_width=3,
+                width_units="'pixels'",
+                pickable=False,
+            )
+        )
+    layers.append(markers_layer)
+    if clusters is not None and len(clusters):
+        layers.append(
+            pdk.Layer(
+                "ScatterplotLayer",
+                id="clusters",
+                data=clusters,
+                get_position="[lon, lat]",
+                get_fill_color="color",
+                get_radius="radius",
+                radius_units="'pixels'",
+                get_line_color=[255, 255, 255, 230],
+                line_width_min_pixels=1.5,
+                stroked=True,
+                pickable=True,
+            )
+        )
+        layers.append(
+            pdk.Layer(
+                "TextLayer",
+                id="cluster-counts",
+                data=clusters,
+                get_position="[lon, lat]",
+                get_text="label",
+                get_size=12,
+                get_color=[15, 23, 42, 255],
+                pickable=False,
+            )
+        )
+    layers.append(center_layer)
+
+    tooltip = {
+        "html": (
+            "<b>{name}</b><br>"
+            "Region: {region}<br>"
+            "Distance: {distance_km} km"
+        ),
+        "style": {"backgroundColor": "white", "color": "black"},
+    }
+
+    deck = CompactDeck(
+        layers=layers,
+        initial_view_state=view_state,
+        tooltip=tooltip,
+        map_style="light",
+    )
+    return deck
@@ -0,0 +1,214 @@
+"""
+Lightweight timing spans for the hot paths.
+
+    with metrics.span("query.radius"):
+        ...
+
+A span costs one thread-local lookup when nothing listens. Finished spans
+go to:
+- the calling thread's collector, if start_collecting() was called on it
+  or inside collecting() (the app's ?debug=1 panel, haciendas-query
+  --timings);
+- when enable() was called, process-wide histograms (render_prometheus()
+  / write_prometheus() give the Prometheus text format) and one JSON line
+  per span on the "haciendas.metrics" logger.
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+# Histogram bucket upper bounds, in seconds.
+BUCKETS_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRIC_NAME = "haciendas_span_duration_seconds"
+
+log = logging.getLogger("haciendas.metrics")
+
+_enabled = False
+_local = threading.local()
+_lock = threading.Lock()
+_histograms: Dict[str, "Histogram"] = {}
+_last_write = 0.0
+_NULL = nullcontext()
+
+
+class Histogram:
+    """Fixed-bucket histogram (BUCKETS_S plus +Inf), count and sum."""
+
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS_S) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_S, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+class _Span:
+    __slots__ = ("name", "t0", "slot")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        spans = getattr(_local, "spans", None)
+        self.slot = None
+        if spans is not None:
+            # Reserve the row at entry so spans list in start order.
+            self.slot = len(spans)
+            spans.append([self.name, 0.0, _local.depth])
+            _local.depth += 1
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        seconds = time.perf_counter() - self.t0
+        if self.slot is not None:
+            _local.depth -= 1
+            spans = getattr(_local, "spans", None)
+            if spans is not None and self.slot < len(spans):
+                spans[self.slot][1] = round(1000 * seconds, 3)
+        if _enabled:
+            _observe(self.name, seconds)
+
+
+def enable(on: bool = True) -> None:
+    """Turn the process-wide histograms and span log lines on or off."""
+    global _enabled
+    _enabled = bool(on)
+
+
+def span(name: str):
+    """Context manager timing the enclosed block as `name`."""
+    if not _enabled and getattr(_local, "spans", None) is None:
+        return _NULL
+    return _Span(name)
+
+
+def timed(name: str) -> Callable[[Callable], Callable]:
+    """Decorator: every call of the function is a `name` span."""
+
+    def wrap(fn: Callable) -> Callable:
+        @wraps(fn)
+        def inner(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return inner
+
+    return wrap
+
+
+def observe(name: str, seconds: float) -> None:
+    """Record an externally measured duration as a finished `name` span."""
+    spans = getattr(_local, "spans", None)
+    if spans is not None:
+        spans.append([name, round(1000 * seconds, 3), _local.depth])
+    if _enabled:
+        _observe(name, seconds)
+
+
+def _observe(name: str, seconds: float) -> None:
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = Histogram()
+        hist.observe(seconds)
+    if log.isEnabledFor(logging.INFO):
+        log.info(json.dumps({"span": name, "ms": round(1000 * seconds, 3)}))
+
+
+def start_collecting() -> List[List[Any]]:
+    """
+    Collect this thread's spans from now on, replacing any previous
+    collector. Returns the live list of [name, ms, depth] rows.
+    """
+    _local.spans = []
+    _local.depth = 0
+    return _local.spans
+
+
+def stop_collecting() -> None:
+    _local.spans = None
+
+
+def is_collecting() -> bool:
+    """Whether start_collecting() is in effect on this thread."""
+    return getattr(_local, "spans", None) is not None
+
+
+@contextmanager
+def collecting() -> Iterator[List[List[Any]]]:
+    """
+    Collect the spans of the enclosed block into a fresh list (yielded).
+    On exit the thread's previous collector, if any, is restored and
+    receives the block's spans too, nested under the spans open around it.
+    """
+    outer, depth = getattr(_local, "spans", None), getattr(_local, "depth", 0)
+    spans = start_collecting()
+    try:
+        yield spans
+    finally:
+        _local.spans, _local.depth = outer, depth
+        if outer is not None:
+            outer.extend([name, ms, depth + d] for name, ms, d in spans)
+
+
+def snapshot() -> Dict[str, Tuple[List[int], int, float]]:
+    """name -> (per-bucket counts, count, sum in seconds), copied under the lock."""
+    with _lock:
+        return {name: (list(h.counts), h.count, h.sum) for name, h in _histograms.items()}
+
+
+def render_prometheus() -> str:
+    """All histograms in the Prometheus text exposition format."""
+    lines = [
+        f"# HELP {METRIC_NAME} Wall time of instrumented code paths.",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    for name, (counts, count, total) in sorted(snapshot().items()):
+        label = name.replace("\\", "\\\\").replace('"', '\\"')
+        cumulative = 0
+        for bound, n in zip(BUCKETS_S + (float("inf"),), counts):
+            cumulative += n
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'{METRIC_NAME}_bucket{{span="{label}",le="{le}"}} {cumulative}')
+        lines.append(f'{METRIC_NAME}_sum{{span="{label}"}} {total!r}')
+        lines.append(f'{METRIC_NAME}_count{{span="{label}"}} {count}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str, min_interval_s: float = 0.0) -> bool:
+    """
+    Atomically (re)write render_prometheus() to `path`, e.g. for the node
+    exporter's textfile collector. Skipped (False) if the last write was
+    less than `min_interval_s` ago.
+    """
+    global _last_write
+    now = time.monotonic()
+    with _lock:
+        if _last_write and now - _last_write < min_interval_s:
+            return False
+        _last_write = now
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(render_prometheus())
+    os.replace(tmp, path)
+    return True
+
+
+def reset() -> None:
+    """Drop all histograms."""
+    with _lock:
+        _histograms.clear()
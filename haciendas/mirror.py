@@ -0,0 +1,362 @@
+"""
+Local mirror of the remote photo_url images.
+
+Items without a local photo fall back to their photo_url, which every
+browser fetches again from the remote host (slow, and unavailable at
+times). The mirror downloads those images once into a content-addressed
+store next to the app:
+
+    <dir>/<sha256[:2]>/<sha256><ext>   image bytes (identical images share a file)
+    <dir>/index.json                   photo_url -> file, HTTP validators, last check
+
+Downloads run concurrently under asyncio: a semaphore bounds the requests
+in flight, and each blocking urllib request runs on a thread pool of the
+same size. Timeouts, connection errors, 429 and 5xx are retried with
+exponential backoff. Entries checked less than `max_age_s` ago are skipped;
+older ones are revalidated with If-None-Match / If-Modified-Since, so an
+unchanged image costs a 304 and no body.
+
+    python -m haciendas.mirror [catalog_public.json] [--dir fotos_mirror] [--concurrency 8]
+
+The app reads the index through MirrorIndex and shows mirrored files
+instead of linking photo_url.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import http.client
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Tuple
+
+from . import metrics
+from .catalog import iter_catalog_items, iter_public_items
+from .photos import PhotoIndex
+
+MIRROR_DIR = "fotos_mirror"
+INDEX_FILE = "index.json"
+INDEX_FORMAT = 1
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RETRIES = 3
+DEFAULT_TIMEOUT_S = 20.0
+DEFAULT_MAX_AGE_S = 7 * 86400.0
+# First retry delay; doubles per attempt, with up to 100% jitter.
+BACKOFF_S = 0.5
+# Larger responses are rejected.
+MAX_IMAGE_BYTES = 20 << 20
+# Entries between index checkpoints during a run.
+CHECKPOINT_EVERY = 200
+
+USER_AGENT = "HaciendasNearbyPublic-mirror/1"
+_RETRY_STATUS = frozenset({408, 425, 429, 500, 502, 503, 504})
+_EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/gif": ".gif"}
+
+
+@dataclass
+class MirrorStats:
+    """Outcome of one mirror_photos() run, per URL."""
+
+    fetched: int = 0  # downloaded: new, or changed since the last check
+    not_modified: int = 0  # revalidated (304)
+    fresh: int = 0  # checked less than max_age_s ago, no request
+    failed: int = 0
+    retries: int = 0
+    bytes: int = 0
+    errors: Dict[str, str] = field(default_factory=dict)
+
+
+# --------------------------------------------------------------------
+# Store and index
+# --------------------------------------------------------------------
+
+
+def blob_path(directory: str, sha256: str, ext: str) -> str:
+    return os.path.join(directory, sha256[:2], sha256 + ext)
+
+
+def load_index(directory: str) -> Dict[str, Dict[str, Any]]:
+    """The index entries (photo_url -> entry), empty if absent or of another format."""
+    try:
+        with open(os.path.join(directory, INDEX_FILE), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("format") != INDEX_FORMAT:
+        return {}
+    return dict(data.get("entries") or {})
+
+
+def write_index(directory: str, entries: Dict[str, Dict[str, Any]]) -> None:
+    os.makedirs(directory, exist_ok=True)
+    tmp = os.path.join(directory, f"{INDEX_FILE}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"format": INDEX_FORMAT, "entries": entries}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, os.path.join(directory, INDEX_FILE))
+
+
+def _image_ext(body: bytes, content_type: str | None) -> str | None:
+    """File extension for an image body (by Content-Type, then magic bytes); None if not an image."""
+    ctype = (content_type or "").split(";")[0].strip().lower()
+    if ctype in _EXTENSIONS:
+        return _EXTENSIONS[ctype]
+    if body.startswith(b"\xff\xd8\xff"):
+        return ".jpg"
+    if body.startswith(b"\x89PNG\r\n\x1a\n"):
+        return ".png"
+    if body[:4] == b"RIFF" and body[8:12] == b"WEBP":
+        return ".webp"
+    if body[:4] == b"GIF8":
+        return ".gif"
+    return None
+
+
+def _store(directory: str, body: bytes, ext: str) -> str:
+    """Write `body` under its SHA-256 (unless already there); return the digest."""
+    sha256 = hashlib.sha256(body).hexdigest()
+    path = blob_path(directory, sha256, ext)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, path)
+    return sha256
+
+
+def prune(directory: str, entries: Dict[str, Dict[str, Any]]) -> int:
+    """Remove stored images no entry refers to; return how many."""
+    keep = {blob_path(directory, e["sha256"], e["ext"]) for e in entries.values()}
+    removed = 0
+    for sub in os.listdir(directory) if os.path.isdir(directory) else []:
+        sub_dir = os.path.join(directory, sub)
+        if len(sub) != 2 or not os.path.isdir(sub_dir):
+            continue
+        for name in os.listdir(sub_dir):
+            path = os.path.join(sub_dir, name)
+            if path not in keep:
+                os.remove(path)
+                removed += 1
+    return removed
+
+
+# --------------------------------------------------------------------
+# Fetching
+# --------------------------------------------------------------------
+
+
+def _request(
+    url: str, entry: Dict[str, Any] | None, timeout_s: float
+) -> Tuple[int, bytes, Dict[str, str]]:
+    """One GET (conditional if `entry` has validators): status, body, headers."""
+    headers = {"User-Agent": USER_AGENT}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    req = urllib.request.Request(url, headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout_s) as resp:
+            return resp.status, resp.read(MAX_IMAGE_BYTES + 1), dict(resp.headers)
+    except urllib.error.HTTPError as e:
+        # urllib raises for every non-2xx status, 304 included.
+        return e.code, b"", dict(e.headers or {})
+
+
+async def mirror_photos(
+    urls: Iterable[str],
+    directory: str = MIRROR_DIR,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    retries: int = DEFAULT_RETRIES,
+    timeout_s: float = DEFAULT_TIMEOUT_S,
+    max_age_s: float = DEFAULT_MAX_AGE_S,
+) -> MirrorStats:
+    """
+    Mirror every URL in `urls` into `directory` and update its index.
+    A URL that fails keeps its previous entry (the old copy stays served).
+    """
+    entries = load_index(directory)
+    stats = MirrorStats()
+    gate = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    done = 0
+
+    async def one(url: str, pool: ThreadPoolExecutor) -> None:
+        nonlocal done
+        entry = entries.get(url)
+        if entry and not os.path.exists(blob_path(directory, entry["sha256"], entry["ext"])):
+            entry = None
+        if entry and time.time() - entry.get("checked_at", 0) < max_age_s:
+            stats.fresh += 1
+            return
+
+        error = ""
+        for attempt in range(retries + 1):
+            if attempt:
+                stats.retries += 1
+                await asyncio.sleep(BACKOFF_S * 2 ** (attempt - 1) * (1 + random.random()))
+            async with gate:
+                try:
+                    status, body, headers = await loop.run_in_executor(
+                        pool, _request, url, entry, timeout_s
+                    )
+                except (OSError, http.client.HTTPException) as e:
+                    error = f"{type(e).__name__}: {e}"
+                    continue
+            if status not in _RETRY_STATUS:
+                break
+            error = f"HTTP {status}"
+        else:
+            stats.failed += 1
+            stats.errors[url] = error
+            return
+
+        now = time.time()
+        if status == 304 and entry:
+            entry["checked_at"] = now
+            stats.not_modified += 1
+        elif status == 200:
+            ext = _image_ext(body, headers.get("Content-Type"))
+            if ext is None or len(body) > MAX_IMAGE_BYTES:
+                stats.failed += 1
+                stats.errors[url] = "not an image" if ext is None else "too large"
+                return
+            sha256 = await loop.run_in_executor(pool, _store, directory, body, ext)
+            entries[url] = {
+                "sha256": sha256,
+                "ext": ext,
+                "bytes": len(body),
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "checked_at": now,
+            }
+            stats.fetched += 1
+            stats.bytes += len(body)
+        else:
+            stats.failed += 1
+            stats.errors[url] = f"HTTP {status}"
+            return
+
+        done += 1
+        if done % CHECKPOINT_EVERY == 0:
+            # Long runs keep what they fetched if interrupted.
+            write_index(directory, dict(entries))
+
+    os.makedirs(directory, exist_ok=True)
+    with metrics.span("mirror.run"), ThreadPoolExecutor(
+        max_workers=concurrency, thread_name_prefix="mirror"
+    ) as pool:
+        try:
+            await asyncio.gather(*(one(url, pool) for url in dict.fromkeys(urls)))
+        finally:
+            write_index(directory, entries)
+    return stats
+
+
+# --------------------------------------------------------------------
+# Reading (app side)
+# --------------------------------------------------------------------
+
+
+class MirrorIndex:
+    """
+    photo_url -> mirrored file, read from <directory>/index.json and
+    reloaded by refresh() when that file changes.
+    """
+
+    def __init__(self, directory: str = MIRROR_DIR):
+        self.directory = directory
+        self._paths: Dict[str, str] = {}
+        self._mtime_ns: int | None = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        try:
+            mtime_ns = os.stat(os.path.join(self.directory, INDEX_FILE)).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        if mtime_ns == self._mtime_ns:
+            return
+        with self._lock:
+            if mtime_ns != self._mtime_ns:
+                entries = load_index(self.directory) if mtime_ns is not None else {}
+                self._paths = {
+                    url: blob_path(self.directory, e["sha256"], e["ext"]) for url, e in entries.items()
+                }
+                self._mtime_ns = mtime_ns
+
+    def path_for(self, url: str | None) -> str | None:
+        """The mirrored file for `url`, if there is one on disk."""
+        path = self._paths.get(url or "")
+        return path if path and os.path.exists(path) else None
+
+    def __len__(self) -> int:
+        return len(self._paths)
+
+
+def catalog_photo_urls(json_path: str, photos: PhotoIndex, missing_only: bool = False) -> List[str]:
+    """The cleaned photo_url of every public item (only those without a local photo if `missing_only`)."""
+    photos.refresh()
+    return [
+        it["photo_url"]
+        for it in iter_public_items(iter_catalog_items(json_path), photos)
+        if it["photo_url"] and not (missing_only and it["has_photo"])
+    ]
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Mirror the catalog's remote photo_url images locally.")
+    ap.add_argument("catalog", nargs="?", default="catalog_public.json")
+    ap.add_argument("--dir", default=MIRROR_DIR, help="mirror directory")
+    ap.add_argument("--photos", default="fotos_public", help="local photo directory")
+    ap.add_argument("--missing-only", action="store_true", help="only items without a local photo")
+    ap.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    ap.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    ap.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT_S, help="seconds per request")
+    ap.add_argument(
+        "--max-age-days",
+        type=float,
+        default=DEFAULT_MAX_AGE_S / 86400,
+        help="revalidate entries checked longer ago than this (0: all)",
+    )
+    ap.add_argument("--prune", action="store_true", help="drop entries and files the catalog no longer uses")
+    args = ap.parse_args(argv)
+
+    urls = catalog_photo_urls(args.catalog, PhotoIndex(args.photos), args.missing_only)
+    t0 = time.perf_counter()
+    stats = asyncio.run(
+        mirror_photos(
+            urls,
+            args.dir,
+            concurrency=args.concurrency,
+            retries=args.retries,
+            timeout_s=args.timeout,
+            max_age_s=args.max_age_days * 86400,
+        )
+    )
+    elapsed = time.perf_counter() - t0
+    print(
+        f"{len(set(urls))} urls in {elapsed:.1f} s: {stats.fetched} fetched "
+        f"({stats.bytes / 1e6:.1f} MB), {stats.not_modified} not modified, {stats.fresh} fresh, "
+        f"{stats.failed} failed, {stats.retries} retries"
+    )
+    for url, error in list(stats.errors.items())[:10]:
+        print(f"  {error}: {url}")
+    if args.prune:
+        wanted = set(urls)
+        entries = {u: e for u, e in load_index(args.dir).items() if u in wanted}
+        write_index(args.dir, entries)
+        print(f"pruned {prune(args.dir, entries)} files")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+from typing import FrozenSet, Iterable
+
+import numpy as np
+
+from . import metrics
+
+# --------------------------------------------------------------------
+# Local photo presence index
+# --------------------------------------------------------------------
+
+DEFAULT_TTL_S = 300.0
+
+
+class PhotoIndex:
+    """
+    In-memory set of the files in one photo directory.
+    - The directory is listed with a single scandir() per refresh.
+    - A refresh happens when the directory mtime changes, or when the
+      last listing is older than `ttl_s` (mtime alone is unreliable on
+      some network mounts and does not change when a file is rewritten).
+    - `version` increases on every listing whose content changed, so
+      callers can cache anything derived from the set.
+    Paths outside the directory fall back to os.path.exists().
+    """
+
+    def __init__(self, directory: str, ttl_s: float = DEFAULT_TTL_S):
+        self.directory = os.path.normpath(directory)
+        self.ttl_s = ttl_s
+        self.version = 0
+        self._files: FrozenSet[str] = frozenset()
+        self._mtime_ns: int | None = None
+        self._scanned_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def refresh(self) -> int:
+        """Re-list the directory if it changed or the TTL expired; return `version`."""
+        try:
+            mtime_ns = os.stat(self.directory).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        expired = time.monotonic() - self._scanned_at >= self.ttl_s
+        if mtime_ns == self._mtime_ns and not expired:
+            return self.version
+        with self._lock:
+            expired = time.monotonic() - self._scanned_at >= self.ttl_s
+            if mtime_ns != self._mtime_ns or expired:
+                with metrics.span("photos.scan"):
+                    files = frozenset(_list_files(self.directory)) if mtime_ns is not None else frozenset()
+                if files != self._files:
+                    self._files = files
+                    self.version += 1
+                self._mtime_ns = mtime_ns
+                self._scanned_at = time.monotonic()
+        return self.version
+
+    def contains(self, path: str | None) -> bool:
+        """Whether `path` (as stored in local_photo_path) is an existing file."""
+        p = str(path or "").strip()
+        if not p:
+            return False
+        p = os.path.normpath(p)
+        if os.path.dirname(p) != self.directory:
+            return os.path.exists(p)
+        return p in self._files
+
+    def flags(self, paths: Iterable[str | None]) -> np.ndarray:
+        """Boolean presence array for a sequence of local_photo_path values."""
+        return np.fromiter((self.contains(p) for p in paths), dtype=bool)
+
+
+def _list_files(directory: str) -> Iterable[str]:
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file():
+                yield os.path.join(directory, entry.name)
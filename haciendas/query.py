@@ -0,0 +1,118 @@
+"""
+haciendas-query: run a radius (or k-nearest) query against the catalog
+and write the result to stdout as CSV, GeoJSON, GPX or KML. With --tour
+the rows come in visiting order from the center (see haciendas.tour), and
+GPX output is a route.
+
+    python -m haciendas.query --lat 19.050501 --lon -98.135887 \
+        [--radius 25 | --nearest 20] \
+        [--name casa] [--region Atlixco] [--with-photo | --without-photo] \
+        [--format csv|geojson|gpx|kml] [--catalog catalog_public.json | --shards DIR] \
+        [--tour [--round-trip] [--tour-budget 1.0]] [--timings]
+"""
+
+import argparse
+import sys
+from typing import List
+
+from . import metrics
+from .engine import df_for_nearest, df_for_radius, load_public_catalog, photo_flags
+from .export import EXPORTERS, build_export, build_route_gpx
+from .photos import PhotoIndex
+from .search import NAME_MODES
+from .shards import df_for_nearest_sharded, df_for_radius_sharded, load_shards
+from .tour import DEFAULT_TIME_BUDGET_S, MAX_STOPS, plan_tour
+
+DEFAULT_LAT = 19.050501
+DEFAULT_LON = -98.135887
+DEFAULT_RADIUS_KM = 25
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(prog="haciendas-query", description="Radius query over the public catalog.")
+    ap.add_argument("--lat", type=float, default=DEFAULT_LAT)
+    ap.add_argument("--lon", type=float, default=DEFAULT_LON)
+    where = ap.add_mutually_exclusive_group()
+    where.add_argument("--radius", type=float, default=DEFAULT_RADIUS_KM, help="km")
+    where.add_argument(
+        "--nearest", type=int, default=0, metavar="K", help="the K nearest matches, at any distance"
+    )
+    ap.add_argument("--name", default="", help="name query (case- and accent-insensitive)")
+    ap.add_argument("--name-mode", choices=NAME_MODES, default="contains")
+    ap.add_argument("--region", default="", help="exact region name")
+    photo = ap.add_mutually_exclusive_group()
+    photo.add_argument("--with-photo", action="store_true")
+    photo.add_argument("--without-photo", action="store_true")
+    ap.add_argument("--format", choices=sorted(EXPORTERS), default="csv")
+    ap.add_argument("--catalog", default="catalog_public.json")
+    ap.add_argument("--photos", default="fotos_public", help="local photo directory")
+    ap.add_argument(
+        "--shards", default="", metavar="DIR", help="query per-region shards (see haciendas.shards)"
+    )
+    ap.add_argument("--tour", action="store_true", help="order the result as a route from the center")
+    ap.add_argument("--round-trip", action="store_true", help="with --tour: end back at the center")
+    ap.add_argument(
+        "--tour-budget", type=float, default=DEFAULT_TIME_BUDGET_S, metavar="S", help="seconds"
+    )
+    ap.add_argument("--timings", action="store_true", help="print timing spans to stderr")
+    args = ap.parse_args(argv)
+    spans = metrics.start_collecting() if args.timings else None
+
+    photos = PhotoIndex(args.photos)
+    if args.shards:
+        catalog = load_shards(args.shards)
+        if catalog is None:
+            print(f"haciendas-query: no shard manifest in {args.shards}", file=sys.stderr)
+            return 1
+    else:
+        catalog = load_public_catalog(args.catalog, photos)
+    if not len(catalog):
+        print(f"haciendas-query: no items in {args.shards or args.catalog}", file=sys.stderr)
+        return 1
+    photos.refresh()
+    filters = dict(
+        only_with_photo=args.with_photo,
+        only_without_photo=args.without_photo,
+        name_query=args.name,
+        region_filter=args.region,
+        name_mode=args.name_mode,
+    )
+    if args.shards:
+        if args.nearest > 0:
+            df = df_for_nearest_sharded(catalog, photos, args.lat, args.lon, args.nearest, **filters)
+        else:
+            df = df_for_radius_sharded(catalog, photos, args.lat, args.lon, args.radius, **filters)
+    else:
+        flags = photo_flags(catalog, photos)
+        if args.nearest > 0:
+            df = df_for_nearest(catalog, flags, args.lat, args.lon, args.nearest, **filters)
+        else:
+            df = df_for_radius(catalog, flags, args.lat, args.lon, args.radius, **filters)
+    if args.tour:
+        if len(df) > MAX_STOPS:
+            print(f"haciendas-query: --tour takes at most {MAX_STOPS} stops, got {len(df)}", file=sys.stderr)
+            return 1
+        tour = plan_tour(
+            df["lat"].to_numpy(dtype=float),
+            df["lon"].to_numpy(dtype=float),
+            args.lat,
+            args.lon,
+            round_trip=args.round_trip,
+            time_budget_s=args.tour_budget,
+        )
+        df = df.iloc[tour.order]
+        print(f"haciendas-query: route of {len(df)} stops, {tour.total_km:.1f} km", file=sys.stderr)
+    if args.tour and args.format == "gpx":
+        payload = build_route_gpx(df, args.lat, args.lon, round_trip=args.round_trip)
+    else:
+        payload = build_export(args.format, df)
+    sys.stdout.buffer.write(payload)
+    sys.stdout.buffer.flush()
+    if spans is not None:
+        for name, ms, depth in spans:
+            print(f"{'  ' * depth}{name:<{32 - 2 * depth}} {ms:10.3f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
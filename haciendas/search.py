@@ -0,0 +1,230 @@
+"""
+Accent- and case-insensitive name search.
+
+Names are folded once ("Tehuacán" -> "tehuacan", "Ñ" -> "n"), and every
+trigram of the folded names is indexed in CSR form: sorted trigram codes,
+offsets, and for each code the ascending item indices containing it. A
+lookup intersects the posting lists of the query's trigrams (rarest
+first) and verifies only the surviving candidates, so cost follows the
+number of matches rather than the catalog size. Queries shorter than a
+trigram fall back to a scan of the rows being filtered.
+
+Bigrams are indexed the same way for fuzzy matching: an edit destroys at
+most n of the query's n-grams, so a name within k edits shares at least
+(distinct n-grams - n*k) of them. For short queries that bound is zero
+with trigrams but still positive with bigrams.
+
+Match modes:
+- "contains": folded substring.
+- "prefix":   a word of the name (at the start or after a space) starts
+              with the query.
+- "fuzzy":    the query occurs in the name with at most 1 edit (queries of
+              4-7 characters) or 2 edits (8+); shorter queries use "contains".
+"""
+
+import unicodedata
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+NAME_MODES = ("contains", "prefix", "fuzzy")
+
+_BITS = 21  # Unicode code points fit in 21 bits; 3 of them fit in an int64.
+
+
+def fold(text: str) -> str:
+    """Lower-case `text` and strip accents/diacritics."""
+    text = str(text)
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def _codes(folded: np.ndarray, n: int = 3) -> np.ndarray:
+    """(rows, width-n+1) int64 n-gram codes of a fixed-width str array; 0 where padded."""
+    width = folded.dtype.itemsize // 4
+    if width < n or not len(folded):
+        return np.zeros((len(folded), 0), dtype=np.int64)
+    cp = folded.view(np.uint32).reshape(len(folded), width).astype(np.int64)
+    codes = np.zeros((len(folded), width - n + 1), dtype=np.int64)
+    padded = np.zeros(codes.shape, dtype=bool)
+    for j in range(n):
+        part = cp[:, j : width - n + 1 + j]
+        codes |= part << ((n - 1 - j) * _BITS)
+        padded |= part == 0
+    codes[padded] = 0
+    return codes
+
+
+def _query_codes(q: str, n: int = 3) -> List[int]:
+    cps = [ord(c) for c in q]
+    grams = zip(*(cps[j:] for j in range(n)))
+    return sorted({sum(c << ((n - 1 - j) * _BITS) for j, c in enumerate(g)) for g in grams})
+
+
+def _postings(codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """CSR (keys, offsets, postings) of the nonzero entries of a (rows, grams) code array."""
+    flat = codes.ravel()
+    valid = flat != 0
+    # Row-major ravel keeps items ascending, and a stable sort by code
+    # preserves that order inside each posting list.
+    items = np.repeat(np.arange(codes.shape[0], dtype=np.int64), codes.shape[1])[valid]
+    flat = flat[valid]
+    order = np.argsort(flat, kind="stable")
+    flat, items = flat[order], items[order]
+    # Drop repeats of an n-gram within one name.
+    first = np.ones(len(flat), dtype=bool)
+    first[1:] = (flat[1:] != flat[:-1]) | (items[1:] != items[:-1])
+    flat, items = flat[first], items[first]
+    keys, starts = np.unique(flat, return_index=True)
+    offsets = np.append(starts, len(flat)).astype(np.int64)
+    return keys, offsets, items
+
+
+def _intersect_sorted(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Intersection of two ascending, duplicate-free arrays; O(min * log max)."""
+    if len(a) > len(b):
+        a, b = b, a
+    if not len(a):
+        return a
+    pos = np.searchsorted(b, a)
+    pos[pos == len(b)] = 0
+    return a[b[pos] == a]
+
+
+def edit_distance_within(query: str, text: str, k: int) -> bool:
+    """
+    Whether `query` matches some substring of `text` with at most `k`
+    edits. Myers' bit-parallel algorithm: one pass over `text`, a handful
+    of integer operations per character.
+    """
+    m = len(query)
+    if m <= k:
+        return True
+    full = (1 << m) - 1
+    last = 1 << (m - 1)
+    peq: Dict[str, int] = {}
+    for i, ch in enumerate(query):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+    pv, mv, score = full, 0, m
+    for ch in text:
+        eq = peq.get(ch, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        # Shifting in 0 (not 1) lets a match start anywhere in `text`.
+        ph = (ph << 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+        if score <= k:
+            return True
+    return False
+
+
+@dataclass(frozen=True)
+class NameIndex:
+    """Folded names plus trigram and bigram -> items posting indexes (see module docstring)."""
+
+    folded: np.ndarray
+    keys: np.ndarray
+    offsets: np.ndarray
+    postings: np.ndarray
+    bigram_keys: np.ndarray
+    bigram_offsets: np.ndarray
+    bigram_postings: np.ndarray
+
+    @classmethod
+    def build(cls, names: Iterable[str | None]) -> "NameIndex":
+        folded = np.array([fold(s or "") for s in names], dtype=np.str_)
+        keys, offsets, postings = _postings(_codes(folded, 3))
+        bigram_keys, bigram_offsets, bigram_postings = _postings(_codes(folded, 2))
+        return cls(
+            folded=folded,
+            keys=keys,
+            offsets=offsets,
+            postings=postings,
+            bigram_keys=bigram_keys,
+            bigram_offsets=bigram_offsets,
+            bigram_postings=bigram_postings,
+        )
+
+    def __len__(self) -> int:
+        return int(self.folded.shape[0])
+
+    def _posting(self, code: int, n: int = 3) -> np.ndarray:
+        if n == 2:
+            keys, offsets, postings = self.bigram_keys, self.bigram_offsets, self.bigram_postings
+        else:
+            keys, offsets, postings = self.keys, self.offsets, self.postings
+        i = int(np.searchsorted(keys, code))
+        if i == len(keys) or keys[i] != code:
+            return postings[:0]
+        return postings[offsets[i] : offsets[i + 1]]
+
+    def _all_of(self, q: str) -> np.ndarray | None:
+        """Items containing every trigram of `q`; None if `q` has no trigrams."""
+        codes = _query_codes(q)
+        if not codes:
+            return None
+        lists = sorted((self._posting(c) for c in codes), key=len)
+        out = lists[0]
+        for lst in lists[1:]:
+            if not len(out):
+                break
+            out = _intersect_sorted(out, lst)
+        return out
+
+    def _within(self, q: str, k: int) -> np.ndarray | None:
+        """
+        Items that can match `q` with at most `k` edits: those sharing enough
+        of its trigrams, or of its bigrams where the trigram bound is zero.
+        None (scan all) only when neither bound is positive, e.g. "aaaa".
+        """
+        for n in (3, 2):
+            codes = _query_codes(q, n)
+            min_hits = len(codes) - n * k
+            if min_hits > 0:
+                break
+        else:
+            return None
+        hits = np.bincount(
+            np.concatenate([self._posting(c, n) for c in codes]), minlength=len(self)
+        )
+        return np.flatnonzero(hits >= min_hits)
+
+    def filter(self, idx: np.ndarray, query: str, mode: str = "contains") -> np.ndarray:
+        """The entries of `idx` (item indices, ascending) whose name matches `query`."""
+        q = fold(query).strip()
+        if not q:
+            return idx
+        if mode == "fuzzy" and len(q) >= 4:
+            k = 1 if len(q) < 8 else 2
+            cand = self._within(q, k)
+            rows = idx if cand is None else _intersect_sorted(idx, cand)
+            names = self.folded[rows]
+            keep = np.char.find(names, q) >= 0
+            for i in np.flatnonzero(~keep).tolist():
+                keep[i] = edit_distance_within(q, str(names[i]), k)
+            return rows[keep]
+
+        cand = self._all_of(q)
+        rows = idx if cand is None else _intersect_sorted(idx, cand)
+        if not len(rows):
+            return rows
+        names = self.folded[rows]
+        if mode == "prefix":
+            keep = np.char.startswith(names, q) | (np.char.find(names, " " + q) >= 0)
+            return rows[keep]
+        return rows[np.char.find(names, q) >= 0]
+
+    def lookup(self, query: str, mode: str = "contains") -> np.ndarray:
+        """All matching item indices, ascending."""
+        return self.filter(np.arange(len(self)), query, mode)
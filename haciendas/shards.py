@@ -0,0 +1,377 @@
+"""
+Region-partitioned catalog: one compiled file per region plus a manifest.
+
+    <catalog>.shards/
+        manifest.json      source SHA-256, and per shard: region, file,
+                           item count, photo count, bounding box, size
+        region-000.hcat    compiled catalog (see compiled.py) of one region
+        ...
+
+Shards are opened on demand: a radius query only touches shards whose
+bounding box comes within the radius of the center, a region filter
+exactly one shard, and a k-nearest query visits shards nearest box first
+until no unvisited box can hold a closer item. Open shards are kept in
+an LRU capped by their total file size (see ShardedCatalog).
+
+    python -m haciendas.shards [catalog_public.json] [-o catalog_public.shards]
+"""
+
+import argparse
+import json
+import math
+import os
+import threading
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import metrics
+from .cache import QueryCache
+from .catalog import iter_catalog_items, iter_public_items
+from .columns import CatalogColumns
+from .compiled import load_compiled, write_compiled
+from .engine import (
+    EMPTY_CATALOG,
+    PublicCatalog,
+    _result_frame,
+    df_for_nearest,
+    df_for_radius,
+    file_sha256,
+    photo_flags,
+)
+from .geo import EARTH_RADIUS_KM, haversine_km
+from .photos import PhotoIndex
+from .search import NameIndex
+from .spatial import GridIndex
+
+MANIFEST = "manifest.json"
+MANIFEST_FORMAT = 3
+
+# Default cap on the total file size of open shards.
+DEFAULT_MAX_BYTES = 256 << 20
+
+
+def shards_path_for(json_path: str) -> str:
+    """Where the shards of `json_path` live (same name, .shards directory)."""
+    return os.path.splitext(json_path)[0] + ".shards"
+
+
+@dataclass(frozen=True)
+class ShardInfo:
+    """One manifest entry; bbox is (lat_min, lat_max, lon_min, lon_max) in degrees."""
+
+    region: str
+    file: str
+    count: int
+    with_photo: int
+    bbox: Tuple[float, float, float, float]
+    bytes: int
+
+
+def bbox_distance_km(lat: float, lon: float, bbox: Tuple[float, float, float, float]) -> float:
+    """
+    Great-circle distance from the point to the nearest point of the
+    lat/lon box (0 inside it). Exact while the box is within 90 degrees of
+    longitude of the point; beyond that 0, which is still a lower bound.
+    """
+    lat_min, lat_max, lon_min, lon_max = bbox
+    if lon_min <= lon <= lon_max:
+        return math.radians(max(lat_min - lat, lat - lat_max, 0.0)) * EARTH_RADIUS_KM
+    # Outside the box's longitudes the nearest point lies on the nearer
+    # edge meridian, where distance has a single minimum at phi.
+    dlon = min(((lon - edge + 180.0) % 360.0 - 180.0 for edge in (lon_min, lon_max)), key=abs)
+    if abs(dlon) >= 90.0:
+        return 0.0
+    phi = math.degrees(math.atan(math.tan(math.radians(lat)) / math.cos(math.radians(dlon))))
+    return haversine_km(lat, lon, min(max(phi, lat_min), lat_max), lon - dlon)
+
+
+# --------------------------------------------------------------------
+# Writing
+# --------------------------------------------------------------------
+
+
+def build_shards(json_path: str, out_dir: str, photos: PhotoIndex) -> List[ShardInfo]:
+    """
+    Normalize `json_path`, write one compiled file per region to `out_dir`,
+    then the manifest (atomically, last, so readers never see a manifest
+    naming files that are not written yet). Returns the manifest entries.
+    """
+    source_sha256 = file_sha256(json_path)
+    photos.refresh()
+    columns = CatalogColumns.from_item_stream(
+        iter_public_items(iter_catalog_items(json_path), photos)
+    )
+    os.makedirs(out_dir, exist_ok=True)
+
+    shards: List[ShardInfo] = []
+    order = np.argsort(columns.region_code, kind="stable")
+    bounds = np.searchsorted(columns.region_code[order], np.arange(len(columns.regions) + 1))
+    for code, region in enumerate(columns.regions):
+        part = columns.take(order[bounds[code] : bounds[code + 1]])
+        file = f"region-{code:03d}.hcat"
+        path = os.path.join(out_dir, file)
+        write_compiled(path, part, GridIndex.build(part), NameIndex.build(part.name), source_sha256)
+        shards.append(
+            ShardInfo(
+                region=region,
+                file=file,
+                count=len(part),
+                with_photo=int(part.has_photo.sum()),
+                bbox=(
+                    float(part.lat.min()),
+                    float(part.lat.max()),
+                    float(part.lon.min()),
+                    float(part.lon.max()),
+                ),
+                bytes=os.path.getsize(path),
+            )
+        )
+
+    manifest = {
+        "format": MANIFEST_FORMAT,
+        "source_sha256": source_sha256,
+        "n": len(columns),
+        "shards": [asdict(s) for s in shards],
+    }
+    tmp = os.path.join(out_dir, f"{MANIFEST}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, os.path.join(out_dir, MANIFEST))
+
+    # Files of regions that no longer exist.
+    keep = {s.file for s in shards}
+    for name in os.listdir(out_dir):
+        if name.startswith("region-") and name.endswith(".hcat") and name not in keep:
+            os.remove(os.path.join(out_dir, name))
+    return shards
+
+
+# --------------------------------------------------------------------
+# Loading and queries
+# --------------------------------------------------------------------
+
+
+class _OpenShard:
+    """A mapped shard plus its photo flags for the last photo index version."""
+
+    def __init__(self, catalog: PublicCatalog, bytes: int):
+        self.catalog = catalog
+        self.bytes = bytes
+        self._flags: Tuple[int, np.ndarray] | None = None
+        self._lock = threading.Lock()
+
+    def flags(self, photos: PhotoIndex) -> np.ndarray:
+        version = photos.refresh()
+        with self._lock:
+            if self._flags is None or self._flags[0] != version:
+                self._flags = (version, photo_flags(self.catalog, photos))
+            return self._flags[1]
+
+
+class ShardedCatalog:
+    """
+    Catalog read shard by shard from a manifest (see build_shards).
+    Exposes the same `digest`, `regions` and len() as PublicCatalog;
+    query it with df_for_radius_sharded() / df_for_nearest_sharded().
+    Open shards live in a QueryCache whose byte limit (`max_bytes`) is
+    the sum of their file sizes, least recently used evicted first.
+    """
+
+    def __init__(
+        self, directory: str, manifest: Dict[str, Any], max_bytes: int = DEFAULT_MAX_BYTES
+    ):
+        self.directory = directory
+        self.digest: str = manifest["source_sha256"]
+        self.shards: Tuple[ShardInfo, ...] = tuple(
+            ShardInfo(**{**s, "bbox": tuple(s["bbox"])}) for s in manifest["shards"]
+        )
+        self._by_region = {s.region: s for s in self.shards}
+        self._n = int(manifest["n"])
+        self._open = QueryCache(
+            max_entries=max(len(self.shards), 1),
+            max_bytes=max_bytes,
+            ttl_s=float("inf"),
+            sizeof=lambda shard: shard.bytes,
+        )
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def regions(self) -> Tuple[str, ...]:
+        return tuple(sorted(self._by_region))
+
+    def shard_for_region(self, region: str) -> ShardInfo | None:
+        return self._by_region.get(region)
+
+    def open(self, info: ShardInfo) -> _OpenShard:
+        """The opened shard, mapping its file on first use."""
+        return self._open.get_or_compute(info.file, lambda: self._load(info))
+
+    def _load(self, info: ShardInfo) -> _OpenShard:
+        with metrics.span("shards.open"):
+            compiled = load_compiled(
+                os.path.join(self.directory, info.file), source_sha256=self.digest
+            )
+        if compiled is None:
+            # Rebuilt underneath us; empty until the catalog is reloaded.
+            return _OpenShard(EMPTY_CATALOG, info.bytes)
+        columns, grid, names = compiled
+        return _OpenShard(
+            PublicCatalog(columns=columns, grid=grid, names=names, digest=self.digest), info.bytes
+        )
+
+    def stats(self) -> Dict[str, int]:
+        """Shard counts and open-shard cache counters."""
+        return {"shards": len(self.shards), **self._open.stats()}
+
+
+def load_shards(
+    directory: str, source_sha256: str | None = None, max_bytes: int = DEFAULT_MAX_BYTES
+) -> ShardedCatalog | None:
+    """
+    Read the manifest in `directory`. Returns None when there is none, it
+    is of another format, or (if `source_sha256` is given) it was built
+    from a different JSON. No shard is opened yet.
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or manifest.get("format") != MANIFEST_FORMAT:
+        return None
+    if source_sha256 is not None and manifest.get("source_sha256") != source_sha256:
+        return None
+    return ShardedCatalog(directory, manifest, max_bytes=max_bytes)
+
+
+def _empty_frame() -> pd.DataFrame:
+    return _result_frame(
+        EMPTY_CATALOG, np.zeros(0, dtype=bool), np.empty(0, dtype=np.int64), np.empty(0)
+    )
+
+
+def _merge(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """Per-shard results as one frame, in df_for_radius() order."""
+    frames = [df for df in frames if len(df)]
+    if not frames:
+        return _empty_frame()
+    if len(frames) == 1:
+        return frames[0]
+    # Same keys as _result_frame(); the id makes the order independent of
+    # the order the shards were visited in.
+    return pd.concat(frames, ignore_index=True).sort_values(
+        ["distance_km", "name", "id"], kind="mergesort", ignore_index=True
+    )
+
+
+def _candidate_shards(catalog: ShardedCatalog, region_filter: str) -> List[ShardInfo]:
+    if region_filter:
+        info = catalog.shard_for_region(str(region_filter))
+        return [info] if info is not None else []
+    return list(catalog.shards)
+
+
+def df_for_radius_sharded(
+    catalog: ShardedCatalog,
+    photos: PhotoIndex,
+    center_lat: float,
+    center_lon: float,
+    radius_km: float,
+    only_with_photo: bool,
+    only_without_photo: bool,
+    name_query: str,
+    region_filter: str,
+    name_mode: str = "contains",
+) -> pd.DataFrame:
+    """
+    df_for_radius() over the shards whose bounding box comes within
+    `radius_km` of the center (only the region's shard with a region filter).
+    """
+    with metrics.span("query.radius_sharded"):
+        frames = []
+        for info in _candidate_shards(catalog, region_filter):
+            if bbox_distance_km(center_lat, center_lon, info.bbox) > radius_km:
+                continue
+            shard = catalog.open(info)
+            frames.append(
+                df_for_radius(
+                    shard.catalog,
+                    shard.flags(photos),
+                    center_lat,
+                    center_lon,
+                    radius_km,
+                    only_with_photo,
+                    only_without_photo,
+                    name_query,
+                    region_filter,
+                    name_mode,
+                )
+            )
+        return _merge(frames)
+
+
+def df_for_nearest_sharded(
+    catalog: ShardedCatalog,
+    photos: PhotoIndex,
+    center_lat: float,
+    center_lon: float,
+    k: int,
+    only_with_photo: bool,
+    only_without_photo: bool,
+    name_query: str,
+    region_filter: str,
+    name_mode: str = "contains",
+) -> pd.DataFrame:
+    """
+    df_for_nearest() across shards: the `k` best of each shard visited in
+    order of bounding-box distance, stopping once the current k-th result
+    is closer than the next box.
+    """
+    k = int(k)
+    with metrics.span("query.nearest_sharded"):
+        ranked = sorted(
+            (bbox_distance_km(center_lat, center_lon, info.bbox), i, info)
+            for i, info in enumerate(_candidate_shards(catalog, region_filter))
+        )
+        df = _empty_frame()
+        for box_km, _, info in ranked:
+            # Distances are compared as rounded for output (3 decimals).
+            if k <= 0 or (len(df) >= k and df["distance_km"].iloc[k - 1] + 0.0005 < box_km):
+                break
+            shard = catalog.open(info)
+            part = df_for_nearest(
+                shard.catalog,
+                shard.flags(photos),
+                center_lat,
+                center_lon,
+                k,
+                only_with_photo,
+                only_without_photo,
+                name_query,
+                region_filter,
+                name_mode,
+            )
+            df = _merge([df, part]).iloc[:k].reset_index(drop=True)
+        return df
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Split catalog_public.json into per-region shards.")
+    ap.add_argument("catalog", nargs="?", default="catalog_public.json")
+    ap.add_argument("-o", "--output", default=None, help="default: <catalog>.shards next to the JSON")
+    ap.add_argument("--photos", default="fotos_public", help="local photo directory")
+    args = ap.parse_args(argv)
+
+    out = args.output or shards_path_for(args.catalog)
+    shards = build_shards(args.catalog, out, PhotoIndex(args.photos))
+    total = sum(s.bytes for s in shards)
+    print(f"{out}: {len(shards)} shards, {sum(s.count for s in shards)} items, {total / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import math
+from dataclasses import dataclass
+from typing import Callable, Tuple
+
+import numpy as np
+
+from .columns import CatalogColumns
+from .geo import EARTH_RADIUS_KM
+
+# --------------------------------------------------------------------
+# Lat/lon grid bucket index
+# --------------------------------------------------------------------
+
+DEFAULT_CELL_DEG = 0.1
+
+# Above this share of the catalog, a plain scan beats gathering candidates.
+FULL_SCAN_FRACTION = 0.25
+
+# Widening of the search bounding box, in radians (~6 mm); keeps points
+# sitting exactly on the circle inside the candidate set despite rounding.
+_BBOX_EPS = 1e-9
+
+
+@dataclass(frozen=True)
+class GridIndex:
+    """
+    Items bucketed into fixed lat/lon cells, built once per catalog:
+    - `order` holds item indices sorted by cell key (row * n_cols + col).
+    - `keys` is the sorted cell key of each entry in `order`, so every
+      run of cells along one grid row is a single searchsorted slice.
+    Radius queries visit only the cells intersecting the circle's
+    bounding box and apply the exact haversine to those candidates;
+    k-nearest queries do the same over a widening circle.
+    """
+
+    columns: CatalogColumns
+    cell_deg: float
+    lat0: float
+    lon0: float
+    n_rows: int
+    n_cols: int
+    order: np.ndarray
+    keys: np.ndarray
+
+    @classmethod
+    def build(cls, columns: CatalogColumns, cell_deg: float = DEFAULT_CELL_DEG) -> "GridIndex":
+        n = len(columns)
+        if n:
+            lat0 = float(columns.lat.min())
+            lon0 = float(columns.lon.min())
+            n_rows = int((columns.lat.max() - lat0) // cell_deg) + 1
+            n_cols = int((columns.lon.max() - lon0) // cell_deg) + 1
+        else:
+            lat0 = lon0 = 0.0
+            n_rows = n_cols = 0
+        rows = ((columns.lat - lat0) // cell_deg).astype(np.int64)
+        cols = ((columns.lon - lon0) // cell_deg).astype(np.int64)
+        cell = rows * n_cols + cols
+        order = np.argsort(cell, kind="stable")
+        return cls(
+            columns=columns,
+            cell_deg=cell_deg,
+            lat0=lat0,
+            lon0=lon0,
+            n_rows=n_rows,
+            n_cols=n_cols,
+            order=order,
+            keys=cell[order],
+        )
+
+    def candidates(
+        self, center_lat: float, center_lon: float, radius_km: float
+    ) -> np.ndarray | None:
+        """
+        Sorted indices of items in cells overlapping the circle's bounding box.
+        Returns None (scan everything) when the box wraps a pole or the
+        antimeridian, or when it covers too much of the catalog to pay off.
+        """
+        bbox = bounding_box(center_lat, center_lon, radius_km)
+        n = len(self.columns)
+        if bbox is None:
+            return None
+        if not n:
+            return np.empty(0, dtype=np.int64)
+        starts, ends = self._box_runs(*bbox)
+        if int((ends - starts).sum()) > FULL_SCAN_FRACTION * n:
+            return None
+        return self._gather(starts, ends)
+
+    def in_box(self, lat_min: float, lat_max: float, lon_min: float, lon_max: float) -> np.ndarray:
+        """Sorted indices of items in cells overlapping a lat/lon box (degrees)."""
+        return self._gather(*self._box_runs(lat_min, lat_max, lon_min, lon_max))
+
+    def _box_runs(
+        self, lat_min: float, lat_max: float, lon_min: float, lon_max: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Start/end positions in `order` of the box's cells, one run per grid row."""
+        r0 = max(int((lat_min - self.lat0) // self.cell_deg), 0)
+        r1 = min(int((lat_max - self.lat0) // self.cell_deg), self.n_rows - 1)
+        c0 = max(int((lon_min - self.lon0) // self.cell_deg), 0)
+        c1 = min(int((lon_max - self.lon0) // self.cell_deg), self.n_cols - 1)
+        if r0 > r1 or c0 > c1:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        row_keys = np.arange(r0, r1 + 1, dtype=np.int64) * self.n_cols
+        starts = np.searchsorted(self.keys, row_keys + c0, side="left")
+        ends = np.searchsorted(self.keys, row_keys + c1, side="right")
+        return starts, ends
+
+    def _gather(self, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+        parts = [self.order[s:e] for s, e in zip(starts, ends) if e > s]
+        if not parts:
+            return np.empty(0, dtype=np.int64)
+        # Ascending item order keeps downstream tie-breaking identical to a scan.
+        return np.sort(np.concatenate(parts))
+
+    def within(
+        self, center_lat: float, center_lon: float, radius_km: float
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Indices (ascending) and distances of items within `radius_km`."""
+        idx = self.candidates(center_lat, center_lon, radius_km)
+        dkm = self.columns.distances_km(center_lat, center_lon, idx)
+        if idx is None:
+            idx = np.flatnonzero(dkm <= radius_km)
+            return idx, dkm[idx]
+        keep = dkm <= radius_km
+        return idx[keep], dkm[keep]
+
+    def nearest(
+        self,
+        center_lat: float,
+        center_lon: float,
+        k: int,
+        accept: Callable[[np.ndarray], np.ndarray] | None = None,
+        ties_km: float = 0.0,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Indices and distances of the `k` items nearest to the center, nearest
+        first (ties by index). `accept` narrows an ascending index array to
+        the items that may be returned (filters). With `ties_km` > 0, every
+        item up to that far beyond the k-th distance is returned as well
+        (so possibly more than k), for callers that break near-ties their
+        own way.
+        The search circle starts well inside one cell and grows until it
+        holds `k` accepted items. Everything inside the circle is exact, so
+        only that neighborhood is ever measured; it ends in a full scan
+        when the circle's box stops paying off (see candidates()).
+        """
+        n = len(self.columns)
+        if k <= 0 or not n:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+        # A small first circle touches as few cells as possible (usually one).
+        radius_km = math.radians(self.cell_deg) * EARTH_RADIUS_KM / 8
+        while True:
+            idx = self.candidates(center_lat, center_lon, radius_km)
+            if idx is None:
+                idx = np.arange(n)
+                if accept is not None:
+                    idx = accept(idx)
+                dkm = self.columns.distances_km(center_lat, center_lon, idx)
+                break
+            dkm = self.columns.distances_km(center_lat, center_lon, idx)
+            inside = dkm <= radius_km
+            idx, dkm = idx[inside], dkm[inside]
+            if accept is not None:
+                kept = accept(idx)
+                dkm = dkm[np.searchsorted(idx, kept)]
+                idx = kept
+            if len(idx) >= k:
+                kth = np.partition(dkm, k - 1)[k - 1]
+                if kth + ties_km <= radius_km:
+                    break
+                # One more pass, out to the near-ties.
+                radius_km = kth + ties_km
+                continue
+            # Aim for k at the density seen so far (area ~ r^2), at least doubling.
+            radius_km *= min(max(2.0, 1.5 * math.sqrt(k / max(len(idx), 1))), 16.0)
+
+        if len(idx) > k:
+            # Partial selection: everything up to the k-th distance (ties
+            # included), then order only those.
+            kth = np.partition(dkm, k - 1)[k - 1]
+            sel = np.flatnonzero(dkm <= kth + ties_km)
+        else:
+            sel = np.arange(len(idx))
+        sel = sel[np.argsort(dkm[sel], kind="stable")]
+        if ties_km <= 0:
+            sel = sel[:k]
+        return idx[sel], dkm[sel]
+
+
+def bounding_box(
+    center_lat: float, center_lon: float, radius_km: float
+) -> Tuple[float, float, float, float] | None:
+    """
+    Lat/lon box (degrees) enclosing the geodesic circle, or None when the
+    circle reaches a pole or crosses the antimeridian.
+    """
+    d = max(radius_km, 0.0) / EARTH_RADIUS_KM + _BBOX_EPS
+    lat1 = math.radians(center_lat)
+    lat_min, lat_max = lat1 - d, lat1 + d
+    if lat_min <= -math.pi / 2 or lat_max >= math.pi / 2 or d >= math.pi / 2:
+        return None
+    dlon = math.asin(min(math.sin(d) / math.cos(lat1), 1.0)) + _BBOX_EPS
+    lon1 = math.radians(center_lon)
+    lon_min, lon_max = lon1 - dlon, lon1 + dlon
+    if lon_min < -math.pi or lon_max > math.pi:
+        return None
+    return (
+        math.degrees(lat_min),
+        math.degrees(lat_max),
+        math.degrees(lon_min),
+        math.degrees(lon_max),
+    )
+
+
+def morton_code(row: np.ndarray, col: np.ndarray) -> np.ndarray:
+    """
+    Z-order (Morton) code of 16-bit cell coordinates: row and col bits
+    interleaved, row above col. The four children (2 * row + {0, 1},
+    2 * col + {0, 1}) of a cell have codes 4 * code + {0, 1, 2, 3}.
+    """
+    return (_spread_bits(np.asarray(row, dtype=np.int64)) << 1) | _spread_bits(
+        np.asarray(col, dtype=np.int64)
+    )
+
+
+def _spread_bits(v: np.ndarray) -> np.ndarray:
+    """Moves bit i of 16-bit values to bit 2i."""
+    for shift, mask in ((8, 0x00FF00FF), (4, 0x0F0F0F0F), (2, 0x33333333), (1, 0x55555555)):
+        v = (v | (v << shift)) & mask
+    return v
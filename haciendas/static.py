@@ -0,0 +1,156 @@
+"""
+Static file server for photos and thumbnails, with HTTP caching.
+
+st.image(path) sends the image bytes through Streamlit's media endpoint on
+every render, without validators or Cache-Control, so a browser downloads
+the same photo again on each quick-view change. Served from stable URLs
+instead, photos are kept by the browser:
+
+    /thumbs/<sha[:2]>/<sha>_<width>.<ext>   .thumbs/        content-addressed: immutable
+    /mirror/<sha[:2]>/<sha><ext>            fotos_mirror/   content-addressed: immutable
+    /photos/<file>                          fotos_public/   may be replaced: max-age 1 day
+
+Every response carries an ETag (size and mtime) and Last-Modified, and
+conditional requests are answered with 304.
+
+    python -m haciendas.static [--host 127.0.0.1] [--port 8502]
+
+The app links photos there when HACIENDAS_PHOTO_BASE_URL is set (e.g.
+http://localhost:8502/). Any server or CDN mapping the same paths works too.
+"""
+
+import argparse
+import email.utils
+import mimetypes
+import os
+import shutil
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Mapping
+from urllib.parse import quote, unquote, urlsplit
+
+from .mirror import MIRROR_DIR
+from .thumbs import THUMB_DIR
+
+# URL prefix -> directory.
+MOUNTS: Dict[str, str] = {"thumbs": THUMB_DIR, "mirror": MIRROR_DIR, "photos": "fotos_public"}
+# Mounts whose file names are content hashes: a URL never changes content.
+IMMUTABLE_MOUNTS = frozenset({"thumbs", "mirror"})
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=86400"
+DEFAULT_PORT = 8502
+
+mimetypes.add_type("image/webp", ".webp")
+
+
+def static_url(base_url: str, path: str, mounts: Mapping[str, str] = MOUNTS) -> str | None:
+    """URL of the local file `path` under `base_url`, or None if no mount holds it."""
+    real = os.path.abspath(path)
+    for prefix, directory in mounts.items():
+        root = os.path.abspath(directory)
+        if real != root and os.path.commonpath([real, root]) == root:
+            rel = os.path.relpath(real, root).replace(os.sep, "/")
+            return f"{base_url.rstrip('/')}/{prefix}/{quote(rel)}"
+    return None
+
+
+def etag_for(st: os.stat_result) -> str:
+    return f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def not_modified(headers: Mapping[str, str], etag: str, mtime: float) -> bool:
+    """Whether a request with `headers` may be answered with 304 (RFC 9110 13.2.2)."""
+    if_none_match = headers.get("If-None-Match")
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = headers.get("If-Modified-Since")
+    if if_modified_since:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+    return False
+
+
+class StaticHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "HaciendasStatic/1"
+    mounts: Mapping[str, str] = MOUNTS
+
+    def do_GET(self) -> None:
+        self._serve(body=True)
+
+    def do_HEAD(self) -> None:
+        self._serve(body=False)
+
+    def _resolve(self) -> tuple[str, str] | None:
+        """(mount prefix, file path) for the request, or None."""
+        prefix, _, rel = unquote(urlsplit(self.path).path).lstrip("/").partition("/")
+        if prefix not in self.mounts or not rel:
+            return None
+        root = os.path.realpath(self.mounts[prefix])
+        path = os.path.realpath(os.path.join(root, rel))
+        if os.path.commonpath([path, root]) != root or not os.path.isfile(path):
+            return None
+        return prefix, path
+
+    def _serve(self, body: bool) -> None:
+        found = self._resolve()
+        if found is None:
+            self.send_error(404)
+            return
+        prefix, path = found
+        st = os.stat(path)
+        etag = etag_for(st)
+        cache_control = IMMUTABLE_CACHE_CONTROL if prefix in IMMUTABLE_MOUNTS else DEFAULT_CACHE_CONTROL
+        if not_modified(self.headers, etag, st.st_mtime):
+            self.send_response(304)
+            self._send_validators(etag, st, cache_control)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", mimetypes.guess_type(path)[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(st.st_size))
+        self._send_validators(etag, st, cache_control)
+        self.end_headers()
+        if body:
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, self.wfile)
+
+    def _send_validators(self, etag: str, st: os.stat_result, cache_control: str) -> None:
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", email.utils.formatdate(st.st_mtime, usegmt=True))
+        self.send_header("Cache-Control", cache_control)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def make_server(
+    host: str = "127.0.0.1", port: int = DEFAULT_PORT, mounts: Mapping[str, str] = MOUNTS
+) -> ThreadingHTTPServer:
+    handler = type("Handler", (StaticHandler,), {"mounts": dict(mounts)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Serve photos and thumbnails with HTTP caching.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = ap.parse_args()
+
+    server = make_server(args.host, args.port)
+    print(f"serving {', '.join(f'/{p}/ <- {d}' for p, d in MOUNTS.items())} on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Resized photo variants for display, cached by content.
+
+Thumbnails live in THUMB_DIR/<sha[:2]>/<sha>_<width>.<ext>, where <sha> is
+the SHA-256 of the source image, so a replaced photo never reuses a stale
+thumbnail and identical photos share one. They are produced lazily by
+thumbnail_path() or ahead of time with:
+
+    python -m haciendas.thumbs [--dir fotos_public] [--widths 180 360 720] [--webp]
+"""
+
+import argparse
+import hashlib
+import io
+import os
+import threading
+from typing import Dict, Iterable, Tuple
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # pragma: no cover - Pillow ships with streamlit
+    Image = None
+
+THUMB_DIR = ".thumbs"
+THUMB_WIDTHS = (180, 360, 720)
+JPEG_QUALITY = 80
+WEBP_QUALITY = 75
+
+_digests: Dict[Tuple[str, int, int], str] = {}
+_digests_lock = threading.Lock()
+
+
+def webp_supported() -> bool:
+    return Image is not None and features.check("webp")
+
+
+def source_digest(path: str) -> str:
+    """SHA-256 of `path`, memoized on (path, mtime, size)."""
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    digest = _digests.get(key)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = h.hexdigest()
+        with _digests_lock:
+            _digests[key] = digest
+    return digest
+
+
+def thumbnail_path(
+    path: str, width: int, webp: bool = False, cache_dir: str = THUMB_DIR
+) -> str:
+    """
+    Path of the `width`-px variant of the image at `path`, creating it if
+    needed. Images are never upscaled. Returns `path` itself when Pillow
+    is unavailable or the image cannot be decoded.
+    """
+    if Image is None:
+        return path
+    webp = webp and webp_supported()
+    try:
+        digest = source_digest(path)
+    except OSError:
+        return path
+    ext = "webp" if webp else "jpg"
+    out = os.path.join(cache_dir, digest[:2], f"{digest}_{int(width)}.{ext}")
+    if os.path.exists(out):
+        return out
+    try:
+        data = render_thumbnail(path, width, webp)
+    except (OSError, ValueError):
+        return path
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    tmp = f"{out}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, out)
+    return out
+
+
+def render_thumbnail(path: str, width: int, webp: bool = False) -> bytes:
+    """Encoded bytes of `path` scaled down to at most `width` px wide."""
+    with Image.open(path) as im:
+        im = ImageOps.exif_transpose(im)
+        if im.mode not in ("RGB", "L"):
+            im = im.convert("RGB")
+        if im.width > width:
+            height = max(1, round(im.height * width / im.width))
+            im = im.resize((int(width), height), Image.LANCZOS)
+        buf = io.BytesIO()
+        if webp:
+            im.save(buf, "WEBP", quality=WEBP_QUALITY, method=4)
+        else:
+            im.save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buf.getvalue()
+
+
+def build_all(
+    directory: str, widths: Iterable[int], webp: bool, cache_dir: str = THUMB_DIR
+) -> Tuple[int, int, int]:
+    """Thumbnail every image in `directory`; return (files, source bytes, thumb bytes)."""
+    n_files = src_bytes = out_bytes = 0
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            continue
+        n_files += 1
+        src_bytes += os.path.getsize(path)
+        for w in widths:
+            out_bytes += os.path.getsize(thumbnail_path(path, w, webp, cache_dir))
+    return n_files, src_bytes, out_bytes
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Pre-build photo thumbnails.")
+    ap.add_argument("--dir", default="fotos_public")
+    ap.add_argument("--cache-dir", default=THUMB_DIR)
+    ap.add_argument("--widths", type=int, nargs="+", default=list(THUMB_WIDTHS))
+    ap.add_argument("--webp", action="store_true", help="also build WebP variants")
+    args = ap.parse_args()
+
+    formats = [False, True] if args.webp else [False]
+    for webp in formats:
+        n, src, out = build_all(args.dir, args.widths, webp, args.cache_dir)
+        kind = "webp" if webp else "jpeg"
+        print(f"{kind}: {n} photos, {src / 1e6:.1f} MB source, {out / 1e6:.1f} MB thumbnails")
+
+
+if __name__ == "__main__":
+    main()
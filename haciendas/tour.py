@@ -0,0 +1,221 @@
+"""
+Visiting order for a result set: a route from the search center through
+every stop, open-ended or back to the center.
+
+- Nearest-neighbor construction on a dense haversine distance matrix.
+- Then 2-opt (reverse a stretch of the route) and Or-opt (move a run of
+  1-3 stops elsewhere, possibly reversed) passes, each move vectorized
+  over all positions, until neither improves the route or the time
+  budget runs out (the best route so far is returned).
+The center is a fixed first node. The last node is fixed too: a copy of
+the center for round trips, otherwise a virtual stop 0 km from everything,
+which leaves the route free to end anywhere.
+"""
+
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from . import metrics
+from .geo import EARTH_RADIUS_KM, haversine_km_rad
+
+# Above this many stops the distance matrix (float32, n^2) gets too large.
+MAX_STOPS = 5000
+DEFAULT_TIME_BUDGET_S = 1.0
+# Run lengths tried by Or-opt.
+OR_OPT_RUNS = (1, 2, 3)
+
+# Moves must gain more than this (float32 matrix rounding), in km.
+_EPS_KM = 1e-3
+# Distance matrix rows computed per step.
+_ROWS = 512
+
+
+@dataclass(frozen=True)
+class Tour:
+    """
+    A planned route: `order` lists stop positions (rows of the input) in
+    visiting order, `legs_km` the great-circle length of each leg from the
+    start (including the way back for round trips). `converged` is False
+    when the time budget ended the improvement passes.
+    """
+
+    order: np.ndarray
+    legs_km: np.ndarray
+    start_lat: float
+    start_lon: float
+    round_trip: bool
+    converged: bool
+
+    @property
+    def total_km(self) -> float:
+        return float(self.legs_km.sum())
+
+    def path(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """[lon, lat] vertices of the route (start, stops, start again if round trip)."""
+        lons = [[self.start_lon], np.asarray(lon, dtype=float)[self.order]]
+        lats = [[self.start_lat], np.asarray(lat, dtype=float)[self.order]]
+        if self.round_trip:
+            lons.append([self.start_lon])
+            lats.append([self.start_lat])
+        return np.column_stack([np.concatenate(lons), np.concatenate(lats)])
+
+
+def distance_matrix_km(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """
+    Pairwise great-circle distances (float32) between the points, from the
+    chord between their unit vectors: one arcsin per pair instead of the
+    haversine's trig, within a meter of it.
+    """
+    lat_rad = np.radians(np.asarray(lat, dtype=float))
+    lon_rad = np.radians(np.asarray(lon, dtype=float))
+    cos_lat = np.cos(lat_rad)
+    xyz = np.column_stack(
+        [cos_lat * np.cos(lon_rad), cos_lat * np.sin(lon_rad), np.sin(lat_rad)]
+    ).astype(np.float32)
+    n = len(xyz)
+    out = np.empty((n, n), dtype=np.float32)
+    for r in range(0, n, _ROWS):
+        block = out[r : r + _ROWS]
+        block[:] = 0.0
+        for k in range(3):
+            d = xyz[r : r + _ROWS, None, k] - xyz[None, :, k]
+            d *= d
+            block += d
+        np.sqrt(block, out=block)
+        block *= 0.5
+        np.minimum(block, 1.0, out=block)
+        np.arcsin(block, out=block)
+        block *= 2 * EARTH_RADIUS_KM
+    return out
+
+
+def _nearest_neighbor(D: np.ndarray) -> np.ndarray:
+    """Route 0 -> ... -> m-1 visiting the inner nodes, always to the nearest unvisited."""
+    m = D.shape[0]
+    path = np.empty(m, dtype=np.int64)
+    path[0], path[-1] = 0, m - 1
+    penalty = np.zeros(m, dtype=np.float32)
+    penalty[[0, m - 1]] = np.inf
+    cur = 0
+    for step in range(1, m - 1):
+        cur = int(np.argmin(D[cur] + penalty))
+        path[step] = cur
+        penalty[cur] = np.inf
+    return path
+
+
+def _two_opt_pass(D: np.ndarray, path: np.ndarray, deadline: float) -> bool:
+    """One sweep of best-improvement 2-opt per first edge; True if the route changed."""
+    m = len(path)
+    edges = D[path[:-1], path[1:]]
+    improved = False
+    for i in range(m - 3):
+        if time.perf_counter() > deadline:
+            break
+        a, b = path[i], path[i + 1]
+        # Replace edges (a, b) and (c, d) with (a, c) and (b, d), for every later edge.
+        c, d = path[i + 2 : m - 1], path[i + 3 :]
+        delta = D[a, c] + D[b, d] - edges[i] - edges[i + 2 :]
+        j = int(np.argmin(delta))
+        if delta[j] < -_EPS_KM:
+            j += i + 2
+            path[i + 1 : j + 1] = path[i + 1 : j + 1][::-1].copy()
+            edges[i : j + 1] = D[path[i : j + 1], path[i + 1 : j + 2]]
+            improved = True
+    return improved
+
+
+def _or_opt_pass(D: np.ndarray, path: np.ndarray, deadline: float) -> bool:
+    """One sweep moving runs of OR_OPT_RUNS stops to their best other edge; True if changed."""
+    improved = False
+    u, v = path[:-1], path[1:]
+    edges = D[u, v]
+    for run in OR_OPT_RUNS:
+        s = 1
+        while s + run < len(path):
+            if time.perf_counter() > deadline:
+                return improved
+            first, last = path[s], path[s + run - 1]
+            prev, nxt = path[s - 1], path[s + run]
+            removed = edges[s - 1] + edges[s + run - 1] - D[prev, nxt]
+            forward = D[first, u] + D[last, v] - edges
+            backward = D[last, u] + D[first, v] - edges
+            cost = np.minimum(forward, backward)
+            cost[s - 1 : s + run] = np.inf  # edges touching the run itself
+            k = int(np.argmin(cost))
+            if cost[k] - removed < -_EPS_KM:
+                seg = path[s : s + run]
+                if backward[k] < forward[k]:
+                    seg = seg[::-1]
+                if k < s:
+                    parts = (path[: k + 1], seg, path[k + 1 : s], path[s + run :])
+                else:
+                    parts = (path[:s], path[s + run : k + 1], seg, path[k + 1 :])
+                path[:] = np.concatenate(parts)
+                edges = D[u, v]
+                improved = True
+            s += 1
+    return improved
+
+
+@metrics.timed("tour.plan")
+def plan_tour(
+    lat: np.ndarray,
+    lon: np.ndarray,
+    start_lat: float,
+    start_lon: float,
+    round_trip: bool = False,
+    time_budget_s: float = DEFAULT_TIME_BUDGET_S,
+) -> Tour:
+    """
+    Visiting order for the stops at (lat, lon) starting from the center.
+    Raises ValueError above MAX_STOPS stops.
+    """
+    n = len(lat)
+    if n > MAX_STOPS:
+        raise ValueError(f"tour of {n} stops (at most {MAX_STOPS})")
+    deadline = time.perf_counter() + time_budget_s
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+
+    with metrics.span("tour.matrix"):
+        # Nodes: 0 = center, 1..n = stops, n + 1 = end.
+        D = np.zeros((n + 2, n + 2), dtype=np.float32)
+        D[: n + 1, : n + 1] = distance_matrix_km(np.r_[start_lat, lat], np.r_[start_lon, lon])
+        if round_trip:
+            D[n + 1, : n + 1] = D[0, : n + 1]
+            D[: n + 1, n + 1] = D[: n + 1, 0]
+    with metrics.span("tour.construct"):
+        path = _nearest_neighbor(D)
+    converged = n < 2
+    with metrics.span("tour.improve"):
+        # 2-opt sweeps are cheap and do most of the work; Or-opt sweeps
+        # (one per fixed point of 2-opt) cost about ten times more.
+        while not converged and time.perf_counter() < deadline:
+            while _two_opt_pass(D, path, deadline):
+                pass
+            converged = not _or_opt_pass(D, path, deadline) and time.perf_counter() < deadline
+
+    order = path[1:-1] - 1
+    stops_lat = np.r_[start_lat, lat[order], [start_lat] if round_trip else []]
+    stops_lon = np.r_[start_lon, lon[order], [start_lon] if round_trip else []]
+    lat_rad, lon_rad = np.radians(stops_lat), np.radians(stops_lon)
+    legs_km = haversine_km_rad(
+        lat_rad[:-1], lon_rad[:-1], np.cos(lat_rad[:-1]), lat_rad[1:], lon_rad[1:], np.cos(lat_rad[1:])
+    )
+    return Tour(
+        order=order,
+        legs_km=legs_km,
+        start_lat=float(start_lat),
+        start_lon=float(start_lon),
+        round_trip=bool(round_trip),
+        converged=bool(converged),
+    )
+
+
+def route_length_km(D: np.ndarray, path: np.ndarray) -> float:
+    """Length of `path` (node indices) under the matrix `D`."""
+    return float(D[path[:-1], path[1:]].astype(np.float64).sum()) if len(path) > 1 else 0.0
+
@@ -0,0 +1,72 @@
+"""read_centers(): every bad input is a ValueError naming the center or feature."""
+
+import json
+
+import pytest
+
+from haciendas.batch import read_centers
+
+
+def point(fid, lat=19.05, lon=-98.13, **props):
+    return {
+        "type": "Feature",
+        "id": fid,
+        "geometry": {"type": "Point", "coordinates": [lon, lat]},
+        "properties": props,
+    }
+
+
+def write_geojson(tmp_path, features) -> str:
+    path = tmp_path / "centers.geojson"
+    path.write_text(json.dumps({"type": "FeatureCollection", "features": features}))
+    return str(path)
+
+
+def test_geojson_centers(tmp_path):
+    path = write_geojson(tmp_path, [point("a"), point("b", radius_km=5)])
+    centers = read_centers(path, default_radius_km=10)
+    assert centers.id.tolist() == ["a", "b"]
+    assert centers.radius_km.tolist() == [10.0, 5.0]
+
+
+@pytest.mark.parametrize(
+    "bad, message",
+    [
+        (None, "feature 2: not an object"),
+        ("Hacienda", "feature 2: not an object"),
+        ([1, 2], "feature 2: not an object"),
+        ({"geometry": "Point"}, "feature 2: not a Point"),
+        ({"geometry": {"type": "LineString", "coordinates": [[0, 0], [1, 1]]}}, "not a Point"),
+        ({"geometry": {"type": "Point"}}, "feature 2: Point needs"),
+        ({"geometry": {"type": "Point", "coordinates": [1]}}, "feature 2: Point needs"),
+        (
+            {"geometry": {"type": "Point", "coordinates": [1, 2]}, "properties": "x"},
+            "feature 2: properties",
+        ),
+    ],
+)
+def test_bad_geojson_feature(tmp_path, bad, message):
+    path = write_geojson(tmp_path, [point("a"), bad])
+    with pytest.raises(ValueError, match=message):
+        read_centers(path)
+
+
+def test_duplicate_geojson_ids(tmp_path):
+    path = write_geojson(tmp_path, [point("a"), point("b"), point("a", lat=20.0)])
+    with pytest.raises(ValueError, match="center a: duplicate id"):
+        read_centers(path)
+
+
+def test_duplicate_csv_ids(tmp_path):
+    # A row without an id is numbered by position, which can repeat an explicit id.
+    path = tmp_path / "centers.csv"
+    path.write_text("id,lat,lon\n2,19.0,-98.0\n,19.1,-98.1\n")
+    with pytest.raises(ValueError, match="center 2: duplicate id"):
+        read_centers(str(path))
+
+
+def test_bad_csv_coordinates(tmp_path):
+    path = tmp_path / "centers.csv"
+    path.write_text("id,lat,lon\na,19.0,-98.0\nb,91,-98.0\n")
+    with pytest.raises(ValueError, match="center b: bad lat/lon/radius_km"):
+        read_centers(str(path))
@@ -0,0 +1,126 @@
+"""iter_catalog_items() (streaming parse) against json.load on the same file."""
+
+import json
+import os
+
+import pytest
+
+from haciendas.catalog import iter_catalog_items, load_catalog
+from haciendas.engine import load_public_catalog
+from haciendas.photos import PhotoIndex
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Window sizes from one character up to more than the whole file.
+CHUNKS = [1, 2, 3, 7, 16, 64, 1 << 20]
+
+
+def write(tmp_path, text: str) -> str:
+    path = str(tmp_path / "catalog.json")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+def expected_items(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["items"]
+
+
+CASES = {
+    "value spanning windows": json.dumps(
+        {
+            "items": [
+                {"id": str(i), "name": "x" * (i * 7), "lat": 19.05 + i, "lon": -98.1}
+                for i in range(40)
+            ]
+        }
+    ),
+    "number at a window edge": (
+        '{"items": [{"lat": 19.050501, "lon": -98.135887}, {"n": 123456789}]}'
+    ),
+    "multibyte utf-8": json.dumps(
+        {"items": [{"name": "Tehuacán ñandú 🏛️ " * 3}, {"name": "ÁÉÍÓÚ"}]},
+        ensure_ascii=False,
+    ),
+    "escaped quotes and brackets": json.dumps(
+        {"items": [{"name": 'a "quoted" ] } [ { , : \\ name'}, {"name": "á\\\"]}"}]}
+    ),
+    "empty items": '{"items": []}',
+    "items not first": json.dumps(
+        {
+            "meta": {"note": "]}, \"items\": [", "n": [1, 2, {"x": None}]},
+            "items": [{"a": 1}],
+            "tail": 0,
+        }
+    ),
+    "whitespace everywhere": '\n {\n "items" :\t[ {"a" : 1} ,\r\n {"b":2} ] \n}\n ',
+}
+
+
+@pytest.mark.parametrize("chunk", CHUNKS)
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_matches_json_load(tmp_path, case, chunk):
+    path = write(tmp_path, CASES[case])
+    assert list(iter_catalog_items(path, chunk_chars=chunk)) == expected_items(path)
+
+
+@pytest.mark.parametrize("chunk", [7, 1 << 20])
+def test_public_catalog(chunk):
+    path = os.path.join(ROOT, "catalog_public.json")
+    assert list(iter_catalog_items(path, chunk_chars=chunk)) == expected_items(path)
+
+
+@pytest.mark.parametrize(
+    "text",
+    ['{"meta": 1}', '{"items": {"a": 1}}', '{"items": null}', "{}"],
+)
+def test_no_items_list_yields_nothing(tmp_path, text):
+    path = write(tmp_path, text)
+    assert list(iter_catalog_items(path, chunk_chars=3)) == load_catalog(path)["items"] == []
+
+
+def test_missing_file_yields_nothing(tmp_path):
+    assert list(iter_catalog_items(str(tmp_path / "absent.json"))) == []
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '[{"a": 1}]',  # top level not an object
+        "",
+        '{"items": [{"a": 1}, {"b"',
+        '{"items": [{"a": 1}',
+        '{"items": [{"a": 1}]',
+        '{"items": [{"a": "unterminated',
+        '{"items": [{"a": 1}]} trailing',
+    ],
+)
+@pytest.mark.parametrize("chunk", [3, 1 << 20])
+def test_malformed_raises_value_error(tmp_path, text, chunk):
+    path = write(tmp_path, text)
+    with pytest.raises(ValueError):
+        list(iter_catalog_items(path, chunk_chars=chunk))
+    # ... which load_public_catalog turns into an empty catalog, like load_catalog().
+    assert len(load_public_catalog(path, PhotoIndex(str(tmp_path / "fotos")))) == 0
+
+
+def test_value_over_cap_raises(tmp_path):
+    path = write(tmp_path, json.dumps({"items": [{"a": 1}, {"name": "x" * 5000}, {"b": 2}]}))
+    items = iter_catalog_items(path, chunk_chars=64, max_value_chars=1024)
+    assert next(items) == {"a": 1}
+    with pytest.raises(ValueError, match="longer than 1024"):
+        next(items)
+
+
+def test_malformed_value_stops_at_cap(tmp_path):
+    # An unterminated string must not pull the rest of the file into the window.
+    path = write(tmp_path, '{"items": [{"name": "oops}, ' + " " * 200_000 + "]}")
+    with pytest.raises(ValueError, match="longer than 4096"):
+        list(iter_catalog_items(path, chunk_chars=256, max_value_chars=4096))
+
+
+def test_value_under_cap_but_over_chunk(tmp_path):
+    path = write(tmp_path, json.dumps({"items": [{"name": "x" * 5000}]}))
+    items = iter_catalog_items(path, chunk_chars=64, max_value_chars=8192)
+    assert list(items) == expected_items(path)
@@ -0,0 +1,68 @@
+"""A damaged .hcat must make load_compiled() return None, never raise."""
+
+import os
+import shutil
+
+import pytest
+
+from haciendas.compiled import (
+    MAGIC,
+    compile_catalog,
+    compiled_path_for,
+    load_compiled,
+    map_arrays,
+    write_arrays,
+)
+from haciendas.engine import file_sha256, load_public_catalog
+from haciendas.photos import PhotoIndex
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture()
+def compiled_catalog(tmp_path):
+    """(json path, hcat path) of the public catalog compiled into tmp_path."""
+    json_path = str(tmp_path / "catalog.json")
+    shutil.copy(os.path.join(ROOT, "catalog_public.json"), json_path)
+    hcat = compiled_path_for(json_path)
+    compile_catalog(json_path, hcat, PhotoIndex(str(tmp_path / "fotos")))
+    return json_path, hcat
+
+
+def test_intact_file_loads(compiled_catalog):
+    json_path, hcat = compiled_catalog
+    loaded = load_compiled(hcat, source_sha256=file_sha256(json_path))
+    assert loaded is not None
+    assert len(loaded[0]) > 0
+
+
+def test_truncated_file_is_ignored(compiled_catalog):
+    json_path, hcat = compiled_catalog
+    size = os.path.getsize(hcat)
+    with open(hcat, "r+b") as f:
+        f.truncate(size // 2)
+    assert load_compiled(hcat, source_sha256=file_sha256(json_path)) is None
+
+    photos = PhotoIndex(os.path.join(os.path.dirname(json_path), "fotos"))
+    catalog = load_public_catalog(json_path, photos)
+    original = load_public_catalog(os.path.join(ROOT, "catalog_public.json"), photos)
+    assert len(catalog) == len(original)
+
+
+@pytest.mark.parametrize("key", ["regions", "grid"])
+def test_missing_header_entry_is_ignored(compiled_catalog, key):
+    json_path, hcat = compiled_catalog
+    header, array = map_arrays(hcat, MAGIC)
+    arrays = {name: array(name).copy() for name in header["arrays"]}
+    del header[key], header["arrays"]
+    write_arrays(hcat, MAGIC, header, arrays)
+    assert load_compiled(hcat, source_sha256=file_sha256(json_path)) is None
+
+
+def test_missing_array_is_ignored(compiled_catalog):
+    json_path, hcat = compiled_catalog
+    header, array = map_arrays(hcat, MAGIC)
+    arrays = {name: array(name).copy() for name in header["arrays"] if name != "grid.keys"}
+    del header["arrays"]
+    write_arrays(hcat, MAGIC, header, arrays)
+    assert load_compiled(hcat, source_sha256=file_sha256(json_path)) is None
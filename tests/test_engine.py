@@ -0,0 +1,226 @@
+"""
+df_for_radius() / df_for_nearest() against the per-item scan they replaced.
+
+baseline_df_for_radius() is the original app's df_for_radius: haversine
+for every item, then the filters, then a sort by (rounded distance, name).
+Two intended changes are applied to it: names match accent-insensitively
+(fold()), and ties on distance and name are ordered by id, where the
+original sort left them unspecified.
+"""
+
+import math
+import os
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from haciendas.catalog import load_catalog, normalize_public_items
+from haciendas.engine import PublicCatalog, df_for_nearest, df_for_radius, photo_flags
+from haciendas.geo import haversine_km
+from haciendas.photos import PhotoIndex
+from haciendas.search import fold
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLUMNS = ["id", "name", "region", "lat", "lon", "distance_km", "has_photo"]
+
+
+def baseline_df_for_radius(
+    items,
+    flags,
+    center_lat,
+    center_lon,
+    radius_km,
+    only_with_photo,
+    only_without_photo,
+    name_query,
+    region_filter,
+    fold_names=True,
+):
+    norm = fold if fold_names else str.lower
+    q = norm((name_query or "").strip())
+    rows = []
+    for i, it in enumerate(items):
+        dkm = haversine_km(center_lat, center_lon, it["lat"], it["lon"])
+        if dkm > radius_km:
+            continue
+        photo_now = bool(flags[i])
+        if only_with_photo and not photo_now:
+            continue
+        if only_without_photo and photo_now:
+            continue
+        if q and q not in norm(it["name"]):
+            continue
+        if region_filter and str(it.get("region") or "") != region_filter:
+            continue
+        rows.append(
+            {
+                "id": it["id"],
+                "name": it["name"],
+                "region": it["region"],
+                "lat": it["lat"],
+                "lon": it["lon"],
+                "distance_km": round(dkm, 3),
+                "has_photo": photo_now,
+            }
+        )
+    df = pd.DataFrame(rows, columns=COLUMNS)
+    return df.sort_values(by=["distance_km", "name", "id"]).reset_index(drop=True)
+
+
+def baseline_nearest(items, flags, center_lat, center_lon, k, region_filter=""):
+    everything = baseline_df_for_radius(
+        items, flags, center_lat, center_lon, math.inf, False, False, "", region_filter
+    )
+    return everything.head(k).reset_index(drop=True)
+
+
+def same(got: pd.DataFrame, expected: pd.DataFrame) -> None:
+    got = got[COLUMNS].reset_index(drop=True)
+    pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+
+
+@pytest.fixture(scope="module")
+def public():
+    photos = PhotoIndex(os.path.join(ROOT, "fotos_public"))
+    items = normalize_public_items(
+        load_catalog(os.path.join(ROOT, "catalog_public.json"))["items"], photos
+    )
+    catalog = PublicCatalog.from_items(items, digest="test")
+    return items, catalog, photo_flags(catalog, photos)
+
+
+def random_query(rng: random.Random, items, regions):
+    it = rng.choice(items)
+    name = it["name"]
+    start = rng.randrange(len(name))
+    if rng.random() < 0.5:
+        center = (it["lat"], it["lon"])  # "use this hacienda as center"
+    else:
+        center = (rng.uniform(17.5, 20.5), rng.uniform(-99.5, -96.5))
+    with_photo = rng.random() < 0.2
+    return dict(
+        center_lat=center[0],
+        center_lon=center[1],
+        radius_km=rng.choice([0.5, 1, 5, 10, 25, 50, 100, 200, rng.uniform(0, 200)]),
+        only_with_photo=with_photo,
+        only_without_photo=not with_photo and rng.random() < 0.2,
+        name_query=rng.choice(["", "", name[start : start + rng.randint(1, 6)], "la", " San "]),
+        region_filter=rng.choice(["", ""] + list(regions)),
+    )
+
+
+def test_radius_matches_baseline(public):
+    items, catalog, flags = public
+    rng = random.Random(3)
+    for _ in range(400):
+        query = random_query(rng, items, catalog.regions)
+        expected = baseline_df_for_radius(items, flags, **query)
+        same(df_for_radius(catalog, flags, **query), expected)
+        # Accent folding only ever adds matches to the original lower-case test.
+        lowered = baseline_df_for_radius(items, flags, **query, fold_names=False)
+        assert set(lowered["id"]) <= set(expected["id"])
+
+
+def test_radius_accent_folding(public):
+    items, catalog, flags = public
+    query = dict(
+        center_lat=19.050501,
+        center_lon=-98.135887,
+        radius_km=200,
+        only_with_photo=False,
+        only_without_photo=False,
+        name_query="tlan",
+        region_filter="",
+    )
+    got = df_for_radius(catalog, flags, **query)
+    lowered = baseline_df_for_radius(items, flags, **query, fold_names=False)
+    assert len(got) > len(lowered)
+    assert any("tlán" in n.lower() for n in got["name"])
+
+
+def test_nearest_matches_baseline(public):
+    items, catalog, flags = public
+    rng = random.Random(4)
+    for _ in range(100):
+        it = rng.choice(items)
+        k = rng.choice([1, 5, 20, 100])
+        region = rng.choice(["", it["region"]])
+        got = df_for_nearest(catalog, flags, it["lat"], it["lon"], k, False, False, "", region)
+        same(got, baseline_nearest(items, flags, it["lat"], it["lon"], k, region))
+
+
+def synthetic(points):
+    items = [
+        {
+            "id": f"p{i}",
+            "name": f"Punto {i % 7}",
+            "region": "Norte" if i % 3 else "Sur",
+            "lat": lat,
+            "lon": lon,
+            "has_photo": i % 2 == 0,
+        }
+        for i, (lat, lon) in enumerate(points)
+    ]
+    catalog = PublicCatalog.from_items(items, digest="synthetic")
+    flags = catalog.columns.has_photo
+    return items, catalog, flags
+
+
+@pytest.mark.parametrize(
+    "center",
+    [(0.0, 179.99), (0.0, -179.99), (10.0, 180.0), (-5.0, -180.0)],
+)
+def test_nearest_across_antimeridian(center):
+    rng = random.Random(5)
+    points = [
+        (rng.uniform(-10, 10), rng.choice([-1, 1]) * rng.uniform(178, 180)) for _ in range(300)
+    ]
+    points += [(rng.uniform(-10, 10), rng.uniform(-180, 180)) for _ in range(300)]
+    items, catalog, flags = synthetic(points)
+    for k in (1, 10, 50):
+        got = df_for_nearest(catalog, flags, center[0], center[1], k, False, False, "", "")
+        expected = baseline_nearest(items, flags, center[0], center[1], k)
+        same(got, expected)
+        # The nearest points lie on both sides of the antimeridian.
+        if k == 50:
+            assert (got["lon"] > 0).any() and (got["lon"] < 0).any()
+    got = df_for_radius(catalog, flags, center[0], center[1], 150, False, False, "", "")
+    same(got, baseline_df_for_radius(items, flags, center[0], center[1], 150, False, False, "", ""))
+
+
+@pytest.mark.parametrize("center", [(90.0, 0.0), (89.99, 123.0), (-90.0, 45.0), (-89.95, -170.0)])
+def test_nearest_at_the_poles(center):
+    rng = random.Random(6)
+    points = [
+        (rng.choice([-1, 1]) * rng.uniform(88, 90), rng.uniform(-180, 180)) for _ in range(400)
+    ]
+    points += [(90.0, 0.0), (-90.0, 0.0)]
+    items, catalog, flags = synthetic(points)
+    for k in (1, 10, 60):
+        got = df_for_nearest(catalog, flags, center[0], center[1], k, False, False, "", "")
+        same(got, baseline_nearest(items, flags, center[0], center[1], k))
+    got = df_for_radius(catalog, flags, center[0], center[1], 120, False, False, "", "")
+    same(got, baseline_df_for_radius(items, flags, center[0], center[1], 120, False, False, "", ""))
+
+
+def test_nearest_with_fewer_hits_than_k(public):
+    items, catalog, flags = public
+    counts = pd.Series([it["region"] for it in items]).value_counts()
+    region = counts.index[-1]
+    it = items[0]
+    got = df_for_nearest(catalog, flags, it["lat"], it["lon"], 50, False, False, "", region)
+    assert len(got) == counts.iloc[-1] < 50
+    same(got, baseline_nearest(items, flags, it["lat"], it["lon"], 50, region))
+
+    assert df_for_nearest(catalog, flags, it["lat"], it["lon"], 10, False, False, "zzzz", "").empty
+
+
+def test_empty_region_filter_means_all(public):
+    items, catalog, flags = public
+    center = (19.050501, -98.135887, 200, False, False, "")
+    every = df_for_radius(catalog, flags, *center, "")
+    same(every, baseline_df_for_radius(items, flags, *center, ""))
+    assert set(every["region"]) == set(catalog.regions)
+    assert np.array_equal(every["id"], df_for_radius(catalog, flags, *center, None)["id"])
@@ -0,0 +1,125 @@
+"""Name search: Myers' matcher and the n-gram prefilters against brute force."""
+
+import os
+import random
+
+import numpy as np
+import pytest
+
+from haciendas.catalog import load_catalog
+from haciendas.search import NameIndex, edit_distance_within, fold
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Few letters, so random strings are often within a couple of edits.
+ALPHABET = "abcñá "
+
+
+def within_reference(query: str, text: str, k: int) -> bool:
+    """Plain DP: some substring of `text` is at most `k` edits from `query`."""
+    prev = [0] * (len(text) + 1)  # a match may start anywhere in `text`
+    for i, qc in enumerate(query, 1):
+        cur = [i] + [0] * len(text)
+        for j, tc in enumerate(text, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (qc != tc))
+        prev = cur
+    return min(prev) <= k
+
+
+def fuzzy_reference(names: np.ndarray, query: str) -> list:
+    """The items filter(..., "fuzzy") should return, by scanning every name."""
+    q = fold(query).strip()
+    if not q:
+        return list(range(len(names)))
+    if len(q) < 4:
+        return [i for i, n in enumerate(names) if q in str(n)]
+    k = 1 if len(q) < 8 else 2
+    return [i for i, n in enumerate(names) if within_reference(q, str(n), k)]
+
+
+def random_string(rng: random.Random, lo: int, hi: int) -> str:
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(lo, hi)))
+
+
+def catalog_names() -> list:
+    items = load_catalog(os.path.join(ROOT, "catalog_public.json"))["items"]
+    return [it.get("name") for it in items]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_myers_matches_dp_on_random_strings(seed):
+    rng = random.Random(seed)
+    for _ in range(1000):
+        query = random_string(rng, 1, 9)
+        text = random_string(rng, 0, 16)
+        k = rng.randint(0, 3)
+        assert edit_distance_within(query, text, k) == within_reference(query, text, k), (
+            query,
+            text,
+            k,
+        )
+
+
+def test_myers_matches_dp_on_catalog_names():
+    rng = random.Random(7)
+    names = [fold(n) for n in catalog_names() if n]
+    for _ in range(500):
+        source = rng.choice(names)
+        start = rng.randrange(len(source))
+        query = list(source[start : start + rng.randint(4, 10)])
+        for _ in range(rng.randint(0, 3)):  # random edits of a real substring
+            pos = rng.randrange(len(query) + 1)
+            op = rng.choice("ids")
+            if op == "i":
+                query.insert(pos, rng.choice("aeiouxn"))
+            elif query and pos < len(query):
+                if op == "d":
+                    del query[pos]
+                else:
+                    query[pos] = rng.choice("aeiouxn")
+        query = "".join(query)
+        text = rng.choice(names)
+        for k in (1, 2):
+            assert edit_distance_within(query, text, k) == within_reference(query, text, k), (
+                query,
+                text,
+                k,
+            )
+
+
+@pytest.mark.parametrize("length", range(1, 11))
+def test_fuzzy_filter_matches_brute_force_on_random_names(length):
+    # Lengths 4-5 (1 edit) and 8 (2 edits) go through the bigram bound;
+    # 1-3 fall back to "contains".
+    rng = random.Random(length)
+    names = [random_string(rng, 0, 14) for _ in range(600)] + [None, "", "Tehuacán"]
+    index = NameIndex.build(names)
+    subset = np.sort(rng.sample(range(len(index)), len(index) // 3))
+    for _ in range(25):
+        query = random_string(rng, length, length)
+        expected = fuzzy_reference(index.folded, query)
+        assert index.lookup(query, "fuzzy").tolist() == expected, query
+        kept = set(subset.tolist())
+        assert index.filter(subset, query, "fuzzy").tolist() == [i for i in expected if i in kept]
+
+
+@pytest.mark.parametrize("length", range(1, 11))
+def test_fuzzy_filter_matches_brute_force_on_catalog(length):
+    rng = random.Random(100 + length)
+    index = NameIndex.build(catalog_names())
+    words = [w for n in index.folded for w in str(n).split() if len(w) >= length]
+    for _ in range(15):
+        word = rng.choice(words)
+        start = rng.randrange(len(word) - length + 1)
+        query = list(word[start : start + length])
+        query[rng.randrange(length)] = rng.choice("aeioux")  # one substitution
+        query = "".join(query)
+        assert index.lookup(query, "fuzzy").tolist() == fuzzy_reference(index.folded, query), query
+
+
+def test_prefilter_keeps_short_typos():
+    # None of these shares a trigram with the name; the bigram bound keeps them.
+    names = ["Hacienda Santa Ana", "Rancho Viejo"]
+    index = NameIndex.build(names)
+    for query in ("snta", "haxi", "hxci", "sabta"):
+        assert index.lookup(query, "fuzzy").tolist() == [0], query
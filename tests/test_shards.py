@@ -0,0 +1,104 @@
+"""Sharded queries and haciendas-batch give df_for_radius() / df_for_nearest() rows and order."""
+
+import json
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from haciendas.batch import Centers, df_for_centers
+from haciendas.engine import df_for_nearest, df_for_radius, load_public_catalog, photo_flags
+from haciendas.photos import PhotoIndex
+from haciendas.shards import build_shards, df_for_nearest_sharded, df_for_radius_sharded, load_shards
+
+CENTER = (19.05, -98.13)
+
+
+@pytest.fixture(scope="module")
+def catalogs(tmp_path_factory):
+    """(unsharded catalog, sharded catalog, photos) of one synthetic catalog."""
+    tmp = tmp_path_factory.mktemp("shards")
+    rng = random.Random(8)
+    items = []
+    # Same name and spot in three regions, listed against id order, so
+    # catalog order and shard order disagree on how to break the tie.
+    for id_, region in (("z-tie", "Alpha"), ("m-tie", "Gamma"), ("a-tie", "Beta")):
+        items.append({"id": id_, "name": "Casa", "region": region, "lat": 19.1, "lon": -98.2})
+    for i in range(600):
+        items.append(
+            {
+                "id": f"h{rng.randrange(10**6):06d}-{i}",
+                "name": rng.choice(["Casa", "San José", "Santa Ana", "El Rosario"]),
+                "region": rng.choice(["Alpha", "Beta", "Gamma", "Delta"]),
+                "lat": round(CENTER[0] + rng.uniform(-1.5, 1.5), 3),
+                "lon": round(CENTER[1] + rng.uniform(-1.5, 1.5), 3),
+            }
+        )
+    json_path = tmp / "catalog.json"
+    json_path.write_text(json.dumps({"items": items}))
+    photos = PhotoIndex(str(tmp / "fotos"))
+    build_shards(str(json_path), str(tmp / "catalog.shards"), photos)
+    catalog = load_public_catalog(str(json_path), photos)
+    return catalog, load_shards(str(tmp / "catalog.shards")), photos
+
+
+def queries():
+    rng = random.Random(9)
+    for _ in range(60):
+        yield dict(
+            center_lat=rng.choice([19.1, CENTER[0] + rng.uniform(-1, 1)]),
+            center_lon=rng.choice([-98.2, CENTER[1] + rng.uniform(-1, 1)]),
+            only_with_photo=False,
+            only_without_photo=False,
+            name_query=rng.choice(["", "", "casa", "san"]),
+            region_filter=rng.choice(["", "", "Beta"]),
+        )
+
+
+def test_radius_sharded_matches_unsharded(catalogs):
+    catalog, sharded, photos = catalogs
+    flags = photo_flags(catalog, photos)
+    for query in queries():
+        for radius in (0.5, 10, 60, 200):
+            expected = df_for_radius(catalog, flags, radius_km=radius, **query)
+            got = df_for_radius_sharded(sharded, photos, radius_km=radius, **query)
+            pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+
+
+def test_nearest_sharded_matches_unsharded(catalogs):
+    catalog, sharded, photos = catalogs
+    flags = photo_flags(catalog, photos)
+    for query in queries():
+        for k in (1, 2, 3, 20):
+            expected = df_for_nearest(catalog, flags, k=k, **query)
+            got = df_for_nearest_sharded(sharded, photos, k=k, **query)
+            pd.testing.assert_frame_equal(got, expected, check_dtype=False)
+
+
+def test_ties_ordered_by_id(catalogs):
+    catalog, sharded, photos = catalogs
+    args = (19.1, -98.2, 0.01, False, False, "casa", "")
+    got = df_for_radius_sharded(sharded, photos, *args)
+    assert got["id"].tolist() == ["a-tie", "m-tie", "z-tie"]
+    assert df_for_radius(catalog, photo_flags(catalog, photos), *args)["id"].tolist() == [
+        "a-tie",
+        "m-tie",
+        "z-tie",
+    ]
+
+
+def test_batch_matches_df_for_radius(catalogs):
+    catalog, _, photos = catalogs
+    flags = photo_flags(catalog, photos)
+    rng = random.Random(10)
+    lat = np.array([19.1] + [CENTER[0] + rng.uniform(-1, 1) for _ in range(30)])
+    lon = np.array([-98.2] + [CENTER[1] + rng.uniform(-1, 1) for _ in range(30)])
+    radius = np.array([rng.choice([1.0, 10.0, 40.0]) for _ in range(len(lat))])
+    ids = np.array([f"c{i}" for i in range(len(lat))], dtype=object)
+    batch = df_for_centers(catalog, Centers(id=ids, lat=lat, lon=lon, radius_km=radius))
+    for i in range(len(lat)):
+        expected = df_for_radius(catalog, flags, lat[i], lon[i], radius[i], False, False, "", "")
+        rows = batch[batch["center_id"] == ids[i]]
+        assert rows["hacienda_id"].astype(str).tolist() == expected["id"].tolist()
+        assert rows["distance_km"].tolist() == expected["distance_km"].tolist()